@@ -0,0 +1,413 @@
+import argparse
+import importlib.util
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from PyQt5.QtCore import QEvent
+
+# Benchmarks drive the real widgets, so Qt runs without a display
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(HERE, "fypfinal code.py")
+DEFAULT_BASELINE = os.path.join(HERE, "benchmark_baseline.json")
+SIZES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+
+WORDS = ("steel", "rod", "sheet", "pipe", "angle", "girder", "cement", "transport", "salary",
+         "rent", "electricity", "fuel", "welding", "paint", "bolt", "wire", "mesh", "plate")
+FIRST_NAMES = ("Muhammad", "Ali", "Ahmed", "Usman", "Bilal", "Hamza", "Zain", "Omar", "Ayesha", "Fatima")
+LAST_NAMES = ("Khan", "Butt", "Sheikh", "Malik", "Chaudhry", "Qureshi", "Raza", "Siddiqui")
+CITIES = ("Lahore", "Karachi", "Faisalabad", "Multan", "Sialkot", "Gujranwala")
+
+
+def load_app():
+    spec = importlib.util.spec_from_file_location("lst_app", APP_PATH)
+    app = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(app)
+    return app
+
+
+# ---------------------------------------------------------------------------
+# Synthetic data
+# ---------------------------------------------------------------------------
+
+def generate_ledger(app, rng, count, first_day, days):
+    # About three years of transactions, 40% income
+    records = []
+    for i in range(count):
+        day = first_day + rng.randrange(days)
+        description = f"{rng.choice(WORDS)} {rng.choice(WORDS)}"
+        record_type = "Income" if rng.random() < 0.4 else "Expense"
+        paisa = rng.randrange(100, 5_000_000)
+        records.append(app.FinancialRecord.from_values(None, day, description, paisa, record_type))
+    return records
+
+
+def generate_inventory(app, rng, count, first_day, days):
+    suppliers = [f"{rng.choice(LAST_NAMES)} Traders {i}" for i in range(max(1, count // 200))]
+    return [
+        app.InventoryItem.from_values(
+            None, f"{rng.choice(WORDS).title()} {i}", rng.randrange(0, 5_000),
+            rng.randrange(100, 2_000_000), rng.choice(suppliers), first_day + rng.randrange(days),
+        )
+        for i in range(count)
+    ]
+
+
+def generate_customers(app, rng, count):
+    customers = []
+    for i in range(count):
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}"
+        customers.append(app.Customer(name, f"0300-{i:07d}", rng.choice(CITIES), f"customer{i}@mail.pk"))
+    return customers
+
+
+def populate(app, path, count, seed):
+    # Seeded, so every run of a size works on identical data
+    rng = random.Random(seed)
+    today = app.to_day(app.QDate.currentDate())
+    first_day = today - 3 * 365
+    store = app.DataStore(path)
+    try:
+        store.financial.insert_many(generate_ledger(app, rng, count, first_day, 3 * 365))
+        store.inventory.insert_many(generate_inventory(app, rng, count, first_day, 3 * 365))
+        store.customers.insert_many(generate_customers(app, rng, count))
+    finally:
+        store.close()
+    return first_day
+
+
+# ---------------------------------------------------------------------------
+# Measurement
+# ---------------------------------------------------------------------------
+
+def reset_peak_rss():
+    # Linux lets a process reset its own high-water mark
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss():
+    # Peak resident set size in bytes, or None when it cannot be read
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        resource = None
+    if resource is not None:
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage if sys.platform == "darwin" else usage * 1024
+    try:
+        import psutil
+    except ImportError:
+        return None
+    info = psutil.Process().memory_info()
+    return getattr(info, "peak_wset", info.rss)
+
+
+class Runner:
+    def __init__(self, qt_app, repeat, trace_allocations):
+        self.qt_app = qt_app
+        self.repeat = repeat
+        self.trace_allocations = trace_allocations
+        self.results = {}  # case -> {"wall": s, "rss": bytes, "alloc": bytes}
+
+    def measure(self, case, func, setup=None, repeat=None):
+        # Best wall time of `repeat` runs, then one run under tracemalloc for
+        # the allocation peak (tracing slows the code down, so it is kept
+        # out of the timed runs)
+        best = None
+        reset_peak_rss()
+        for _ in range(repeat or self.repeat):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        result = {"wall": best, "rss": peak_rss()}
+        if self.trace_allocations:
+            if setup is not None:
+                setup()
+            tracemalloc.start()
+            func()
+            _, result["alloc"] = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        self.results[case] = result
+        print(f"  {case:<40} {format_seconds(best):>10}  rss {format_bytes(result['rss']):>9}"
+              f"  alloc {format_bytes(result.get('alloc')):>9}", flush=True)
+        return result
+
+    def drain(self, app):
+        # Let background jobs finish and their queued signals arrive
+        app.QThreadPool.globalInstance().waitForDone()
+        app.QApplication.processEvents()
+
+
+def format_seconds(seconds):
+    return f"{seconds * 1000:.1f} ms" if seconds < 10 else f"{seconds:.2f} s"
+
+
+def format_bytes(value):
+    if value is None:
+        return "n/a"
+    for unit in ("B", "KB", "MB", "GB"):
+        if value < 1024 or unit == "GB":
+            return f"{value:.0f} {unit}" if unit == "B" else f"{value:.1f} {unit}"
+        value /= 1024
+
+
+# ---------------------------------------------------------------------------
+# Cases
+# ---------------------------------------------------------------------------
+
+def run_size(app, runner, label, count, workdir):
+    path = os.path.join(workdir, f"bench_{label}.db")
+    print(f"{label}: generating {count:,} transactions, items and customers", flush=True)
+    start = time.perf_counter()
+    first_day = populate(app, path, count, seed=count)
+    print(f"  (data generated in {format_seconds(time.perf_counter() - start)})", flush=True)
+    app.DB_PATH = path
+    prefix = f"{label}/"
+
+    windows = []
+
+    def new_window():
+        windows.append(app.MainWindow())
+
+    def login():
+        # Up to the dashboard being shown; the search indexes keep building
+        # in the background and are waited for separately
+        windows[-1].on_login()
+
+    def close_windows():
+        # Widgets go first so no view fetches from a store being closed
+        while windows:
+            window = windows.pop()
+            store = window.store
+            window.deleteLater()
+            app.QApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+            if store is not None:
+                runner.drain(app)
+                store.close()
+
+    runner.measure(prefix + "startup.window", new_window, setup=close_windows)
+    runner.measure(prefix + "startup.login", login, setup=lambda: (runner.drain(app), close_windows(), new_window()),
+                   repeat=1)
+    window = windows[-1]
+    start = time.perf_counter()
+    runner.drain(app)
+    runner.results[prefix + "startup.search indexes"] = {"wall": time.perf_counter() - start, "rss": peak_rss()}
+    for index in range(len(window.PAGES)):
+        window.page(index)
+    runner.drain(app)
+
+    financial = window.financial
+    runner.measure(prefix + "FinancialWidget.refresh_table",
+                   lambda: (financial.refresh_table(), financial.model.fetchMore()))
+    runner.measure(prefix + "DashboardWidget.update_dashboard_data", window.dashboard.update_dashboard_data)
+
+    reports = window.reports
+    reports.start_date_edit.setDate(app.from_day(first_day))
+    reports.end_date_edit.setDate(app.QDate.currentDate())
+    cache = window.store.report_cache
+    for report_type in app.ReportBuilder.REPORT_TYPES:
+        def generate(report_type=report_type):
+            reports.report_type_combo.setCurrentText(report_type)
+            reports.generate_report()
+            while reports._job is not None:
+                app.QThreadPool.globalInstance().waitForDone(20)
+                app.QApplication.processEvents()
+        # Every timed run builds the report; the repeat is timed separately
+        runner.measure(prefix + f"report.{report_type}", generate, setup=cache.clear,
+                       repeat=1 if count >= 1_000_000 else None)
+        if report_type == "Financial Summary":
+            runner.measure(prefix + f"report.{report_type} (cached)", generate)
+
+    # Add/delete flows: the repository write plus the change-bus frame that
+    # updates the table, dashboard and search index
+    store = window.store
+    day = app.to_day(app.QDate.currentDate())
+    added = []
+
+    def add_records():
+        for i in range(100):
+            record = app.FinancialRecord.from_values(None, day, f"bench add {i}", 12_345, "Income")
+            store.financial.insert(record)
+            added.append(record.id)
+            store.events.flush()
+
+    def delete_records():
+        while added:
+            store.financial.delete(added.pop())
+            store.events.flush()
+
+    runner.measure(prefix + "add 100 transactions", add_records, setup=delete_records)
+    runner.measure(prefix + "delete 100 transactions", delete_records, setup=add_records)
+
+    bulk = []
+
+    def select_bulk():
+        bulk[:] = [record.id for record in store.financial.page(None, 1000)]
+
+    def bulk_delete():
+        store.financial.delete_many(bulk)
+        store.events.flush()
+
+    runner.measure(prefix + "bulk delete 1000 transactions", bulk_delete, setup=select_bulk, repeat=1)
+    close_windows()
+
+
+def run_server(app, runner, workdir):
+    # Loopback server mode: a server thread and two terminal replicas. Each
+    # write from one terminal is timed until both replicas hold exactly the
+    # server's rows, so this is also the self-check that they converge.
+    print("server: loopback server with two terminals", flush=True)
+    server_path = os.path.join(workdir, "bench_server.db")
+    server = app.StoreServer(server_path, port=0)
+    server.start()
+    links = []
+    for name in ("a", "b"):
+        store = app.DataStore(os.path.join(workdir, f"bench_replica_{name}.db"))
+        link = app.ServerLink(store, server.address)
+        link.attach()
+        links.append(link)
+    first, second = (link.store for link in links)
+    reader = app.StoreReader(server_path)
+    tables = [repo.table for repo in first.repositories]
+
+    def rows(conn):
+        return [conn.execute(f"SELECT * FROM {table} ORDER BY id").fetchall() for table in tables]
+
+    def converge(timeout=10.0):
+        deadline = time.perf_counter() + timeout
+        while True:
+            expected = rows(reader.conn)
+            if rows(first.conn) == expected and rows(second.conn) == expected:
+                return
+            if time.perf_counter() > deadline:
+                raise RuntimeError("server mode: the replicas did not converge with the server")
+            app.QApplication.processEvents()
+            time.sleep(0.002)
+
+    day = app.to_day(app.QDate.currentDate())
+    records = []
+
+    def insert():
+        for i in range(100):
+            record = app.FinancialRecord.from_values(None, day, f"server add {i}", 10_000 + i, "Income")
+            first.financial.insert(record)
+            records.append(record)
+        first.customers.insert(app.Customer("Server Check", "0300", "Lahore", ""))
+        converge()
+
+    def update():
+        # Edits come from the other terminal
+        for record in records:
+            record.description += " (edited)"
+        second.financial.update_many(records)
+        converge()
+
+    def delete():
+        first.financial.delete_many([record.id for record in records])
+        first.customers.delete_many([customer.id for customer in first.customers.all()])
+        records.clear()
+        converge()
+
+    runner.measure("server/insert 100 and converge", insert, repeat=1)
+    runner.measure("server/update 100 and converge", update, repeat=1)
+    runner.measure("server/delete 100 and converge", delete, repeat=1)
+    for link in links:
+        link.close()
+        link.store.close()
+    reader.close()
+    server.close()
+
+
+def compare(results, baseline, tolerance):
+    # Cases slower (or allocating more) than baseline * (1 + tolerance)
+    regressions = []
+    for case, result in results.items():
+        base = baseline.get(case)
+        if not base:
+            continue
+        for metric in ("wall", "alloc"):
+            new, old = result.get(metric), base.get(metric)
+            if new is None or not old:
+                continue
+            if new > old * (1 + tolerance):
+                regressions.append((case, metric, old, new))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Luqman Steel Trader performance benchmarks")
+    parser.add_argument("--sizes", default="1k,100k",
+                        help="comma-separated dataset sizes from: " + ", ".join(SIZES))
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case (best is kept)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown before a case counts as a regression")
+    parser.add_argument("--no-alloc", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--no-server", action="store_true", help="skip the loopback server mode check")
+    args = parser.parse_args(argv)
+
+    sizes = [size.strip().lower() for size in args.sizes.split(",") if size.strip()]
+    unknown = [size for size in sizes if size not in SIZES]
+    if unknown:
+        parser.error(f"unknown size(s): {', '.join(unknown)}")
+
+    app = load_app()
+    qt_app = app.QApplication.instance() or app.QApplication([sys.argv[0]])
+    runner = Runner(qt_app, args.repeat, not args.no_alloc)
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            run_size(app, runner, size, SIZES[size], workdir)
+        if not args.no_server:
+            run_server(app, runner, workdir)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(runner.results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one.")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(runner.results, baseline, args.tolerance)
+    if not regressions:
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%}).")
+        return 0
+    print("Regressions:")
+    for case, metric, old, new in regressions:
+        shown = format_seconds if metric == "wall" else format_bytes
+        print(f"  {case:<40} {metric:<5} {shown(old)} -> {shown(new)} (+{(new / old - 1):.0%})")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,41 +1,3379 @@
+import copy
+import csv
+import datetime
+import functools
+import io
+import itertools
+import math
+import os
+import re
+import sqlite3
 import sys
+import tempfile
+import threading
+import time
+import zipfile
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict, deque, namedtuple
+from contextlib import contextmanager
+
+# Startup timing starts before the Qt imports
+STARTUP_T0 = time.perf_counter()
+
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QStackedWidget, QLabel, QPushButton, QVBoxLayout, QHBoxLayout,
     QLineEdit, QMessageBox, QTableWidget, QTableWidgetItem, QFormLayout, QDialog, QComboBox, QDateEdit,
-    QSpinBox, QDoubleSpinBox, QTextEdit, QFrame, QGraphicsOpacityEffect, QSizePolicy, QGridLayout
+    QSpinBox, QDoubleSpinBox, QTextEdit, QFrame, QGraphicsOpacityEffect, QSizePolicy, QGridLayout,
+    QTableView, QAbstractItemView, QProgressBar, QListView, QFileDialog, QProgressDialog, QCheckBox,
+    QShortcut, QHeaderView, QInputDialog
+)
+from PyQt5.QtCore import (
+    Qt, QPropertyAnimation, QRect, QEasingCurve, QDate, QPoint, QAbstractTableModel, QModelIndex,
+    QObject, QRunnable, QThreadPool, pyqtSignal, QAbstractListModel, QTimer, QVariantAnimation, QPointF
 )
-from PyQt5.QtCore import Qt, QPropertyAnimation, QRect, QEasingCurve, QDate, QPoint
-from PyQt5.QtGui import QFont, QColor, QPixmap, QLinearGradient, QPainter, QBrush, QPalette
+from PyQt5.QtGui import (
+    QFont, QColor, QPixmap, QLinearGradient, QPainter, QBrush, QPalette, QKeySequence, QPdfWriter,
+    QPageSize, QPageLayout, QFontMetrics, QPen, QPolygonF
+)
+
+# numpy (column aggregations) and openpyxl (.xlsx files) together take
+# several hundred milliseconds to import, so they are loaded on first use
+# rather than on the way to the login screen. Each stays None when missing.
+np = None
+openpyxl = None
+_optional_checked = set()
+
+
+def require_numpy():
+    global np
+    if "numpy" not in _optional_checked:
+        try:
+            import numpy as np
+        except ImportError:  # Column aggregations fall back to plain Python
+            np = None
+        _optional_checked.add("numpy")
+    return np
+
+
+def require_openpyxl():
+    global openpyxl
+    if "openpyxl" not in _optional_checked:
+        try:
+            import openpyxl
+        except ImportError:  # Only needed for .xlsx import and export
+            openpyxl = None
+        _optional_checked.add("openpyxl")
+    return openpyxl
+
+
+# Server and client mode talk JSON lines over TCP; the standalone app never
+# needs either module, so they are not imported on the way to the login.
+json = None
+socket = None
+
+
+def require_network():
+    global json, socket
+    if socket is None:
+        import json
+        import socket
+    return socket
+
 
+class StartupTimer:
+    # Milestones from module load to a usable window (import, window
+    # construction, first paint, data load). Written to stderr as they
+    # happen when LST_STARTUP_TIMING is set.
+    def __init__(self, origin):
+        self.origin = origin
+        self.marks = []  # [(name, seconds since origin)]
+        self.verbose = bool(os.environ.get("LST_STARTUP_TIMING"))
+
+    def mark(self, name):
+        if any(existing == name for existing, _ in self.marks):
+            return  # Only the first occurrence counts
+        elapsed = time.perf_counter() - self.origin
+        previous = self.marks[-1][1] if self.marks else 0.0
+        self.marks.append((name, elapsed))
+        if self.verbose:
+            print(f"startup: {name:<12} {elapsed * 1000:8.1f} ms  (+{(elapsed - previous) * 1000:.1f} ms)",
+                  file=sys.stderr)
+
+    def report(self):
+        return [(name, elapsed * 1000) for name, elapsed in self.marks]
+
+
+STARTUP = StartupTimer(STARTUP_T0)
+
+
+class Metric:
+    __slots__ = ("count", "total", "max", "samples", "next")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = array("d")  # Most recent durations, used as a ring
+        self.next = 0
+
+
+class Instrumentation:
+    # Opt-in timing of hot paths (LST_INSTRUMENT=1 or --instrument). Timed
+    # functions cost one attribute check while it is off. Each metric keeps
+    # its call count and total plus a ring of recent durations for the
+    # percentiles on the Diagnostics page.
+    MAX_SAMPLES = 4096
+    HEARTBEAT_MS = 50
+
+    def __init__(self):
+        self.enabled = bool(os.environ.get("LST_INSTRUMENT"))
+        self.metrics = {}
+        self._lock = threading.Lock()  # Storage queries also run on workers
+        self._heartbeat = None
+        self._last_beat = None
+        self.profiler = None
+
+    def enable(self):
+        self.enabled = True
+
+    def record(self, name, seconds):
+        with self._lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = Metric()
+            metric.count += 1
+            metric.total += seconds
+            metric.max = max(metric.max, seconds)
+            if len(metric.samples) < self.MAX_SAMPLES:
+                metric.samples.append(seconds)
+            else:
+                metric.samples[metric.next] = seconds
+                metric.next = (metric.next + 1) % self.MAX_SAMPLES
+
+    def timed(self, name=None):
+        # Decorator; name defaults to the function's qualified name
+        def decorate(func):
+            label = name or func.__qualname__
+            code = func.__code__
+            # Qt signals may pass more arguments than a slot takes; drop
+            # them the way PyQt does for undecorated slots
+            max_args = None if code.co_flags & 0x04 else code.co_argcount
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if max_args is not None:
+                    args = args[:max_args]
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record(label, time.perf_counter() - start)
+            return wrapper
+        return decorate
+
+    def timed_query(self, func):
+        # Repository methods, labelled with the repository's table
+        @functools.wraps(func)
+        def wrapper(repo, *args, **kwargs):
+            if not self.enabled:
+                return func(repo, *args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(repo, *args, **kwargs)
+            finally:
+                self.record(f"sql {repo.table}.{func.__name__}", time.perf_counter() - start)
+        return wrapper
+
+    def stats(self):
+        # [(name, count, total, p50, p95, p99, max)] in seconds, by total
+        rows = []
+        with self._lock:
+            items = [(name, metric.count, metric.total, metric.max, sorted(metric.samples))
+                     for name, metric in self.metrics.items()]
+        for name, count, total, longest, samples in items:
+            rows.append((name, count, total, percentile(samples, 50), percentile(samples, 95),
+                         percentile(samples, 99), longest))
+        rows.sort(key=lambda row: -row[2])
+        return rows
+
+    def samples(self, name):
+        with self._lock:
+            metric = self.metrics.get(name)
+            return list(metric.samples) if metric is not None else []
+
+    def reset(self):
+        with self._lock:
+            self.metrics = {}
+
+    def start_event_loop_monitor(self, parent):
+        # A repeating timer that should fire every HEARTBEAT_MS; any extra
+        # delay is time the event loop spent busy elsewhere
+        if self._heartbeat is not None:
+            return
+        self._heartbeat = QTimer(parent)
+        self._heartbeat.setInterval(self.HEARTBEAT_MS)
+        self._heartbeat.timeout.connect(self._beat)
+        self._last_beat = time.perf_counter()
+        self._heartbeat.start()
+
+    def _beat(self):
+        now = time.perf_counter()
+        if self.enabled:
+            late = now - self._last_beat - self.HEARTBEAT_MS / 1000
+            self.record("event loop latency", max(0.0, late))
+        self._last_beat = now
+
+    def start_profile(self):
+        # cProfile sees the GUI thread only; worker jobs show up in the
+        # timed metrics instead
+        import cProfile
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+
+    def stop_profile(self, path):
+        profiler, self.profiler = self.profiler, None
+        profiler.disable()
+        profiler.dump_stats(path)
+
+
+def percentile(sorted_values, pct):
+    # Nearest-rank percentile of an already sorted sequence
+    if not sorted_values:
+        return 0.0
+    rank = max(0, -(-len(sorted_values) * pct // 100) - 1)
+    return sorted_values[int(rank)]
+
+
+INSTRUMENTS = Instrumentation()
+
+
+# Dates are stored as Julian day numbers and money as integer paisa, so the
+# indexes stay compact and sums are exact.
+def to_paisa(amount):
+    return int(round(amount * 100))
+
+
+def from_paisa(paisa):
+    return paisa / 100
+
+
+def to_day(qdate):
+    return qdate.toJulianDay()
+
+
+def from_day(day):
+    return QDate.fromJulianDay(day)
+
+
+def day_to_month(day):
+    # Months are numbered consecutively (year * 12 + month - 1)
+    date = QDate.fromJulianDay(day)
+    return date.year() * 12 + date.month() - 1
+
+
+def month_first_day(month):
+    # Day number of the first day of a consecutive month number
+    return QDate(month // 12, month % 12 + 1, 1).toJulianDay()
 
-# ... [Keep all your existing classes: FinancialRecord, InventoryItem, Customer, FinancialDialog, InventoryDialog, CustomerDialog] ...
 
+# Entities are slotted row views: dates live as day numbers and money as
+# paisa, with QDate/float accessors built on demand for the dialogs and views.
 class FinancialRecord:
-    def __init__(self, date, description, amount, record_type):
+    __slots__ = ("id", "day", "description", "paisa", "record_type")
+
+    def __init__(self, date, description, amount, record_type, id=None):
+        self.id = id  # Primary key in the data store (None until saved)
         self.date = date  # QDate
         self.description = description
         self.amount = amount
         self.record_type = record_type  # "Income" or "Expense"
 
+    @classmethod
+    def from_values(cls, id, day, description, paisa, record_type):
+        record = cls.__new__(cls)
+        record.id = id
+        record.day = day
+        record.description = description
+        record.paisa = paisa
+        record.record_type = record_type
+        return record
+
+    @property
+    def date(self):
+        return from_day(self.day)
+
+    @date.setter
+    def date(self, value):
+        self.day = to_day(value)
+
+    @property
+    def amount(self):
+        return from_paisa(self.paisa)
+
+    @amount.setter
+    def amount(self, value):
+        self.paisa = to_paisa(value)
+
 
 class InventoryItem:
-    def __init__(self, name, quantity, unit_price, supplier, last_updated):
+    __slots__ = ("id", "name", "quantity", "price_paisa", "supplier", "updated_day")
+
+    def __init__(self, name, quantity, unit_price, supplier, last_updated, id=None):
+        self.id = id
         self.name = name
         self.quantity = quantity
         self.unit_price = unit_price
         self.supplier = supplier
         self.last_updated = last_updated  # QDate
 
+    @classmethod
+    def from_values(cls, id, name, quantity, price_paisa, supplier, updated_day):
+        item = cls.__new__(cls)
+        item.id = id
+        item.name = name
+        item.quantity = quantity
+        item.price_paisa = price_paisa
+        item.supplier = supplier
+        item.updated_day = updated_day
+        return item
+
+    @property
+    def unit_price(self):
+        return from_paisa(self.price_paisa)
+
+    @unit_price.setter
+    def unit_price(self, value):
+        self.price_paisa = to_paisa(value)
+
+    @property
+    def last_updated(self):
+        return from_day(self.updated_day)
+
+    @last_updated.setter
+    def last_updated(self, value):
+        self.updated_day = to_day(value)
+
 
 class Customer:
-    def __init__(self, name, contact_number, address, email):
+    __slots__ = ("id", "name", "contact_number", "address", "email")
+
+    def __init__(self, name, contact_number, address, email, id=None):
+        self.id = id
         self.name = name
         self.contact_number = contact_number
         self.address = address
         self.email = email
 
 
+# Validation shared by the dialogs and the bulk importer
+class ValidationError(ValueError):
+    pass
+
+
+MAX_AMOUNT = 1_000_000_000
+MAX_QUANTITY = 1_000_000
+
+
+def validate_financial(date, description, amount, record_type):
+    description = description.strip()
+    if not description:
+        raise ValidationError("Please enter a description.")
+    if amount <= 0:
+        raise ValidationError("Amount must be greater than zero.")
+    if amount > MAX_AMOUNT:
+        raise ValidationError("Amount is too large.")
+    if record_type not in ("Income", "Expense"):
+        raise ValidationError("Type must be Income or Expense.")
+    return FinancialRecord(date, description, amount, record_type)
+
+
+def validate_inventory(name, quantity, unit_price, supplier, last_updated):
+    name = name.strip()
+    if not name:
+        raise ValidationError("Please enter product name.")
+    if not 0 <= quantity <= MAX_QUANTITY:
+        raise ValidationError(f"Quantity must be between 0 and {MAX_QUANTITY:,}.")
+    if not 0 <= unit_price <= MAX_AMOUNT:
+        raise ValidationError("Unit price is out of range.")
+    return InventoryItem(name, quantity, unit_price, supplier.strip(), last_updated)
+
+
+def validate_customer(name, contact, address, email):
+    name = name.strip()
+    if not name:
+        raise ValidationError("Please enter customer name.")
+    contact = contact.strip()
+    if not contact:
+        raise ValidationError("Please enter contact number.")
+    address = address.strip()
+    if not address:
+        raise ValidationError("Please enter address.")
+    email = email.strip()
+    if email and ("@" not in email or "." not in email):
+        raise ValidationError("Invalid email format.")
+    return Customer(name, contact, address, email)
+
+
+# ---------------------------------------------------------------------------
+# Persistent storage (SQLite)
+# ---------------------------------------------------------------------------
+
+DB_PATH = os.environ.get("LST_DB_PATH") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "luqman_steel.db"
+)
+# Where generated reports are kept between sessions; unset keeps them in
+# memory only
+REPORT_CACHE_PATH = os.environ.get("LST_REPORT_CACHE")
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS financial_records (
+    id INTEGER PRIMARY KEY,
+    day INTEGER NOT NULL,
+    description TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    record_type TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_financial_day ON financial_records(day, id);
+CREATE INDEX IF NOT EXISTS idx_financial_type ON financial_records(record_type, day);
+
+CREATE TABLE IF NOT EXISTS inventory_items (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    unit_price INTEGER NOT NULL,
+    supplier TEXT NOT NULL,
+    last_updated INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_inventory_name ON inventory_items(name, id);
+
+CREATE TABLE IF NOT EXISTS customers (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    contact_number TEXT NOT NULL,
+    address TEXT NOT NULL,
+    email TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_customer_name ON customers(name, id);
+
+CREATE TABLE IF NOT EXISTS data_versions (tbl TEXT PRIMARY KEY, version INTEGER NOT NULL);
+"""
+
+
+class Repository:
+    # Subclasses describe their table; rows are converted to and from the
+    # plain entity classes above.
+    table = None
+    columns = ()
+    range_column = None
+    order_by = "id"
+    # Columns of the display order (always ending in id) used for keyset paging
+    key_columns = ("id",)
+    descending = False
+
+    def __init__(self, store):
+        self.store = store
+        # Callables notified after each write as observer(old, new); old is
+        # None for inserts and new is None for deletes
+        self.observers = []
+        # In client mode a ServerClient; writes go to the server first, which
+        # assigns ids, and are then applied to this (replica) database
+        self.remote = None
+
+    @property
+    def conn(self):
+        return self.store.conn
+
+    def _to_row(self, obj):
+        raise NotImplementedError
+
+    def _from_row(self, row):
+        raise NotImplementedError
+
+    def _select(self):
+        return f"SELECT id, {', '.join(self.columns)} FROM {self.table}"
+
+    def _insert_sql(self):
+        # The id is passed explicitly; None lets SQLite assign one
+        placeholders = ", ".join("?" for _ in self.columns)
+        return f"INSERT INTO {self.table} (id, {', '.join(self.columns)}) VALUES (?, {placeholders})"
+
+    def _notify(self, old, new):
+        for observer in self.observers:
+            observer(old, new)
+
+    def _bump_version(self):
+        # Inside each write's transaction. Versions are fresh random numbers
+        # rather than a count, so a database restored from a backup never
+        # reuses a version for different contents.
+        self.conn.execute("UPDATE data_versions SET version = abs(random()) WHERE tbl = ?", (self.table,))
+
+    def version(self):
+        # Changes whenever any row of the table does
+        return self.conn.execute("SELECT version FROM data_versions WHERE tbl = ?", (self.table,)).fetchone()[0]
+
+    @INSTRUMENTS.timed_query
+    def insert(self, obj):
+        row = self._to_row(obj)
+        obj_id = self.remote.insert(self.table, [row])[0] if self.remote is not None else None
+        with self.store.transaction():
+            cur = self.conn.execute(self._insert_sql(), (obj_id, *row))
+            self._bump_version()
+        obj.id = cur.lastrowid
+        self._notify(None, obj)
+        return obj.id
+
+    @INSTRUMENTS.timed_query
+    def insert_many(self, objs):
+        # Bulk insert without per-row observer calls; callers rebuild the
+        # in-memory indexes afterwards with DataStore.reload_indexes()
+        rows = (self._to_row(obj) for obj in objs)
+        if self.remote is not None:
+            rows = list(rows)
+            keyed = zip(self.remote.insert(self.table, rows), rows)
+        else:
+            keyed = ((None, row) for row in rows)
+        with self.store.transaction(), self.store.bulk_insert(self.table):
+            self.conn.executemany(self._insert_sql(), ((obj_id, *row) for obj_id, row in keyed))
+            self._bump_version()
+
+    @INSTRUMENTS.timed_query
+    def update(self, obj):
+        old = self.get(obj.id) if self.observers else None
+        assignments = ", ".join(f"{col} = ?" for col in self.columns)
+        if self.remote is not None:
+            self.remote.update(self.table, [(obj.id, self._to_row(obj))])
+        with self.store.transaction():
+            self.conn.execute(
+                f"UPDATE {self.table} SET {assignments} WHERE id = ?",
+                (*self._to_row(obj), obj.id),
+            )
+            self._bump_version()
+        if old is not None:
+            self._notify(old, obj)
+
+    @INSTRUMENTS.timed_query
+    def update_many(self, objs):
+        # A batch of edits in one transaction; observers still see each row
+        olds = {old.id: old for old in self.get_many([obj.id for obj in objs])} if self.observers else {}
+        assignments = ", ".join(f"{col} = ?" for col in self.columns)
+        if self.remote is not None:
+            self.remote.update(self.table, [(obj.id, self._to_row(obj)) for obj in objs])
+        with self.store.transaction():
+            self.conn.executemany(
+                f"UPDATE {self.table} SET {assignments} WHERE id = ?",
+                ((*self._to_row(obj), obj.id) for obj in objs),
+            )
+            self._bump_version()
+        for obj in objs:
+            old = olds.get(obj.id)
+            if old is not None:
+                self._notify(old, obj)
+
+    @INSTRUMENTS.timed_query
+    def delete(self, obj_id):
+        old = self.get(obj_id) if self.observers else None
+        if self.remote is not None:
+            self.remote.delete(self.table, [obj_id])
+        with self.store.transaction():
+            self.conn.execute(f"DELETE FROM {self.table} WHERE id = ?", (obj_id,))
+            self._bump_version()
+        if old is not None:
+            self._notify(old, None)
+
+    @INSTRUMENTS.timed_query
+    def delete_many(self, ids):
+        olds = self.get_many(ids) if self.observers else []
+        if self.remote is not None:
+            self.remote.delete(self.table, list(ids))
+        with self.store.transaction():
+            self.conn.executemany(f"DELETE FROM {self.table} WHERE id = ?", ((obj_id,) for obj_id in ids))
+            self._bump_version()
+        for old in olds:
+            self._notify(old, None)
+
+    def apply_remote(self, rows, deleted_ids):
+        # Changes already committed on the server: rows are (id, *columns)
+        # and are written locally without being sent back. Rows that match
+        # what is already here (a terminal's own writes echoed back) are
+        # skipped, so observers only hear about real changes.
+        rows = [tuple(row) for row in rows]
+        deleted_ids = list(deleted_ids)
+        olds = {old.id: old for old in self.get_many([row[0] for row in rows] + deleted_ids)}
+        changed = [row for row in rows if row[0] not in olds or self._to_row(olds[row[0]]) != row[1:]]
+        gone = [obj_id for obj_id in deleted_ids if obj_id in olds]
+        if not changed and not gone:
+            return
+        # Existing rows are updated rather than replaced, so the rollup
+        # triggers see the old values leave
+        assignments = ", ".join(f"{col} = ?" for col in self.columns)
+        with self.store.transaction():
+            self.conn.executemany(self._insert_sql(), (row for row in changed if row[0] not in olds))
+            self.conn.executemany(
+                f"UPDATE {self.table} SET {assignments} WHERE id = ?",
+                ((*row[1:], row[0]) for row in changed if row[0] in olds),
+            )
+            self.conn.executemany(f"DELETE FROM {self.table} WHERE id = ?", ((obj_id,) for obj_id in gone))
+            self._bump_version()
+        for row in changed:
+            self._notify(olds.get(row[0]), self._from_row(row))
+        for obj_id in gone:
+            self._notify(olds[obj_id], None)
+
+    def replace_rows(self, rows):
+        # The whole table from a server snapshot, without observer calls;
+        # callers rebuild the in-memory indexes with reload_indexes()
+        with self.store.transaction(), self.store.paused(self.table):
+            self.conn.execute(f"DELETE FROM {self.table}")
+            self.conn.executemany(self._insert_sql(), rows)
+            self._bump_version()
+
+    @INSTRUMENTS.timed_query
+    def get(self, obj_id):
+        row = self.conn.execute(f"{self._select()} WHERE id = ?", (obj_id,)).fetchone()
+        return self._from_row(row) if row else None
+
+    @INSTRUMENTS.timed_query
+    def get_many(self, ids):
+        # Objects for the given ids, in the order given
+        found = {}
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            marks = ", ".join("?" for _ in chunk)
+            for row in self.conn.execute(f"{self._select()} WHERE id IN ({marks})", chunk):
+                found[row[0]] = self._from_row(row)
+        return [found[obj_id] for obj_id in ids if obj_id in found]
+
+    @INSTRUMENTS.timed_query
+    def count(self):
+        return self.conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def all(self):
+        return list(self.iter_all())
+
+    def iter_all(self):
+        for row in self.conn.execute(f"{self._select()} ORDER BY {self.order_by}"):
+            yield self._from_row(row)
+
+    def key_values(self, obj):
+        return (obj.id,)
+
+    def sort_key(self, obj):
+        # Python-side equivalent of order_by, used to bisect loaded rows
+        values = self.key_values(obj)
+        return tuple(-v for v in values) if self.descending else values
+
+    def key_id(self, key):
+        return -key[-1] if self.descending else key[-1]
+
+    @INSTRUMENTS.timed_query
+    def page(self, after, limit):
+        # Next `limit` rows in display order following the object `after`
+        if after is None:
+            cur = self.conn.execute(f"{self._select()} ORDER BY {self.order_by} LIMIT ?", (limit,))
+        else:
+            op = "<" if self.descending else ">"
+            keys = ", ".join(self.key_columns)
+            marks = ", ".join("?" for _ in self.key_columns)
+            cur = self.conn.execute(
+                f"{self._select()} WHERE ({keys}) {op} ({marks}) ORDER BY {self.order_by} LIMIT ?",
+                (*self.key_values(after), limit),
+            )
+        return [self._from_row(row) for row in cur]
+
+    @INSTRUMENTS.timed_query
+    def query_range(self, start, end):
+        # Inclusive range over the indexed range column
+        cur = self.conn.execute(
+            f"{self._select()} WHERE {self.range_column} BETWEEN ? AND ? ORDER BY {self.order_by}",
+            (start, end),
+        )
+        return [self._from_row(row) for row in cur]
+
+
+class FinancialRepository(Repository):
+    table = "financial_records"
+    columns = ("day", "description", "amount", "record_type")
+    range_column = "day"
+    order_by = "day DESC, id DESC"
+    key_columns = ("day", "id")
+    descending = True
+
+    def _to_row(self, record):
+        return (record.day, record.description, record.paisa, record.record_type)
+
+    def _from_row(self, row):
+        return FinancialRecord.from_values(*row)
+
+    def key_values(self, record):
+        return (record.day, record.id)
+
+    @INSTRUMENTS.timed_query
+    def query_range(self, start, end):
+        return list(self.iter_range(start, end))
+
+    def iter_range(self, start, end):
+        # Reports list a date range oldest first
+        cur = self.conn.execute(
+            f"{self._select()} WHERE day BETWEEN ? AND ? ORDER BY day, id",
+            (to_day(start), to_day(end)),
+        )
+        for row in cur:
+            yield self._from_row(row)
+
+    @INSTRUMENTS.timed_query
+    def count_range(self, start, end):
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM financial_records WHERE day BETWEEN ? AND ?",
+            (to_day(start), to_day(end)),
+        ).fetchone()[0]
+
+    @INSTRUMENTS.timed_query
+    def totals(self, start=None, end=None):
+        # Returns (income, expense) in PKR, optionally limited to a date range
+        sql = "SELECT record_type, SUM(amount) FROM financial_records"
+        params = ()
+        if start is not None and end is not None:
+            sql += " WHERE day BETWEEN ? AND ?"
+            params = (to_day(start), to_day(end))
+        sums = dict(self.conn.execute(sql + " GROUP BY record_type", params).fetchall())
+        return from_paisa(sums.get("Income") or 0), from_paisa(sums.get("Expense") or 0)
+
+    @INSTRUMENTS.timed_query
+    def recent(self, limit):
+        cur = self.conn.execute(f"{self._select()} ORDER BY day DESC, id DESC LIMIT ?", (limit,))
+        return [self._from_row(row) for row in cur]
+
+
+class InventoryRepository(Repository):
+    table = "inventory_items"
+    columns = ("name", "quantity", "unit_price", "supplier", "last_updated")
+    range_column = "name"
+    order_by = "name, id"
+    key_columns = ("name", "id")
+
+    def _to_row(self, item):
+        return (item.name, item.quantity, item.price_paisa, item.supplier, item.updated_day)
+
+    def _from_row(self, row):
+        return InventoryItem.from_values(*row)
+
+    def key_values(self, item):
+        return (item.name, item.id)
+
+    @INSTRUMENTS.timed_query
+    def totals(self):
+        # Returns (unique items, total quantity, total stock value in PKR)
+        count, quantity, value = self.conn.execute(
+            "SELECT COUNT(*), SUM(quantity), SUM(quantity * unit_price) FROM inventory_items"
+        ).fetchone()
+        return count, quantity or 0, from_paisa(value or 0)
+
+
+class CustomerRepository(Repository):
+    table = "customers"
+    columns = ("name", "contact_number", "address", "email")
+    range_column = "name"
+    order_by = "name, id"
+    key_columns = ("name", "id")
+
+    def _to_row(self, customer):
+        return (customer.name, customer.contact_number, customer.address, customer.email)
+
+    def _from_row(self, row):
+        return Customer(row[1], row[2], row[3], row[4], id=row[0])
+
+    def key_values(self, customer):
+        return (customer.name, customer.id)
+
+
+# ---------------------------------------------------------------------------
+# Rollups: per-day, per-month and per-category ledger totals kept in the
+# database by triggers, so reports over years read a few hundred rows
+# ---------------------------------------------------------------------------
+
+ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollup_state (
+    one INTEGER PRIMARY KEY CHECK (one = 1),
+    live INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rollup_daily (
+    day INTEGER NOT NULL,
+    record_type TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (day, record_type)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollup_monthly (
+    month INTEGER NOT NULL,
+    record_type TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (month, record_type)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollup_category (
+    record_type TEXT NOT NULL,
+    month INTEGER NOT NULL,
+    description TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (record_type, month, description)
+) WITHOUT ROWID;
+"""
+
+# civil_month() in SQL; a whole Julian day number is noon of that date
+MONTH_SQL = "(CAST(strftime('%Y', {day}) AS INTEGER) * 12 + CAST(strftime('%m', {day}) AS INTEGER) - 1)"
+
+# Rollup table -> its key columns
+ROLLUP_KEYS = {
+    "rollup_daily": ("day", "record_type"),
+    "rollup_monthly": ("month", "record_type"),
+    "rollup_category": ("record_type", "month", "description"),
+}
+
+
+def rollup_key_sql(column, row):
+    # Expression for a rollup key column over a financial_records row
+    if column == "month":
+        return MONTH_SQL.format(day=f"{row}day")
+    return f"{row}{column}"
+
+
+def rollup_add_sql(table, row, where=None):
+    # Adds the amounts of NEW (row="NEW.") or of the financial_records rows
+    # matching `where` (row=""), grouped, into the rollup table. The grouped
+    # form reads the table itself: walking an index for it is much slower.
+    keys = ROLLUP_KEYS[table]
+    values = ", ".join(rollup_key_sql(column, row) for column in keys)
+    if where is not None:
+        values = f"SELECT {values}, SUM(amount), COUNT(*) FROM financial_records NOT INDEXED " \
+                 f"WHERE {where} GROUP BY {', '.join(str(i + 1) for i in range(len(keys)))}"
+    else:
+        values = f"VALUES ({values}, {row}amount, 1)"
+    return (f"INSERT INTO {table} ({', '.join(keys)}, total, count) {values} "
+            f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET "
+            "total = total + excluded.total, count = count + excluded.count")
+
+
+def rollup_remove_sql(table, row):
+    match = " AND ".join(f"{column} = {rollup_key_sql(column, row)}" for column in ROLLUP_KEYS[table])
+    return (f"UPDATE {table} SET total = total - {row}amount, count = count - 1 WHERE {match};\n"
+            f"    DELETE FROM {table} WHERE {match} AND count = 0")
+
+
+def rollup_statements(build, row):
+    return ";\n    ".join(build(table, row) for table in ROLLUP_KEYS) + ";"
+
+
+ROLLUP_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS rollup_insert AFTER INSERT ON financial_records
+WHEN (SELECT live FROM rollup_state) = 1
+BEGIN
+    {add_new}
+END;
+CREATE TRIGGER IF NOT EXISTS rollup_update AFTER UPDATE OF day, description, amount, record_type
+ON financial_records
+WHEN (SELECT live FROM rollup_state) = 1
+BEGIN
+    {remove_old}
+    {add_new}
+END;
+CREATE TRIGGER IF NOT EXISTS rollup_delete AFTER DELETE ON financial_records
+WHEN (SELECT live FROM rollup_state) = 1
+BEGIN
+    {remove_old}
+END;
+""".format(
+    add_new=rollup_statements(rollup_add_sql, "NEW."),
+    remove_old=rollup_statements(rollup_remove_sql, "OLD."),
+)
+
+
+class Rollups:
+    # Reads over the rollup tables for any store or reader connection. The
+    # owning SqliteStore also calls install(), which creates the tables and
+    # the triggers that update them in the same transaction as each write.
+    def __init__(self, store):
+        self.store = store
+
+    @property
+    def conn(self):
+        return self.store.conn
+
+    def install(self):
+        conn = self.conn
+        conn.executescript(ROLLUP_SCHEMA)
+        conn.executescript(ROLLUP_TRIGGERS)
+        if conn.execute("SELECT 1 FROM rollup_state").fetchone() is None:
+            # First open with rollups: fill them from the existing ledger
+            with self.store.transaction():
+                conn.execute("INSERT INTO rollup_state (one, live) VALUES (1, 1)")
+                self.rebuild()
+
+    def rebuild(self):
+        with self.store.transaction():
+            self.conn.execute("DELETE FROM rollup_daily")
+            self.conn.execute("DELETE FROM rollup_category")
+            self._add_rows(0)
+
+    def _add_rows(self, after):
+        # Ledger rows above id `after` go into the daily and category rollups
+        # with one grouped scan each; the months are then re-summed from the
+        # days, which is a few thousand rows
+        conn = self.conn
+        for table in ("rollup_daily", "rollup_category"):
+            conn.execute(rollup_add_sql(table, "", "id > ?"), (after,))
+        conn.execute("DELETE FROM rollup_monthly")
+        conn.execute(
+            "INSERT INTO rollup_monthly (month, record_type, total, count) "
+            f"SELECT {MONTH_SQL.format(day='day')}, record_type, SUM(total), SUM(count) "
+            "FROM rollup_daily GROUP BY 1, 2"
+        )
+
+    @contextmanager
+    def bulk_insert(self, table):
+        # Inside a transaction: ledger rows inserted into table are added to
+        # the rollups with one grouped statement each at the end instead of
+        # a trigger per row. New rows are the ones above the current maximum id.
+        if table != "financial_records":
+            yield
+            return
+        conn = self.conn
+        before = conn.execute("SELECT COALESCE(MAX(id), 0) FROM financial_records").fetchone()[0]
+        conn.execute("UPDATE rollup_state SET live = 0")
+        try:
+            yield
+            self._add_rows(before)
+        finally:
+            conn.execute("UPDATE rollup_state SET live = 1")
+
+    @contextmanager
+    def paused(self, table):
+        # Inside a transaction: writes that replace most of the ledger skip
+        # the triggers and the rollups are rebuilt once afterwards
+        if table != "financial_records":
+            yield
+            return
+        self.conn.execute("UPDATE rollup_state SET live = 0")
+        try:
+            yield
+            self.rebuild()
+        finally:
+            self.conn.execute("UPDATE rollup_state SET live = 1")
+
+    def day_totals(self):
+        # (day, record_type, paisa) for every day with transactions
+        return self.conn.execute("SELECT day, record_type, total FROM rollup_daily")
+
+    def type_totals(self):
+        # {record_type: paisa} over the whole ledger
+        return dict(self.conn.execute(
+            "SELECT record_type, SUM(total) FROM rollup_monthly GROUP BY record_type"
+        ).fetchall())
+
+    @staticmethod
+    def split_months(start_day, end_day):
+        # The whole months (first, last) inside the range, and the day ranges
+        # left over at either end; first > last when there are none
+        first = civil_month(start_day)
+        if month_first_day(first) != start_day:
+            first += 1
+        last = civil_month(end_day)
+        if month_first_day(last + 1) - 1 != end_day:
+            last -= 1
+        if first > last:
+            return first, last, [(start_day, end_day)]
+        return first, last, [(start_day, month_first_day(first) - 1), (month_first_day(last + 1), end_day)]
+
+    def _daily(self, start_day, end_day):
+        return self.conn.execute(
+            "SELECT day, record_type, total FROM rollup_daily WHERE day BETWEEN ? AND ?", (start_day, end_day)
+        ).fetchall()
+
+    def totals_by_period(self, period, start_day, end_day):
+        # [(bucket, income, expense)] in paisa, in bucket order; periods are
+        # those of AggregationEngine plus "year"
+        sums = {}
+
+        def add(bucket, record_type, total):
+            sums.setdefault(bucket, [0, 0])[0 if record_type == "Income" else 1] += total
+
+        if period in ("month", "year"):
+            first, last, edges = self.split_months(start_day, end_day)
+            rows = self.conn.execute(
+                "SELECT month, record_type, total FROM rollup_monthly WHERE month BETWEEN ? AND ?", (first, last)
+            ).fetchall()
+            for day_range in edges:
+                rows += [(civil_month(day), record_type, total) for day, record_type, total in self._daily(*day_range)]
+            for month, record_type, total in rows:
+                add(month // 12 if period == "year" else month, record_type, total)
+        else:
+            for day, record_type, total in self._daily(start_day, end_day):
+                add(week_start(day) if period == "week" else day, record_type, total)
+        return [(bucket, income, expense) for bucket, (income, expense) in sorted(sums.items())]
+
+    def running_balance(self, period, start_day, end_day, opening):
+        # [(bucket, income, expense, closing balance)] from an opening balance
+        balance = opening
+        rows = []
+        for bucket, income, expense in self.totals_by_period(period, start_day, end_day):
+            balance += income - expense
+            rows.append((bucket, income, expense, balance))
+        return rows
+
+    def category_totals(self, record_type, start_day, end_day):
+        # [(description, paisa)] for one record type, largest first. Partial
+        # months at the ends are summed from the ledger rows themselves.
+        first, last, edges = self.split_months(start_day, end_day)
+        sums = dict(self.conn.execute(
+            "SELECT description, SUM(total) FROM rollup_category "
+            "WHERE record_type = ? AND month BETWEEN ? AND ? GROUP BY description",
+            (record_type, first, last),
+        ).fetchall())
+        for day_range in edges:
+            for description, total in self.conn.execute(
+                "SELECT description, SUM(amount) FROM financial_records "
+                "WHERE record_type = ? AND day BETWEEN ? AND ? GROUP BY description",
+                (record_type, *day_range),
+            ):
+                sums[description] = sums.get(description, 0) + total
+        return sorted(sums.items(), key=lambda row: -row[1])
+
+
+# ---------------------------------------------------------------------------
+# Stock ledger: every change to an item's quantity or price as a dated
+# movement, with the item's running position stored on each one
+# ---------------------------------------------------------------------------
+
+STOCK_SCHEMA = """
+CREATE TABLE IF NOT EXISTS stock_state (
+    one INTEGER PRIMARY KEY CHECK (one = 1),
+    live INTEGER NOT NULL,
+    kind TEXT,
+    day INTEGER,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stock_movements (
+    id INTEGER PRIMARY KEY,
+    item_id INTEGER NOT NULL,
+    day INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    unit_cost INTEGER NOT NULL,
+    on_hand INTEGER NOT NULL,
+    in_qty INTEGER NOT NULL,
+    in_cost INTEGER NOT NULL,
+    value INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_stock_item_day ON stock_movements(item_id, day, id);
+CREATE INDEX IF NOT EXISTS idx_stock_inflow ON stock_movements(item_id, in_qty) WHERE quantity > 0;
+"""
+
+# Today's day number in SQL, for movements that carry no date of their own
+TODAY_SQL = "CAST(julianday('now', 'localtime') + 0.5 AS INTEGER)"
+
+# The latest movement of {item}
+LATEST_MOVEMENT_SQL = "(SELECT id FROM stock_movements WHERE item_id = {item} ORDER BY day DESC, id DESC LIMIT 1)"
+
+
+def stock_post_sql(source, item, day, target, cost, kind, where="1"):
+    # Appends, for each row of source, a movement that brings the item's
+    # quantity on hand to `target`. Inflows cost `cost` a unit; outflows go
+    # out at the current average cost; no change in quantity revalues the
+    # stock at `cost`. Movements are never dated before the item's latest,
+    # so each item's movements only ever grow at the end and the running
+    # columns never need rewriting. `kind` may use the computed quantity.
+    latest = LATEST_MOVEMENT_SQL.format(item=item)
+    return f"""
+    INSERT INTO stock_movements (item_id, day, kind, quantity, unit_cost, on_hand, in_qty, in_cost, value)
+    SELECT item_id, day, {kind}, quantity,
+        CASE WHEN quantity < 0 THEN average ELSE cost END,
+        held + quantity,
+        in_qty + MAX(quantity, 0),
+        in_cost + MAX(quantity, 0) * cost,
+        CASE WHEN quantity > 0 THEN value + quantity * cost
+             WHEN held + quantity <= 0 THEN 0
+             WHEN quantity < 0 THEN value + value * quantity / held
+             ELSE held * cost END
+    FROM (
+        SELECT {item} AS item_id, MAX({day}, COALESCE(p.day, {day})) AS day,
+            {target} - COALESCE(p.on_hand, 0) AS quantity, {cost} AS cost,
+            COALESCE(p.on_hand, 0) AS held, COALESCE(p.in_qty, 0) AS in_qty,
+            COALESCE(p.in_cost, 0) AS in_cost, COALESCE(p.value, 0) AS value,
+            CASE WHEN p.on_hand > 0 THEN p.value / p.on_hand ELSE 0 END AS average
+        FROM {source} LEFT JOIN stock_movements AS p ON p.id = {latest}
+    )
+    WHERE {where}"""
+
+
+# Edits are dated by their Last Updated field when it was changed, else
+# today; StockLedger.record() passes its own kind and day through stock_state
+STOCK_TRIGGERS = f"""
+CREATE TRIGGER IF NOT EXISTS stock_item_insert AFTER INSERT ON inventory_items
+WHEN (SELECT live FROM stock_state) = 1
+BEGIN
+    {stock_post_sql("(SELECT 1)", "NEW.id", "COALESCE((SELECT day FROM stock_state), NEW.last_updated)",
+                    "NEW.quantity", "NEW.unit_price", "COALESCE((SELECT kind FROM stock_state), 'opening')")};
+END;
+CREATE TRIGGER IF NOT EXISTS stock_item_update AFTER UPDATE OF quantity, unit_price ON inventory_items
+WHEN (SELECT live FROM stock_state) = 1 AND (NEW.quantity != OLD.quantity OR NEW.unit_price != OLD.unit_price)
+BEGIN
+    {stock_post_sql("(SELECT 1)", "NEW.id",
+                    "COALESCE((SELECT day FROM stock_state), "
+                    f"CASE WHEN NEW.last_updated != OLD.last_updated THEN NEW.last_updated ELSE {TODAY_SQL} END)",
+                    "NEW.quantity", "NEW.unit_price",
+                    "CASE WHEN quantity = 0 THEN 'price' ELSE COALESCE((SELECT kind FROM stock_state), 'adjustment') END")};
+END;
+CREATE TRIGGER IF NOT EXISTS stock_item_delete AFTER DELETE ON inventory_items
+WHEN (SELECT live FROM stock_state) = 1
+BEGIN
+    {stock_post_sql("(SELECT 1)", "OLD.id", TODAY_SQL, "0", "OLD.unit_price", "'removal'")};
+END;
+CREATE TRIGGER IF NOT EXISTS stock_movement_value AFTER INSERT ON stock_movements
+BEGIN
+    UPDATE stock_state SET value = value + NEW.value - COALESCE((
+        SELECT value FROM stock_movements WHERE item_id = NEW.item_id AND id != NEW.id
+        ORDER BY day DESC, id DESC LIMIT 1
+    ), 0);
+END;
+"""
+
+StockPosition = namedtuple("StockPosition", "item_id name supplier on_hand average_value fifo_value")
+
+
+class StockLedger:
+    # Receipts, sales, adjustments and price changes per inventory item.
+    # Triggers on inventory_items append a movement for every write that
+    # changes a quantity or price, in the same transaction. Each movement
+    # carries the item's position after it: quantity on hand, units and
+    # cost received so far, and the stock's value at moving-average cost.
+    # Any as-of question is then one index seek for the last movement on or
+    # before the date, plus one more into the receipts for FIFO: the units
+    # still held are the last ones received, so their cost is everything
+    # received less the cost of the first (received - on hand) units.
+    KINDS = ("receipt", "sale", "adjustment")
+    LAST_DAY = 1 << 62
+    SELECT = ("SELECT id, item_id, day, kind, quantity, unit_cost, on_hand, in_qty, in_cost, value "
+              "FROM stock_movements")
+
+    def __init__(self, store):
+        self.store = store
+        self.mirrored = False  # Client mode: movements come from the server
+
+    @property
+    def conn(self):
+        return self.store.conn
+
+    def install(self):
+        conn = self.conn
+        conn.executescript(STOCK_SCHEMA)
+        conn.executescript(STOCK_TRIGGERS)
+        if conn.execute("SELECT 1 FROM stock_state").fetchone() is None:
+            # First open with the ledger: the current stock is the opening
+            with self.store.transaction():
+                conn.execute("INSERT INTO stock_state (one, live, value) VALUES (1, 1, 0)")
+                self.rebuild()
+
+    def _open_items(self, after=0):
+        # Opening movements for the items with id > after, at their rows
+        self.conn.execute(stock_post_sql(
+            "(SELECT * FROM inventory_items WHERE id > ?) AS i", "i.id", "i.last_updated", "i.quantity",
+            "i.unit_price", "'opening'",
+        ), (after,))
+
+    def rebuild(self):
+        # Forgets the history: every item starts again from its current row
+        with self.store.transaction():
+            self.conn.execute("DELETE FROM stock_movements")
+            self.conn.execute("UPDATE stock_state SET value = 0")
+            self._open_items()
+
+    def mirror(self):
+        # Client mode: the ledger is the server's, copied with the snapshot
+        # and kept up by the change feed, so the replica's own triggers stay
+        # off. Deriving it locally would also file the server's late echoes
+        # of this terminal's writes as movements.
+        self.mirrored = True
+        self.conn.execute("UPDATE stock_state SET live = 0")
+
+    def last_id(self):
+        return self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM stock_movements").fetchone()[0]
+
+    def movements_after(self, last_id):
+        # (id, *columns) of the movements appended after last_id
+        return self.conn.execute(f"{self.SELECT} WHERE id > ? ORDER BY id", (last_id,)).fetchall()
+
+    def replace_movements(self, rows):
+        # The server's whole ledger, from a snapshot
+        with self.store.transaction():
+            self.conn.execute("DELETE FROM stock_movements")
+            self.conn.execute("UPDATE stock_state SET value = 0")
+            self.apply_remote(rows)
+
+    def apply_remote(self, rows):
+        # Movements already filed on the server, in id order; ones already
+        # here are skipped. Returns the ids of the items they belong to.
+        with self.store.transaction():
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO stock_movements "
+                "(id, item_id, day, kind, quantity, unit_cost, on_hand, in_qty, in_cost, value) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                sorted(tuple(row) for row in rows),
+            )
+            # Cached inventory reports read the ledger
+            self.store.inventory._bump_version()
+        return {row[1] for row in rows}
+
+    @contextmanager
+    def bulk_insert(self, table):
+        # Inside a transaction: new items get their opening movements from
+        # one statement at the end instead of a trigger per row
+        if table != "inventory_items" or self.mirrored:
+            yield
+            return
+        conn = self.conn
+        before = conn.execute("SELECT COALESCE(MAX(id), 0) FROM inventory_items").fetchone()[0]
+        conn.execute("UPDATE stock_state SET live = 0")
+        try:
+            yield
+            self._open_items(before)
+        finally:
+            conn.execute("UPDATE stock_state SET live = 1")
+
+    @contextmanager
+    def paused(self, table):
+        # Inside a transaction: for writes that replace the whole table
+        if table != "inventory_items" or self.mirrored:
+            yield
+            return
+        self.conn.execute("UPDATE stock_state SET live = 0")
+        try:
+            yield
+            self.rebuild()
+        finally:
+            self.conn.execute("UPDATE stock_state SET live = 1")
+
+    @contextmanager
+    def movement(self, kind, day):
+        # Inside a transaction: item writes made meanwhile are filed as
+        # `kind` on `day` instead of as edits
+        self.conn.execute("UPDATE stock_state SET kind = ?, day = ?", (kind, day))
+        try:
+            yield
+        finally:
+            self.conn.execute("UPDATE stock_state SET kind = NULL, day = NULL")
+
+    def last_day(self, item_id):
+        # Day of the item's latest movement, or None
+        return self.conn.execute(
+            "SELECT MAX(day) FROM stock_movements WHERE item_id = ?", (item_id,)
+        ).fetchone()[0]
+
+    def check_day(self, item_id, day):
+        # Movements only go at the end of an item's history, because every
+        # later position would otherwise have to be recomputed
+        last = self.last_day(item_id)
+        if last is not None and day < last:
+            raise ValidationError(
+                f"This item has movements up to {from_day(last).toString('yyyy-MM-dd')}; "
+                "a movement cannot be dated before that."
+            )
+
+    def moved(self, item, kind, quantity, unit_cost, day):
+        # The item after a receipt or sale of `quantity` units, or an
+        # adjustment by `quantity` (signed), dated `day`; unit_cost (paisa)
+        # becomes its price on receipts. `item` must be the current row.
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown stock movement {kind!r}")
+        self.check_day(item.id, day)
+        change = -quantity if kind == "sale" else quantity
+        if change == 0:
+            raise ValidationError("Quantity must not be zero.")
+        if kind != "adjustment" and quantity < 0:
+            raise ValidationError("Quantity must be positive.")
+        on_hand = item.quantity + change
+        if on_hand < 0:
+            raise ValidationError(f"Only {item.quantity:,} in stock.")
+        if on_hand > MAX_QUANTITY:
+            raise ValidationError(f"Quantity must be {MAX_QUANTITY:,} or less.")
+        price = unit_cost if kind == "receipt" else item.price_paisa
+        return InventoryItem.from_values(item.id, item.name, on_hand, price, item.supplier, day)
+
+    def record(self, item_id, kind, quantity, unit_cost, day):
+        # Files a stock movement (see moved()) against the item as stored
+        # now, not a copy a page may hold, and returns the updated item. It
+        # is written as an edit of the item, so observers and change
+        # tracking see it like any other. In client mode the server applies
+        # it to its own row, and the ledger rows reach this and the other
+        # terminals with the change feed.
+        repo = self.store.inventory
+        if repo.remote is not None:
+            row = repo.remote.record_movement(repo.table, item_id, kind, quantity, unit_cost, day)
+            repo.apply_remote([(item_id, *row)], [])
+            return repo._from_row((item_id, *row))
+        with self.store.transaction():
+            current = repo.get(item_id)
+            if current is None:
+                raise ValidationError("This item no longer exists.")
+            updated = self.moved(current, kind, quantity, unit_cost, day)
+            with self.movement(kind, day):
+                repo.update(updated)
+        return updated
+
+    def total_value(self):
+        # Stock on hand now at moving-average cost, paisa
+        return self.conn.execute("SELECT value FROM stock_state").fetchone()[0]
+
+    def _fifo_value(self, item_id, on_hand, in_qty, in_cost):
+        consumed = in_qty - on_hand
+        if consumed <= 0:
+            return in_cost
+        row = self.conn.execute(
+            "SELECT in_qty, in_cost, unit_cost FROM stock_movements "
+            "WHERE item_id = ? AND quantity > 0 AND in_qty >= ? ORDER BY in_qty LIMIT 1",
+            (item_id, consumed),
+        ).fetchone()
+        return in_cost - (row[1] - (row[0] - consumed) * row[2])
+
+    def position(self, item_id, day=LAST_DAY):
+        # (quantity, moving-average value, FIFO value) of the item at the end
+        # of day, values in paisa
+        row = self.conn.execute(
+            "SELECT on_hand, in_qty, in_cost, value FROM stock_movements "
+            "WHERE item_id = ? AND day <= ? ORDER BY day DESC, id DESC LIMIT 1",
+            (item_id, day),
+        ).fetchone()
+        if row is None:
+            return 0, 0, 0
+        on_hand, in_qty, in_cost, value = row
+        return on_hand, value, self._fifo_value(item_id, on_hand, in_qty, in_cost)
+
+    def quantity_as_of(self, item_id, day):
+        return self.position(item_id, day)[0]
+
+    def value_as_of(self, item_id, day, method="average"):
+        _, average, fifo = self.position(item_id, day)
+        return fifo if method == "fifo" else average
+
+    def positions(self, day=LAST_DAY):
+        # [StockPosition] of every item held at the end of day (items
+        # deleted since included), by name
+        rows = self.conn.execute(f"""
+            SELECT p.item_id, i.name, i.supplier, p.on_hand, p.value,
+                p.in_cost - COALESCE((
+                    SELECT r.in_cost - (r.in_qty - (p.in_qty - p.on_hand)) * r.unit_cost
+                    FROM stock_movements AS r
+                    WHERE r.item_id = p.item_id AND r.quantity > 0 AND r.in_qty >= p.in_qty - p.on_hand
+                    ORDER BY r.in_qty LIMIT 1
+                ), 0)
+            FROM (SELECT DISTINCT item_id FROM stock_movements) AS k
+            JOIN stock_movements AS p ON p.id = (
+                SELECT id FROM stock_movements WHERE item_id = k.item_id AND day <= ?
+                ORDER BY day DESC, id DESC LIMIT 1
+            )
+            LEFT JOIN inventory_items AS i ON i.id = p.item_id
+            WHERE p.kind != 'removal'
+            ORDER BY i.name, p.item_id
+        """, (day,))
+        return [StockPosition(item_id, name if name is not None else f"Item #{item_id} (deleted)",
+                              supplier or "", on_hand, average, fifo)
+                for item_id, name, supplier, on_hand, average, fifo in rows]
+
+    def history(self, item_id):
+        # [(day, kind, quantity, unit cost, on hand after, value after)]
+        return self.conn.execute(
+            "SELECT day, kind, quantity, unit_cost, on_hand, value FROM stock_movements "
+            "WHERE item_id = ? ORDER BY day, id",
+            (item_id,),
+        ).fetchall()
+
+
+class LedgerAggregates:
+    # Running totals behind the dashboard cards. They are loaded with one
+    # query at startup and then adjusted per insert/update/delete, and the
+    # recent-activity feed is a bounded list of the newest transactions.
+    RECENT_LIMIT = 5
+
+    def __init__(self, store):
+        self.store = store
+        self.income = 0  # paisa
+        self.expense = 0
+        self.inventory_count = 0
+        self.inventory_quantity = 0
+        self.inventory_value = 0  # paisa, at moving-average cost
+        self.customer_count = 0
+        self._recent = []  # [(sort_key, record)], newest first
+
+        store.financial.observers.append(self.on_financial_changed)
+        store.inventory.observers.append(self.on_inventory_changed)
+        store.customers.observers.append(self.on_customers_changed)
+        self.load()
+
+    def load(self):
+        conn = self.store.conn
+        sums = self.store.rollups.type_totals()
+        self.income = sums.get("Income") or 0
+        self.expense = sums.get("Expense") or 0
+        count, quantity = conn.execute("SELECT COUNT(*), SUM(quantity) FROM inventory_items").fetchone()
+        self.inventory_count = count
+        self.inventory_quantity = quantity or 0
+        self.inventory_value = self.store.stock.total_value()
+        self.customer_count = self.store.customers.count()
+        self._refill_recent()
+
+    def _refill_recent(self):
+        repo = self.store.financial
+        self._recent = [(repo.sort_key(r), r) for r in repo.recent(self.RECENT_LIMIT)]
+
+    def recent_records(self):
+        return [record for _, record in self._recent]
+
+    def _apply_financial(self, record, sign):
+        if record.record_type == "Income":
+            self.income += sign * record.paisa
+        else:
+            self.expense += sign * record.paisa
+
+    def on_financial_changed(self, old, new):
+        repo = self.store.financial
+        if old is not None:
+            self._apply_financial(old, -1)
+            if any(r.id == old.id for _, r in self._recent):
+                # One of the visible rows went away; the next newest may be
+                # anywhere, so re-read the top rows from the date index
+                self._refill_recent()
+        if new is not None:
+            self._apply_financial(new, 1)
+            key = repo.sort_key(new)
+            recent_ids = {r.id for _, r in self._recent}
+            if new.id not in recent_ids and (
+                len(self._recent) < self.RECENT_LIMIT or key < self._recent[-1][0]
+            ):
+                insort(self._recent, (key, new), key=lambda entry: entry[0])
+                del self._recent[self.RECENT_LIMIT:]
+
+    def on_inventory_changed(self, old, new):
+        if old is not None:
+            self.inventory_count -= 1
+            self.inventory_quantity -= old.quantity
+        if new is not None:
+            self.inventory_count += 1
+            self.inventory_quantity += new.quantity
+        # Kept by the stock ledger's triggers in the same transaction
+        self.inventory_value = self.store.stock.total_value()
+
+    def on_customers_changed(self, old, new):
+        if old is None:
+            self.customer_count += 1
+        elif new is None:
+            self.customer_count -= 1
+
+
+class FenwickTree:
+    # Binary indexed tree: point updates and prefix sums in O(log n)
+    def __init__(self, values=()):
+        self.size = len(values)
+        self.tree = [0] + list(values)
+        for i in range(1, self.size + 1):
+            parent = i + (i & -i)
+            if parent <= self.size:
+                self.tree[parent] += self.tree[i]
+
+    def add(self, index, delta):
+        index += 1
+        while index <= self.size:
+            self.tree[index] += delta
+            index += index & -index
+
+    def prefix(self, index):
+        # Sum of positions [0, index)
+        total = 0
+        while index > 0:
+            total += self.tree[index]
+            index -= index & -index
+        return total
+
+
+class BucketTotals:
+    # Income and expense per bucket (a day or a month number), answering
+    # "total between bucket a and b" in O(log n). The covered bucket range
+    # grows by doubling when a record falls outside it.
+    def __init__(self):
+        self.values = {}  # bucket -> [income, expense] in paisa
+        self.base = 0
+        self.income = FenwickTree()
+        self.expense = FenwickTree()
+
+    def _rebuild(self, first, last):
+        span = last - first + 1
+        self.base = first - span // 2
+        size = span * 2
+        income = [0] * size
+        expense = [0] * size
+        for bucket, (inc, exp) in self.values.items():
+            income[bucket - self.base] = inc
+            expense[bucket - self.base] = exp
+        self.income = FenwickTree(income)
+        self.expense = FenwickTree(expense)
+
+    def load(self, values):
+        self.values = values
+        if values:
+            self._rebuild(min(values), max(values))
+
+    def add(self, bucket, income, expense):
+        sums = self.values.setdefault(bucket, [0, 0])
+        sums[0] += income
+        sums[1] += expense
+        offset = bucket - self.base
+        if not 0 <= offset < self.income.size:
+            self._rebuild(min(self.values), max(self.values))
+            return
+        self.income.add(offset, income)
+        self.expense.add(offset, expense)
+
+    def totals(self, first, last):
+        # Inclusive bucket range, returns (income, expense) in paisa
+        lo = max(first - self.base, 0)
+        hi = min(last - self.base + 1, self.income.size)
+        if lo >= hi:
+            return 0, 0
+        return (
+            self.income.prefix(hi) - self.income.prefix(lo),
+            self.expense.prefix(hi) - self.expense.prefix(lo),
+        )
+
+
+class PeriodTotalsIndex:
+    # Per-day and per-month prefix sums over the ledger so report totals for
+    # any date range come back without reading individual transactions.
+    def __init__(self, store):
+        self.store = store
+        self.daily = BucketTotals()
+        self.monthly = BucketTotals()
+        store.financial.observers.append(self.on_financial_changed)
+        self.load()
+
+    def load(self):
+        daily = {}
+        monthly = {}
+        for day, record_type, amount in self.store.rollups.day_totals():
+            slot = 0 if record_type == "Income" else 1
+            daily.setdefault(day, [0, 0])[slot] += amount
+            monthly.setdefault(day_to_month(day), [0, 0])[slot] += amount
+        self.daily.load(daily)
+        self.monthly.load(monthly)
+
+    def _apply(self, record, sign):
+        day = record.day
+        amount = sign * record.paisa
+        income, expense = (amount, 0) if record.record_type == "Income" else (0, amount)
+        self.daily.add(day, income, expense)
+        self.monthly.add(day_to_month(day), income, expense)
+
+    def on_financial_changed(self, old, new):
+        if old is not None:
+            self._apply(old, -1)
+        if new is not None:
+            self._apply(new, 1)
+
+    def range_totals(self, start, end):
+        # (income, expense) in PKR between two QDates, inclusive
+        income, expense = self.daily.totals(to_day(start), to_day(end))
+        return from_paisa(income), from_paisa(expense)
+
+    def month_totals(self, first_month, last_month):
+        income, expense = self.monthly.totals(first_month, last_month)
+        return from_paisa(income), from_paisa(expense)
+
+    def monthly_series(self, last_month, count):
+        # Income and expense lists (paisa) for the `count` months ending at
+        # last_month, oldest first
+        values = self.monthly.values
+        months = [values.get(month, (0, 0)) for month in range(last_month - count + 1, last_month + 1)]
+        return [income for income, _ in months], [expense for _, expense in months]
+
+
+class StringPool:
+    # Interns repeated strings (descriptions, suppliers) as small integer ids
+    def __init__(self):
+        self.strings = []
+        self.ids = {}
+
+    def intern(self, text):
+        sid = self.ids.get(text)
+        if sid is None:
+            sid = len(self.strings)
+            self.strings.append(text)
+            self.ids[text] = sid
+        return sid
+
+    def __getitem__(self, sid):
+        return self.strings[sid]
+
+
+class ColumnTable:
+    # One typed array per field plus an id -> position map. Rows are kept in
+    # no particular order so removal is a swap with the last row.
+    schema = ()  # [(name, array typecode)]
+
+    def __init__(self):
+        self.ids = array("q")
+        self.columns = {name: array(code) for name, code in self.schema}
+        self.positions = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def append(self, obj_id, values):
+        self.positions[obj_id] = len(self.ids)
+        self.ids.append(obj_id)
+        for (name, _), value in zip(self.schema, values):
+            self.columns[name].append(value)
+
+    def remove(self, obj_id):
+        pos = self.positions.pop(obj_id, None)
+        if pos is None:
+            return
+        last = len(self.ids) - 1
+        if pos != last:
+            moved = self.ids[last]
+            self.ids[pos] = moved
+            self.positions[moved] = pos
+            for column in self.columns.values():
+                column[pos] = column[last]
+        self.ids.pop()
+        for column in self.columns.values():
+            column.pop()
+
+    def snapshot(self):
+        # Frozen copy of the arrays for a worker thread. String pools are
+        # append-only, so they are shared rather than copied.
+        copy = self.__class__.__new__(self.__class__)
+        copy.__dict__.update(self.__dict__)
+        copy.ids = self.ids[:]
+        copy.columns = {name: column[:] for name, column in self.columns.items()}
+        copy.positions = None
+        return copy
+
+    def values(self, obj_id):
+        pos = self.positions[obj_id]
+        return [self.columns[name][pos] for name, _ in self.schema]
+
+    def column(self, name):
+        # A NumPy copy of the column when available (arrays cannot be resized
+        # while a buffer view is alive), otherwise the array itself
+        data = self.columns[name] if name != "id" else self.ids
+        if require_numpy() is None:
+            return data
+        view = np.frombuffer(data, dtype=data.typecode)
+        result = view.copy()
+        del view
+        return result
+
+
+class FinancialColumns(ColumnTable):
+    schema = (("day", "i"), ("amount", "q"), ("type", "b"), ("description", "i"))
+    TYPE_CODES = {"Income": 0, "Expense": 1}
+    TYPE_NAMES = ("Income", "Expense")
+
+    def __init__(self):
+        super().__init__()
+        self.descriptions = StringPool()
+
+    def add(self, record):
+        self.append(record.id, (
+            record.day,
+            record.paisa,
+            self.TYPE_CODES[record.record_type],
+            self.descriptions.intern(record.description),
+        ))
+
+    def row(self, obj_id):
+        day, paisa, type_code, description = self.values(obj_id)
+        return FinancialRecord.from_values(
+            obj_id, day, self.descriptions[description], paisa, self.TYPE_NAMES[type_code]
+        )
+
+
+class InventoryColumns(ColumnTable):
+    schema = (("name", "i"), ("quantity", "q"), ("unit_price", "q"), ("supplier", "i"), ("updated", "i"))
+
+    def __init__(self):
+        super().__init__()
+        self.strings = StringPool()
+
+    def add(self, item):
+        self.append(item.id, (
+            self.strings.intern(item.name),
+            item.quantity,
+            item.price_paisa,
+            self.strings.intern(item.supplier),
+            item.updated_day,
+        ))
+
+    def row(self, obj_id):
+        name, quantity, price, supplier, updated = self.values(obj_id)
+        return InventoryItem.from_values(
+            obj_id, self.strings[name], quantity, price, self.strings[supplier], updated
+        )
+
+
+class ColumnStore:
+    # Compact in-memory copy of the ledger and inventory for aggregation.
+    # Built from one table scan on first use, then kept current by the
+    # repository observers.
+    def __init__(self, store):
+        self.store = store
+        self.loaded = False
+        self.financial = FinancialColumns()
+        self.inventory = InventoryColumns()
+        store.financial.observers.append(self.on_financial_changed)
+        store.inventory.observers.append(self.on_inventory_changed)
+
+    def reset(self):
+        # Drop the columns; they are rebuilt on next use
+        self.loaded = False
+        self.financial = FinancialColumns()
+        self.inventory = InventoryColumns()
+
+    def ensure_loaded(self):
+        if self.loaded:
+            return self
+        conn = self.store.conn
+        for row in conn.execute(self.store.financial._select()):
+            self.financial.add(FinancialRecord.from_values(*row))
+        for row in conn.execute(self.store.inventory._select()):
+            self.inventory.add(InventoryItem.from_values(*row))
+        self.loaded = True
+        return self
+
+    def snapshot(self):
+        self.ensure_loaded()
+        return ColumnSnapshot(self)
+
+    def on_financial_changed(self, old, new):
+        if not self.loaded:
+            return
+        if old is not None:
+            self.financial.remove(old.id)
+        if new is not None:
+            self.financial.add(new)
+
+    def on_inventory_changed(self, old, new):
+        if not self.loaded:
+            return
+        if old is not None:
+            self.inventory.remove(old.id)
+        if new is not None:
+            self.inventory.add(new)
+
+
+class ColumnSnapshot:
+    def __init__(self, columns):
+        self.financial = columns.financial.snapshot()
+        self.inventory = columns.inventory.snapshot()
+
+
+def civil_month(day):
+    # Julian day number -> consecutive month number. Integer-only arithmetic,
+    # so it works on plain ints and NumPy arrays alike.
+    a = day + 32044
+    b = (4 * a + 3) // 146097
+    c = a - 146097 * b // 4
+    d = (4 * c + 3) // 1461
+    e = c - 1461 * d // 4
+    m = (5 * e + 2) // 153
+    month = m + 3 - 12 * (m // 10)
+    year = 100 * b + d - 4800 + m // 10
+    return year * 12 + month - 1
+
+
+def week_start(day):
+    # Julian day 0 is a Monday
+    return day - day % 7
+
+
+class AggregationEngine:
+    # Group-by totals over the column store. With NumPy each query is a
+    # masked sort + reduceat over the arrays; without it, a single dict pass.
+    PERIODS = ("day", "week", "month")
+
+    def __init__(self, store, columns=None):
+        self.store = store
+        self._columns = columns
+
+    @property
+    def columns(self):
+        return self._columns or self.store.columns.ensure_loaded()
+
+    def snapshot(self):
+        # Engine over copied columns, safe to query from a worker thread
+        return AggregationEngine(self.store, self.store.columns.snapshot())
+
+    def opening_balance(self, start_day):
+        income, expense = self.store.period_totals.daily.totals(-(1 << 62), start_day - 1)
+        return income - expense
+
+    def _ledger(self, start_day, end_day):
+        table = self.columns.financial
+        days = table.column("day")
+        amounts = table.column("amount")
+        types = table.column("type")
+        descriptions = table.column("description")
+        if np is not None:
+            mask = (days >= start_day) & (days <= end_day)
+            return (days[mask].astype(np.int64), amounts[mask], types[mask].astype(np.int64),
+                    descriptions[mask].astype(np.int64))
+        rows = [i for i, day in enumerate(days) if start_day <= day <= end_day]
+        return ([days[i] for i in rows], [amounts[i] for i in rows],
+                [types[i] for i in rows], [descriptions[i] for i in rows])
+
+    @staticmethod
+    def _group_sum(keys, values):
+        # Sorted unique keys and the exact integer sum of values per key
+        if np is not None:
+            if len(keys) == 0:
+                return [], []
+            order = np.argsort(keys, kind="stable")
+            keys = keys[order]
+            starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+            return keys[starts].tolist(), np.add.reduceat(values[order], starts).tolist()
+        sums = {}
+        for key, value in zip(keys, values):
+            sums[key] = sums.get(key, 0) + value
+        ordered = sorted(sums)
+        return ordered, [sums[key] for key in ordered]
+
+    @staticmethod
+    def _bucket(days, period):
+        if period == "day":
+            return days
+        func = civil_month if period == "month" else week_start
+        return func(days) if np is not None else [func(day) for day in days]
+
+    def totals_by_period(self, period, start_day, end_day):
+        # [(bucket, income, expense)] in paisa, in bucket order
+        days, amounts, types, _ = self._ledger(start_day, end_day)
+        buckets = self._bucket(days, period)
+        if np is not None:
+            keys = buckets * 2 + types
+        else:
+            keys = [bucket * 2 + type_code for bucket, type_code in zip(buckets, types)]
+        rows = {}
+        for key, total in zip(*self._group_sum(keys, amounts)):
+            rows.setdefault(key // 2, [0, 0])[key % 2] = total
+        return [(bucket, income, expense) for bucket, (income, expense) in sorted(rows.items())]
+
+    def running_balance(self, period, start_day, end_day, opening=None):
+        # Opening balance carried in from before start_day, and
+        # [(bucket, income, expense, closing balance)] per period
+        if opening is None:
+            opening = self.opening_balance(start_day)
+        balance = opening
+        rows = []
+        for bucket, income, expense in self.totals_by_period(period, start_day, end_day):
+            balance += income - expense
+            rows.append((bucket, income, expense, balance))
+        return opening, rows
+
+    def totals_by_type(self, start_day, end_day):
+        _, amounts, types, _ = self._ledger(start_day, end_day)
+        keys, sums = self._group_sum(types, amounts)
+        return [(FinancialColumns.TYPE_NAMES[key], total) for key, total in zip(keys, sums)]
+
+    def expense_by_category(self, start_day, end_day):
+        # Expense totals per description, largest first
+        _, amounts, types, descriptions = self._ledger(start_day, end_day)
+        expense = FinancialColumns.TYPE_CODES["Expense"]
+        if np is not None:
+            mask = types == expense
+            keys, sums = self._group_sum(descriptions[mask], amounts[mask])
+        else:
+            pairs = [(d, a) for d, a, t in zip(descriptions, amounts, types) if t == expense]
+            keys, sums = self._group_sum([d for d, _ in pairs], [a for _, a in pairs])
+        pool = self.columns.financial.descriptions
+        return sorted(((pool[key], total) for key, total in zip(keys, sums)), key=lambda row: -row[1])
+
+    def inventory_by_supplier(self):
+        # [(supplier, quantity, value in paisa)], most valuable first
+        table = self.columns.inventory
+        suppliers = table.column("supplier")
+        quantities = table.column("quantity")
+        if np is not None:
+            suppliers = suppliers.astype(np.int64)
+            values = quantities * table.column("unit_price")
+        else:
+            values = [q * p for q, p in zip(quantities, table.column("unit_price"))]
+        keys, qty_sums = self._group_sum(suppliers, quantities)
+        _, value_sums = self._group_sum(suppliers, values)
+        pool = table.strings
+        rows = [(pool[key], qty, value) for key, qty, value in zip(keys, qty_sums, value_sums)]
+        return sorted(rows, key=lambda row: -row[2])
+
+
+TOKEN_RE = re.compile(r"[^\W_]+")
+
+
+def search_tokens(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+class SearchIndex:
+    # Token-level inverted index for the search bars. Every searchable field
+    # is split into lowercase words and each distinct word keeps the ids of
+    # the rows containing it. The distinct words are also concatenated into
+    # one newline-separated string, so the words containing a typed fragment
+    # are found with str.find (a C-speed scan over distinct words only) plus
+    # a bisect over their start offsets. Fragments shorter than three
+    # characters match word prefixes. Built from one scan, normally on a
+    # worker thread right after startup, then maintained by the repository
+    # observers.
+    STATE = ("token_ids", "postings", "row_tokens", "sort_keys", "blob", "offsets")
+
+    def __init__(self, repo, fields, observe=True):
+        self.repo = repo
+        self.fields = fields  # obj -> iterable of searchable strings
+        self.built = False
+        self._pending = None  # Changes seen while a background build runs
+        self._generation = 0  # Tags background builds; stale results are dropped
+        self._signals = None
+        if observe:
+            repo.observers.append(self.on_changed)
+
+    def reset(self):
+        self.built = False
+        self._pending = None
+
+    def build_in_background(self, db_path, attr):
+        # attr names the repository on a StoreReader ("financial", ...)
+        if self.built or self._pending is not None:
+            return
+        if self._signals is None:
+            # Owned by the index rather than the auto-deleted runnable, so it
+            # outlives any queued delivery
+            self._signals = IndexBuildSignals()
+            self._signals.built.connect(self._install)
+        self._pending = []
+        self._generation += 1
+        job = IndexBuildJob(self, db_path, attr)
+        QThreadPool.globalInstance().start(job)
+
+    def _install(self, generation, index):
+        if generation != self._generation or self._pending is None:
+            return  # Reset or built synchronously in the meantime
+        for name in self.STATE:
+            setattr(self, name, getattr(index, name))
+        self.built = True
+        pending, self._pending = self._pending, None
+        for old, new in pending:
+            self.on_changed(old, new)
+
+    def ensure_built(self):
+        if self.built:
+            return
+        self._pending = None
+        self.token_ids = {}
+        self.postings = []  # token id -> set of row ids
+        self.row_tokens = {}  # row id -> token ids
+        self.sort_keys = {}  # row id -> display-order key
+        for obj in self.repo.iter_all():
+            self._index(obj)
+        # Words are numbered in insertion order, which the dict preserves
+        self.blob = "".join("\n" + token for token in self.token_ids)
+        self.offsets = array("q")
+        position = 0
+        for token in self.token_ids:
+            self.offsets.append(position)
+            position += len(token) + 1
+        self.built = True
+
+    def _index(self, obj):
+        # Returns the words seen for the first time
+        new_tokens = []
+        tids = set()
+        for text in self.fields(obj):
+            for token in TOKEN_RE.findall(text.lower()):
+                tid = self.token_ids.get(token)
+                if tid is None:
+                    tid = self.token_ids[token] = len(self.postings)
+                    self.postings.append(set())
+                    new_tokens.append(token)
+                tids.add(tid)
+        for tid in tids:
+            self.postings[tid].add(obj.id)
+        self.row_tokens[obj.id] = tuple(tids)
+        self.sort_keys[obj.id] = self.repo.sort_key(obj)
+        return new_tokens
+
+    def on_changed(self, old, new):
+        if self._pending is not None:
+            self._pending.append((old, new))
+            return
+        if not self.built:
+            return
+        if old is not None:
+            for tid in self.row_tokens.pop(old.id, ()):
+                self.postings[tid].discard(old.id)
+            self.sort_keys.pop(old.id, None)
+        if new is not None:
+            for token in self._index(new):
+                self.offsets.append(len(self.blob))
+                self.blob += "\n" + token
+
+    def _matching_tokens(self, fragment):
+        needle = "\n" + fragment if len(fragment) < 3 else fragment
+        find = self.blob.find
+        offsets = self.offsets
+        tids = []
+        pos = find(needle)
+        while pos >= 0:
+            tid = bisect_right(offsets, pos) - 1
+            tids.append(tid)
+            # Continue after this word; a word only needs to match once
+            next_start = offsets[tid + 1] if tid + 1 < len(offsets) else len(self.blob)
+            pos = find(needle, next_start)
+        return tids
+
+    def search(self, query):
+        # Display-order keys of the rows matching every word of the query,
+        # or None for an empty query
+        fragments = search_tokens(query)
+        if not fragments:
+            return None
+        self.ensure_built()
+        matches = None
+        for fragment in sorted(fragments, key=len, reverse=True):
+            ids = set()
+            for tid in self._matching_tokens(fragment):
+                ids |= self.postings[tid]
+            matches = ids if matches is None else matches & ids
+            if not matches:
+                return []
+        return sorted(self.sort_keys[obj_id] for obj_id in matches)
+
+
+class IndexBuildSignals(QObject):
+    built = pyqtSignal(int, object)
+
+
+class IndexBuildJob(QRunnable):
+    # Builds a detached SearchIndex from its own read connection and hands
+    # it back to the GUI thread to be installed
+    def __init__(self, index, db_path, attr):
+        super().__init__()
+        self.fields = index.fields
+        self.db_path = db_path
+        self.attr = attr
+        self.generation = index._generation
+        self.signals = index._signals
+
+    @INSTRUMENTS.timed()
+    def run(self):
+        reader = StoreReader(self.db_path)
+        try:
+            index = SearchIndex(getattr(reader, self.attr), self.fields, observe=False)
+            index.ensure_built()
+            self.signals.built.emit(self.generation, index)
+        finally:
+            reader.close()
+
+
+class StoreReader:
+    # Separate read-only connection for worker threads; WAL mode lets it read
+    # a consistent snapshot while the GUI thread keeps writing.
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA query_only=ON")
+        self.financial = FinancialRepository(self)
+        self.inventory = InventoryRepository(self)
+        self.customers = CustomerRepository(self)
+        self.rollups = Rollups(self)
+        self.stock = StockLedger(self)
+
+    def close(self):
+        self.conn.close()
+
+
+class ChangeBus(QObject):
+    # Data-change notifications for the UI. Repository writes are collected
+    # per table and delivered once per frame as typed signals carrying the
+    # affected ids, so a burst of writes costs one UI update. Changes that
+    # cancel out within a frame (insert then delete) are dropped.
+    FRAME_MS = 16
+    INSERTED, UPDATED, REMOVED = range(3)
+    TABLES = ("financial", "inventory", "customers")
+
+    recordsInserted = pyqtSignal(list)
+    recordsUpdated = pyqtSignal(list)
+    recordsRemoved = pyqtSignal(list)
+    itemsInserted = pyqtSignal(list)
+    itemsUpdated = pyqtSignal(list)
+    itemsRemoved = pyqtSignal(list)
+    customersInserted = pyqtSignal(list)
+    customersUpdated = pyqtSignal(list)
+    customersRemoved = pyqtSignal(list)
+    # Names of the tables touched in the frame, after the typed signals
+    changed = pyqtSignal(list)
+    # Everything must be re-read (bulk writes that bypassed the observers)
+    dataReset = pyqtSignal()
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self._signals = {
+            "financial": (self.recordsInserted, self.recordsUpdated, self.recordsRemoved),
+            "inventory": (self.itemsInserted, self.itemsUpdated, self.itemsRemoved),
+            "customers": (self.customersInserted, self.customersUpdated, self.customersRemoved),
+        }
+        self._pending = {name: {} for name in self.TABLES}  # id -> change kind
+        self._reset = False
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(self.FRAME_MS)
+        self._timer.timeout.connect(self.flush)
+        for name in self.TABLES:
+            getattr(store, name).observers.append(
+                lambda old, new, name=name: self._record(name, old, new)
+            )
+
+    def _record(self, name, old, new):
+        pending = self._pending[name]
+        if old is None:
+            # SQLite may hand a just-deleted id out again
+            replaced = pending.get(new.id) == self.REMOVED
+            pending[new.id] = self.UPDATED if replaced else self.INSERTED
+        elif new is None:
+            if pending.get(old.id) == self.INSERTED:
+                del pending[old.id]
+            else:
+                pending[old.id] = self.REMOVED
+        else:
+            pending.setdefault(new.id, self.UPDATED)
+        # Not restarted by later writes, so a long burst still flushes
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def reset(self):
+        self._reset = True
+        self._timer.start()
+
+    def flush(self):
+        # Delivers whatever is pending now; also called by the frame timer
+        self._timer.stop()
+        if self._reset:
+            self._reset = False
+            self._pending = {name: {} for name in self.TABLES}
+            self.dataReset.emit()
+            return
+        touched = []
+        for name in self.TABLES:
+            pending = self._pending[name]
+            if not pending:
+                continue
+            self._pending[name] = {}
+            groups = ([], [], [])
+            for obj_id, kind in pending.items():
+                groups[kind].append(obj_id)
+            for signal, ids in zip(self._signals[name], groups):
+                if ids:
+                    signal.emit(ids)
+            touched.append(name)
+        if touched:
+            self.changed.emit(touched)
+
+
+class Checkpointer(threading.Thread):
+    # SQLite's write-ahead log is the journal. With synchronous=NORMAL a
+    # commit only appends to the WAL, so single-row writes never wait for the
+    # disk on the GUI thread. This thread makes them durable in groups:
+    # GROUP_MS after the first unsynced commit it checkpoints, which fsyncs
+    # the WAL and then the database, so a power cut loses at most that window.
+    # Once writes have been idle for COMPACT_S it truncates the WAL back to
+    # nothing (the snapshot is the database file itself). SQLite's own
+    # auto-checkpoint on the writing connection still bounds the WAL during
+    # long bursts; it finds most pages already copied by this thread.
+    GROUP_MS = 500
+    COMPACT_S = 30
+
+    def __init__(self, path):
+        super().__init__(name="wal-checkpointer", daemon=True)
+        self.path = path
+        self.syncs = 0
+        self.compactions = 0
+        self._pending = threading.Event()  # commits not yet synced
+        self._closing = threading.Event()
+        self._idle = threading.Event()  # set while nothing is pending
+        self._idle.set()
+
+    def committed(self):
+        self._idle.clear()
+        self._pending.set()
+
+    def wait_synced(self, timeout=None):
+        return self._idle.wait(timeout)
+
+    def stop(self):
+        self._closing.set()
+        self._pending.set()
+        self.join()
+
+    def run(self):
+        conn = sqlite3.connect(self.path, isolation_level=None, timeout=1.0)
+        try:
+            compact_due = False
+            # stop() may land during a group, whose clear() then swallows its
+            # wake-up, so closing is checked before every wait too
+            while not self._closing.is_set():
+                woke = self._pending.wait(self.COMPACT_S if compact_due else None)
+                if self._closing.is_set():
+                    break
+                if not woke:
+                    self._checkpoint(conn, "TRUNCATE")
+                    self.compactions += 1
+                    compact_due = False
+                    continue
+                # Let more commits join this group
+                self._closing.wait(self.GROUP_MS / 1000)
+                self._pending.clear()
+                self._checkpoint(conn, "PASSIVE")
+                self.syncs += 1
+                compact_due = True
+                if not self._pending.is_set():
+                    self._idle.set()
+        finally:
+            conn.close()
+            self._idle.set()
+
+    def _checkpoint(self, conn, mode):
+        # Busy (a reader or writer in the way) only means a later round
+        # finishes the job
+        try:
+            conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+        except sqlite3.OperationalError:
+            pass
+
+
+class SqliteStore:
+    # The database connection, transactions and repositories. DataStore adds
+    # the in-memory indexes the GUI reads from; the server uses this alone
+    # (with check_same_thread off, its callers serialise access).
+    def __init__(self, path, check_same_thread=True):
+        self.path = path
+        # A WAL left behind means the last session did not close cleanly;
+        # SQLite replays it when the connection first reads, and the
+        # checkpointer folds it into the database off the GUI thread
+        wal = path + "-wal"
+        self.recovered_wal = os.path.exists(wal) and os.path.getsize(wal) > 0
+        # Autocommit mode; writes are grouped explicitly with transaction()
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=check_same_thread)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._depth = 0
+        self.checkpointer = Checkpointer(path)
+        self.checkpointer.start()
+        if self.recovered_wal:
+            self.checkpointer.committed()
+
+        self.financial = FinancialRepository(self)
+        self.inventory = InventoryRepository(self)
+        self.customers = CustomerRepository(self)
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO data_versions (tbl, version) VALUES (?, abs(random()))",
+            ((repo.table,) for repo in self.repositories),
+        )
+        self.rollups = Rollups(self)
+        self.rollups.install()
+        self.stock = StockLedger(self)
+        self.stock.install()
+        self.branch = BranchSync(self)
+
+    @property
+    def repositories(self):
+        return (self.financial, self.inventory, self.customers)
+
+    @contextmanager
+    def transaction(self):
+        # Nested calls join the outermost transaction
+        if self._depth == 0:
+            self.conn.execute("BEGIN")
+        self._depth += 1
+        try:
+            yield
+        except BaseException:
+            self._depth -= 1
+            if self._depth == 0:
+                self.conn.execute("ROLLBACK")
+            raise
+        self._depth -= 1
+        if self._depth == 0:
+            self.conn.execute("COMMIT")
+            self.checkpointer.committed()
+
+    @contextmanager
+    def bulk_insert(self, table):
+        # Change tracking, rollups and the stock ledger catch up on a batch
+        # of inserted rows in one pass instead of a trigger call per row
+        with self.branch.bulk_insert(table), self.rollups.bulk_insert(table), self.stock.bulk_insert(table):
+            yield
+
+    @contextmanager
+    def paused(self, table):
+        # Derived tables are rebuilt once after the whole table is replaced
+        with self.rollups.paused(table), self.stock.paused(table):
+            yield
+
+    def sync(self):
+        # Make every commit so far durable now instead of at the next group
+        self.conn.execute("PRAGMA wal_checkpoint(FULL)").fetchone()
+
+    def close(self):
+        # A clean shutdown leaves everything in the database file
+        self.checkpointer.stop()
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        self.conn.close()
+
+
+class DataStore(SqliteStore):
+    def __init__(self, path=DB_PATH):
+        super().__init__(path)
+        self.aggregates = LedgerAggregates(self)
+        self.period_totals = PeriodTotalsIndex(self)
+        self.columns = ColumnStore(self)
+        self.engine = AggregationEngine(self)
+        self.search = {
+            "financial": SearchIndex(self.financial, lambda r: (r.description,)),
+            "inventory": SearchIndex(self.inventory, lambda i: (i.name, i.supplier)),
+            "customers": SearchIndex(
+                self.customers,
+                lambda c: (c.name, c.contact_number, re.sub(r"\D", "", c.contact_number), c.email),
+            ),
+        }
+        self.events = ChangeBus(self)
+        self.report_cache = ReportCache(REPORT_CACHE_PATH)
+
+    def close(self):
+        self.report_cache.save()
+        super().close()
+
+    def reload_indexes(self):
+        # After bulk writes that bypassed the repository observers
+        self.aggregates.load()
+        self.period_totals.load()
+        self.columns.reset()
+        for index in self.search.values():
+            index.reset()
+        self.events.reset()
+
+
+# ---------------------------------------------------------------------------
+# Server mode (several counters sharing one database)
+# ---------------------------------------------------------------------------
+#
+# One process runs with --serve and owns the database. Each terminal runs
+# with --server HOST:PORT and keeps a local replica DataStore, so pages,
+# indexes and reports work exactly as in standalone mode. Writes go to the
+# server first (it assigns ids) and are then applied to the replica; every
+# committed change is pushed to all subscribed terminals.
+#
+# The protocol is one JSON object per line over TCP. Each request line gets
+# one response line, in order, so clients pipeline requests freely:
+#   {"id": 1, "op": "batch", "ops": [{"op": "insert", "table": t, "rows": [...]}, ...]}
+#   {"id": 2, "op": "snapshot", "table": t, "after": 0, "limit": 5000}
+#   {"id": 3, "op": "ping"}
+# and responses are {"id": 1, "result": ...} or {"id": 1, "error": "..."}.
+# A {"op": "subscribe", "since": seq, "instance": id} request turns the
+# connection into a stream of {"changes": [[seq, table, id, row or null], ...]}
+# lines. Sequence numbers restart with the server, so snapshots and resets
+# carry the server's instance id, and a subscription from another instance
+# (or from ahead of the log) is answered with {"reset": true, ...}.
+
+DEFAULT_PORT = 8765
+REPLICA_PATH = os.path.join(os.path.dirname(DB_PATH), "luqman_steel.replica.db")
+# (host, port) of the server in client mode, from --server or LST_SERVER
+SERVER_ADDRESS = None
+
+
+def parse_address(text, default_host="127.0.0.1"):
+    # "host:port", ":port" or "port"
+    host, _, port = text.rpartition(":")
+    return host or default_host, int(port)
+
+
+class ServerError(Exception):
+    # The server could not be reached, or it rejected a request
+    pass
+
+
+class ChangeLog:
+    # Numbered recent changes for the change streams. A terminal that falls
+    # further behind than LIMIT changes is told to reload a snapshot.
+    LIMIT = 100_000
+
+    def __init__(self):
+        self.seq = 0
+        self.instance = os.urandom(8).hex()  # New each start, as seq restarts
+        self._changes = deque(maxlen=self.LIMIT)  # [seq, table, id, row or None]
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def append(self, changes):
+        with self._cond:
+            for table, obj_id, row in changes:
+                self.seq += 1
+                self._changes.append([self.seq, table, obj_id, row])
+            self._cond.notify_all()
+
+    def since(self, seq, timeout):
+        # Changes after seq, waiting up to timeout for the first one; None
+        # when they are no longer held, seq is from ahead of this log (a
+        # previous run of the server), or the log is closed
+        with self._cond:
+            if seq > self.seq:
+                return None
+            self._cond.wait_for(lambda: self.seq > seq or self._closed, timeout)
+            if self._closed or seq < self.seq - len(self._changes):
+                return None
+            return list(itertools.islice(self._changes, len(self._changes) - (self.seq - seq), None))
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class StoreServer:
+    # Serves one database to the terminals. Each connection has a thread;
+    # database access is serialised by a lock, and each batch is a single
+    # transaction (and one group-commit sync).
+    HEARTBEAT_S = 15
+    SNAPSHOT_LIMIT = 5000
+
+    def __init__(self, path, host="127.0.0.1", port=DEFAULT_PORT):
+        require_network()
+        self.store = SqliteStore(path, check_same_thread=False)
+        self.repos = {repo.table: repo for repo in self.store.repositories}
+        self.changes = ChangeLog()
+        self._lock = threading.Lock()
+        self._sock = socket.create_server((host, port))
+        self.address = self._sock.getsockname()[:2]
+        self._closing = False
+        self._clients = set()  # Open connections, dropped on close()
+
+    def start(self):
+        # Serve on a background thread (the benchmark's loopback check, embedding)
+        thread = threading.Thread(target=self.serve_forever, name="store-server", daemon=True)
+        thread.start()
+        return thread
+
+    def serve_forever(self):
+        while not self._closing:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                break
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self._lock:
+                self._clients.add(conn)
+            threading.Thread(target=self._serve_client, args=(conn,), daemon=True).start()
+
+    def close(self):
+        self._closing = True
+        self.changes.close()
+        self._sock.close()
+        with self._lock:
+            # Terminals see the connection drop, as when the process exits
+            for conn in self._clients:
+                try:
+                    conn.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+            self.store.close()
+
+    def _serve_client(self, conn):
+        reader = conn.makefile("rb")
+        writer = conn.makefile("wb")
+        try:
+            for line in reader:
+                request = json.loads(line)
+                if request.get("op") == "subscribe":
+                    self._stream(writer, request.get("since", 0), request.get("instance"))
+                    return
+                try:
+                    response = {"id": request.get("id"), "result": self.handle(request)}
+                except ValidationError as exc:
+                    # Shown to the user as is, like a dialog's own checks
+                    response = {"id": request.get("id"), "error": str(exc), "invalid": True}
+                except (KeyError, TypeError, ValueError, sqlite3.Error) as exc:
+                    response = {"id": request.get("id"), "error": f"{type(exc).__name__}: {exc}"}
+                writer.write(json.dumps(response).encode() + b"\n")
+                writer.flush()
+        except (OSError, ValueError):
+            pass  # Client went away or sent garbage
+        finally:
+            with self._lock:
+                self._clients.discard(conn)
+            conn.close()
+
+    def handle(self, request):
+        op = request["op"]
+        if op == "batch":
+            return self._batch(request["ops"])
+        if op == "snapshot":
+            if request["table"] == "stock_movements":
+                select = self.store.stock.SELECT
+            else:
+                select = self.repos[request["table"]]._select()
+            limit = min(int(request.get("limit", self.SNAPSHOT_LIMIT)), self.SNAPSHOT_LIMIT)
+            with self._lock:
+                seq = self.changes.seq
+                rows = self.store.conn.execute(
+                    f"{select} WHERE id > ? ORDER BY id LIMIT ?", (request.get("after", 0), limit)
+                ).fetchall()
+            return {"rows": rows, "seq": seq, "instance": self.changes.instance}
+        if op == "ping":
+            return {"seq": self.changes.seq, "instance": self.changes.instance}
+        raise ValueError(f"unknown op {op!r}")
+
+    def _batch(self, ops):
+        results = []
+        changes = []
+        with self._lock:
+            with self.store.transaction():
+                stock_before = self.store.stock.last_id()
+                for op in ops:
+                    repo = self.repos[op["table"]]
+                    kind = op["op"]
+                    if kind == "insert":
+                        ids = []
+                        for row in op["rows"]:
+                            obj_id = repo.insert(repo._from_row((None, *row)))
+                            ids.append(obj_id)
+                            changes.append((repo.table, obj_id, row))
+                        results.append(ids)
+                    elif kind == "update":
+                        repo.update_many([repo._from_row((obj_id, *row)) for obj_id, row in op["rows"]])
+                        changes.extend((repo.table, obj_id, row) for obj_id, row in op["rows"])
+                        results.append(None)
+                    elif kind == "delete":
+                        repo.delete_many(op["ids"])
+                        changes.extend((repo.table, obj_id, None) for obj_id in op["ids"])
+                        results.append(None)
+                    elif kind == "movement":
+                        # A stock movement, applied to the row as it is here
+                        # so terminals holding stale copies of an item cannot
+                        # overwrite each other's sales; the ledger files it
+                        # under its kind and day rather than as an edit
+                        stock_kind, quantity, unit_cost, day = op["movement"]
+                        current = repo.get(op["id"])
+                        if current is None:
+                            raise ValidationError("This item no longer exists.")
+                        updated = self.store.stock.moved(current, stock_kind, quantity, unit_cost, day)
+                        with self.store.stock.movement(stock_kind, day):
+                            repo.update(updated)
+                        row = repo._to_row(updated)
+                        changes.append((repo.table, updated.id, row))
+                        results.append(row)
+                    else:
+                        raise ValueError(f"unknown batch op {kind!r}")
+                # The ledger rows these writes appended, for the terminals'
+                # copies of it
+                changes.extend(("stock_movements", row[0], row[1:])
+                               for row in self.store.stock.movements_after(stock_before))
+            self.changes.append(changes)
+        return results
+
+    def _stream(self, writer, since, instance):
+        # A terminal last attached to another run of the server starts over
+        current = instance == self.changes.instance
+        while not self._closing:
+            changes = self.changes.since(since, self.HEARTBEAT_S) if current else None
+            if changes is None:
+                if self._closing:
+                    break
+                current = True
+                since = self.changes.seq
+                message = {"reset": True, "seq": since, "instance": self.changes.instance}
+            elif changes:
+                since = changes[-1][0]
+                message = {"changes": changes}
+            else:
+                message = {"seq": since}  # Heartbeat; also notices dead clients
+            writer.write(json.dumps(message).encode() + b"\n")
+            writer.flush()
+
+
+class ServerConnection:
+    # One connection to the server. call_many() writes all its requests
+    # before reading any response (pipelining), so a batch of requests
+    # costs one round trip.
+    def __init__(self, address, timeout):
+        self.sock = socket.create_connection(address, timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile("rb")
+        self._next_id = 0
+
+    def call_many(self, requests):
+        first = self._next_id
+        lines = []
+        for request in requests:
+            lines.append(json.dumps(dict(request, id=self._next_id)).encode() + b"\n")
+            self._next_id += 1
+        self.sock.sendall(b"".join(lines))
+        results = []
+        for expected in range(first, self._next_id):
+            line = self.reader.readline()
+            if not line:
+                raise ConnectionError("connection closed by the server")
+            response = json.loads(line)
+            if response.get("id") != expected:
+                raise ConnectionError("out-of-order response")
+            if response.get("invalid"):
+                raise ValidationError(response["error"])
+            if "error" in response:
+                raise ServerError(response["error"])
+            results.append(response["result"])
+        return results
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+
+class ServerClient:
+    # Pooled connections to the server, safe to share between the GUI and
+    # worker threads. A connection that fails is dropped rather than reused.
+    POOL_SIZE = 4
+
+    def __init__(self, address, timeout=10):
+        require_network()
+        self.address = address
+        self.timeout = timeout
+        self._idle = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        try:
+            if conn is None:
+                conn = ServerConnection(self.address, self.timeout)
+            yield conn
+        except (ServerError, ValidationError):
+            # A rejected request leaves the connection usable
+            self._release(conn)
+            raise
+        except (OSError, ValueError) as exc:
+            if conn is not None:
+                conn.close()
+            raise ServerError(f"{self.address[0]}:{self.address[1]}: {exc}") from exc
+        except BaseException:
+            if conn is not None:
+                conn.close()
+            raise
+        self._release(conn)
+
+    def _release(self, conn):
+        with self._lock:
+            if len(self._idle) < self.POOL_SIZE:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def call_many(self, requests):
+        with self.connection() as conn:
+            return conn.call_many(requests)
+
+    def call(self, op, **params):
+        return self.call_many([dict(params, op=op)])[0]
+
+    def batch(self, ops):
+        # Several writes in one request and one server transaction
+        return self.call("batch", ops=ops)
+
+    def insert(self, table, rows):
+        return self.batch([{"op": "insert", "table": table, "rows": rows}])[0]
+
+    def update(self, table, keyed_rows):
+        self.batch([{"op": "update", "table": table, "rows": keyed_rows}])
+
+    def delete(self, table, ids):
+        self.batch([{"op": "delete", "table": table, "ids": ids}])
+
+    def record_movement(self, table, obj_id, kind, quantity, unit_cost, day):
+        # The item's row after the server applied the movement
+        return self.batch([{"op": "movement", "table": table, "id": obj_id,
+                            "movement": [kind, quantity, unit_cost, day]}])[0]
+
+    def snapshot(self, table):
+        # All rows of a table as (id, *columns), plus the change sequence
+        # number they are at least as new as and the server instance it
+        # counts in (None if the server restarted part way through)
+        rows = []
+        seq = None
+        instance = None
+        after = 0
+        while True:
+            page = self.call("snapshot", table=table, after=after)
+            if seq is None:
+                seq, instance = page["seq"], page["instance"]
+            elif page["instance"] != instance:
+                instance = None
+            rows.extend(page["rows"])
+            if len(page["rows"]) < StoreServer.SNAPSHOT_LIMIT:
+                return rows, seq, instance
+            after = page["rows"][-1][0]
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+class ChangeFeed(QObject):
+    # Subscription to the server's change stream on a background thread.
+    # Batches reach the GUI thread through queued signals; a dropped
+    # connection is retried from the last change seen.
+    received = pyqtSignal(list)
+    resetRequired = pyqtSignal()
+    RETRY_S = 2
+
+    def __init__(self, address, since, instance, parent=None):
+        super().__init__(parent)
+        self.address = address
+        self.since = since
+        self.instance = instance
+        self._sock = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, name="change-feed", daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+        sock = self._sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def resubscribe(self):
+        # Drops the connection and asks for a reset on the next one
+        self.instance = None
+        sock = self._sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                # Heartbeats arrive well within the timeout on a live server
+                self._sock = socket.create_connection(self.address, StoreServer.HEARTBEAT_S * 2)
+                request = {"op": "subscribe", "since": self.since, "instance": self.instance}
+                self._sock.sendall(json.dumps(request).encode() + b"\n")
+                for line in self._sock.makefile("rb"):
+                    message = json.loads(line)
+                    if message.get("reset"):
+                        self.since = message["seq"]
+                        self.instance = message["instance"]
+                        self.resetRequired.emit()
+                    elif "changes" in message:
+                        self.since = message["changes"][-1][0]
+                        self.received.emit(message["changes"])
+            except (OSError, ValueError):
+                pass
+            finally:
+                if self._sock is not None:
+                    self._sock.close()
+                    self._sock = None
+            self._stopped.wait(self.RETRY_S)
+
+
+class ServerLink:
+    # Client mode glue on the GUI thread: loads the replica from a server
+    # snapshot, routes the repositories' writes to the server and applies
+    # pushed changes through Repository.apply_remote(), so the observers,
+    # change bus and pages see other terminals' edits like local ones.
+    def __init__(self, store, address):
+        self.store = store
+        self.address = address
+        self.client = ServerClient(address)
+        self.repos = {repo.table: repo for repo in store.repositories}
+        self.feed = None
+
+    def attach(self):
+        # The replica is a copy of the server's data, not a branch of it
+        self.store.branch.set_tracking(False)
+        self.store.stock.mirror()
+        seq, instance = self.load_snapshot()
+        for repo in self.repos.values():
+            repo.remote = self.client
+        self.feed = ChangeFeed(self.address, seq, instance)
+        self.feed.received.connect(self.apply)
+        self.feed.resetRequired.connect(self._reload)
+        self.feed.start()
+
+    def load_snapshot(self):
+        # Returns the (seq, server instance) to follow the change stream
+        # from; a server restart during the snapshot leaves the instance
+        # unknown, so the stream starts with another reset
+        seq = None
+        snapshots = {table: self.client.snapshot(table) for table in (*self.repos, "stock_movements")}
+        instances = {instance for _, _, instance in snapshots.values()}
+        with self.store.transaction():
+            for table, (rows, table_seq, _) in snapshots.items():
+                if table == "stock_movements":
+                    self.store.stock.replace_movements(rows)
+                else:
+                    self.repos[table].replace_rows(rows)
+                seq = table_seq if seq is None else min(seq, table_seq)
+        self.store.reload_indexes()
+        return seq, instances.pop() if len(instances) == 1 else None
+
+    def _reload(self):
+        # A reset from the change stream; if the snapshot cannot be read,
+        # the feed reconnects and is told to reset again
+        try:
+            self.load_snapshot()
+        except ServerError:
+            self.feed.resubscribe()
+
+    def apply(self, changes):
+        # The last change per row wins; each table is applied in one go.
+        # Stock movements are appended to the replica's copy of the ledger.
+        latest = {}
+        movements = []
+        for _, table, obj_id, row in changes:
+            if table == "stock_movements":
+                movements.append((obj_id, *row))
+            else:
+                latest.setdefault(table, {})[obj_id] = row
+        moved = self.store.stock.apply_remote(movements) if movements else ()
+        for table, rows in latest.items():
+            repo = self.repos.get(table)
+            if repo is not None:
+                repo.apply_remote(
+                    [(obj_id, *row) for obj_id, row in rows.items() if row is not None],
+                    [obj_id for obj_id, row in rows.items() if row is None],
+                )
+        # The movements of this terminal's own writes arrive after the rows
+        # did; the stock value shown with those items has changed since
+        inventory = self.store.inventory
+        for item in inventory.get_many(sorted(moved)):
+            inventory._notify(item, item)
+
+    def close(self):
+        if self.feed is not None:
+            self.feed.stop()
+        for repo in self.repos.values():
+            repo.remote = None
+        self.client.close()
+
+
+def reports_server_errors(func):
+    # Write handlers in client mode: a failed server call leaves the replica
+    # untouched and is reported, instead of escaping the Qt slot
+    code = func.__code__
+    max_args = None if code.co_flags & 0x04 else code.co_argcount
+
+    @functools.wraps(func)
+    def wrapper(widget, *args):
+        if max_args is not None:
+            args = args[:max_args - 1]
+        try:
+            return func(widget, *args)
+        except ServerError as exc:
+            QMessageBox.warning(widget, "Server Error", f"The change was not saved:\n{exc}")
+    return wrapper
+
+
+def run_server(address_text):
+    # Headless server process: python "fypfinal code.py" --serve [HOST:]PORT
+    host, port = parse_address(address_text or str(DEFAULT_PORT))
+    server = StoreServer(DB_PATH, host, port)
+    print(f"Serving {DB_PATH} on {server.address[0]}:{server.address[1]}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+
+# ---------------------------------------------------------------------------
+# Branch sync (changeset files between standalone databases)
+# ---------------------------------------------------------------------------
+#
+# Every mutation of a tracked table is recorded by triggers in sync_rows:
+#   uid    the row's identity on every branch ("<site>.<n>")
+#   clock  Lamport timestamp of the last change, and site, the branch that
+#          made it; the higher (clock, site) wins a conflict, so all
+#          branches resolve the same way whatever order files arrive in
+#   seq    local change number, for "what changed since the last sync"
+# Deletes leave a tombstone so they travel too. A changeset for a peer holds
+# the rows with seq above what that peer has acknowledged, and every file
+# carries acknowledgements of what its sender has received, so a day's sync
+# costs the day's changes rather than the ledger size.
+
+SYNC_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sync_clock (
+    one INTEGER PRIMARY KEY CHECK (one = 1),
+    site TEXT NOT NULL,
+    clock INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    tracking INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value);
+CREATE TABLE IF NOT EXISTS sync_rows (
+    tbl TEXT NOT NULL,
+    uid TEXT NOT NULL,
+    row_id INTEGER,
+    clock INTEGER NOT NULL,
+    site TEXT NOT NULL,
+    deleted INTEGER NOT NULL DEFAULT 0,
+    seq INTEGER NOT NULL,
+    PRIMARY KEY (tbl, uid)
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_sync_row ON sync_rows(tbl, row_id);
+CREATE INDEX IF NOT EXISTS idx_sync_seq ON sync_rows(seq);
+"""
+
+SYNC_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS sync_{table}_insert AFTER INSERT ON {table}
+WHEN (SELECT tracking FROM sync_clock) = 1
+BEGIN
+    UPDATE sync_clock SET clock = clock + 1, seq = seq + 1;
+    INSERT OR REPLACE INTO sync_rows (tbl, uid, row_id, clock, site, deleted, seq)
+    SELECT '{table}', site || '.' || seq, NEW.id, clock, site, 0, seq FROM sync_clock;
+END;
+CREATE TRIGGER IF NOT EXISTS sync_{table}_update AFTER UPDATE ON {table}
+WHEN (SELECT tracking FROM sync_clock) = 1
+BEGIN
+    UPDATE sync_clock SET clock = clock + 1, seq = seq + 1;
+    UPDATE sync_rows SET (clock, site, seq) = (SELECT clock, site, seq FROM sync_clock)
+    WHERE tbl = '{table}' AND row_id = NEW.id;
+END;
+CREATE TRIGGER IF NOT EXISTS sync_{table}_delete AFTER DELETE ON {table}
+WHEN (SELECT tracking FROM sync_clock) = 1
+BEGIN
+    UPDATE sync_clock SET clock = clock + 1, seq = seq + 1;
+    UPDATE sync_rows SET row_id = NULL, deleted = 1, (clock, site, seq) = (SELECT clock, site, seq FROM sync_clock)
+    WHERE tbl = '{table}' AND row_id = OLD.id;
+END;
+"""
+
+CHANGESET_FORMAT = "lst-changeset"
+CHANGESET_VERSION = 1
+
+SyncResult = namedtuple("SyncResult", "source applied skipped")
+
+
+class SyncError(Exception):
+    pass
+
+
+class BranchSync:
+    # Change tracking and changeset export/import for one database
+    RELOAD_ROWS = 5000  # Bigger imports rebuild the indexes instead
+
+    def __init__(self, store):
+        self.store = store
+        self.repos = {repo.table: repo for repo in store.repositories}
+        conn = store.conn
+        conn.executescript(SYNC_SCHEMA)
+        if conn.execute("SELECT 1 FROM sync_clock").fetchone() is None:
+            self._start_tracking()
+        conn.executescript("".join(SYNC_TRIGGERS.format(table=table) for table in self.repos))
+
+    def _start_tracking(self):
+        # First open of this database: pick a site id and give the existing
+        # rows an identity, so the first changeset carries them
+        site = os.urandom(4).hex()
+        with self.store.transaction():
+            self.store.conn.execute(
+                "INSERT INTO sync_clock (one, site, clock, seq, tracking) VALUES (1, ?, 1, 1, 1)", (site,)
+            )
+            for table in self.repos:
+                self.store.conn.execute(
+                    "INSERT INTO sync_rows (tbl, uid, row_id, clock, site, deleted, seq) "
+                    f"SELECT ?, ? || '.b' || id, id, 1, ?, 0, 1 FROM {table}",
+                    (table, site, site),
+                )
+
+    def _get(self, key, default=None):
+        # Per-peer progress: "received:<site>" and "acked:<site>"
+        row = self.store.conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set(self, key, value):
+        self.store.conn.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)", (key, value))
+
+    def _clock(self):
+        return self.store.conn.execute("SELECT site, clock, seq FROM sync_clock").fetchone()
+
+    @property
+    def site(self):
+        return self._clock()[0]
+
+    def set_tracking(self, enabled):
+        # Off for databases that are copies of another (client replicas)
+        with self.store.transaction():
+            self.store.conn.execute("UPDATE sync_clock SET tracking = ?", (1 if enabled else 0,))
+
+    @contextmanager
+    def bulk_insert(self, table):
+        # Inside a transaction: rows inserted into table are tracked with one
+        # statement at the end instead of a trigger per row. New rows are the
+        # ones above the current maximum id.
+        conn = self.store.conn
+        if not conn.execute("SELECT tracking FROM sync_clock").fetchone()[0]:
+            yield
+            return
+        before = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+        conn.execute("UPDATE sync_clock SET tracking = 0")
+        try:
+            yield
+            added = conn.execute(
+                "INSERT INTO sync_rows (tbl, uid, row_id, clock, site, deleted, seq) "
+                "SELECT ?, c.site || '.' || (c.seq + n), id, c.clock + 1, c.site, 0, c.seq + n "
+                f"FROM (SELECT id, ROW_NUMBER() OVER (ORDER BY id) AS n FROM {table} WHERE id > ?), "
+                "sync_clock AS c",
+                (table, before),
+            ).rowcount
+            conn.execute("UPDATE sync_clock SET clock = clock + 1, seq = seq + ?", (added,))
+        finally:
+            conn.execute("UPDATE sync_clock SET tracking = 1")
+
+    def peers(self):
+        # Sites this database has exchanged changesets with
+        rows = self.store.conn.execute(
+            "SELECT key FROM sync_state WHERE key LIKE 'received:%' OR key LIKE 'acked:%'"
+        ).fetchall()
+        return sorted({key.split(":", 1)[1] for key, in rows})
+
+    def export_changes(self, path, peer=None):
+        # Writes the rows the peer has not acknowledged (everything for a new
+        # peer) to a gzip-compressed JSON-lines file; returns the row count
+        import gzip
+        require_network()
+        conn = self.store.conn
+        site, clock, seq = self._clock()
+        since = self._get(f"acked:{peer}", 0) if peer else 0
+        acks = {key.split(":", 1)[1]: value for key, value in conn.execute(
+            "SELECT key, value FROM sync_state WHERE key LIKE 'received:%'")}
+        header = {
+            "format": CHANGESET_FORMAT, "version": CHANGESET_VERSION, "site": site,
+            "seq": seq, "clock": clock, "since": since, "acks": acks,
+        }
+        count = 0
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            f.write(json.dumps(header, separators=(",", ":")) + "\n")
+            for table, repo in self.repos.items():
+                columns = ", ".join(f"t.{column}" for column in repo.columns)
+                rows = conn.execute(
+                    f"SELECT s.uid, s.clock, s.site, s.deleted, {columns} FROM sync_rows AS s "
+                    f"LEFT JOIN {table} AS t ON t.id = s.row_id "
+                    "WHERE s.seq > ? AND s.tbl = ? AND s.site != ? ORDER BY s.seq",
+                    (since, table, peer or ""),
+                ).fetchall()
+                # A tombstone needs no column values
+                rows = [row[:4] if row[3] else row for row in rows]
+                f.write(json.dumps({"table": table, "columns": repo.columns, "rows": rows},
+                                   separators=(",", ":")) + "\n")
+                count += len(rows)
+        return count
+
+    def import_changes(self, path):
+        import gzip
+        require_network()
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                header = json.loads(f.readline())
+                tables = [json.loads(line) for line in f]
+        except (OSError, EOFError, ValueError) as exc:
+            raise SyncError(f"Not a readable changeset file: {exc}") from exc
+        if header.get("format") != CHANGESET_FORMAT or header.get("version") != CHANGESET_VERSION:
+            raise SyncError("Not a changeset file from this application.")
+        source = header["site"]
+        site, clock, seq = self._clock()
+        if source == site:
+            raise SyncError("This changeset was exported from this database.")
+        for part in tables:
+            repo = self.repos.get(part["table"])
+            if repo is None or tuple(part["columns"]) != repo.columns:
+                raise SyncError(f"Unexpected table layout for {part['table']!r}.")
+
+        # Small changesets go through the repositories so the open pages
+        # update row by row; big ones are written quietly and the in-memory
+        # indexes rebuilt once
+        total = sum(len(part["rows"]) for part in tables)
+        quiet = total > self.RELOAD_ROWS and hasattr(self.store, "reload_indexes")
+        observers = {repo: repo.observers for repo in self.repos.values()}
+        if quiet:
+            for repo in observers:
+                repo.observers = []
+        applied = skipped = 0
+        try:
+            with self.store.transaction():
+                conn = self.store.conn
+                conn.execute("UPDATE sync_clock SET tracking = 0")
+                for part in tables:
+                    for row in part["rows"]:
+                        if self._apply_row(self.repos[part["table"]], row, seq + 1):
+                            seq += 1
+                            applied += 1
+                        else:
+                            skipped += 1
+                # Lamport: later local changes order after everything seen
+                conn.execute("UPDATE sync_clock SET seq = ?, clock = ?, tracking = 1",
+                             (seq, max(clock, header["clock"]) + 1))
+                if header["seq"] > self._get(f"received:{source}", 0):
+                    self._set(f"received:{source}", header["seq"])
+                acked = header.get("acks", {}).get(site)
+                if acked is not None and acked > self._get(f"acked:{source}", 0):
+                    self._set(f"acked:{source}", acked)
+        except (sqlite3.Error, KeyError, TypeError, ValueError) as exc:
+            raise SyncError(f"The changeset could not be applied: {exc}") from exc
+        finally:
+            for repo, saved in observers.items():
+                repo.observers = saved
+        if quiet:
+            self.store.reload_indexes()
+        return SyncResult(source, applied, skipped)
+
+    def _apply_row(self, repo, row, seq):
+        # Last writer wins by (clock, site); returns whether the row changed
+        uid, clock, site, deleted, *values = row
+        conn = self.store.conn
+        local = conn.execute(
+            "SELECT row_id, clock, site FROM sync_rows WHERE tbl = ? AND uid = ?", (repo.table, uid)
+        ).fetchone()
+        if local is not None and (local[1], local[2]) >= (clock, site):
+            return False
+        row_id = local[0] if local is not None else None
+        if deleted:
+            if row_id is not None:
+                repo.delete(row_id)
+            row_id = None
+        elif row_id is not None:
+            repo.update(repo._from_row((row_id, *values)))
+        else:
+            row_id = repo.insert(repo._from_row((None, *values)))
+        conn.execute(
+            "INSERT OR REPLACE INTO sync_rows (tbl, uid, row_id, clock, site, deleted, seq) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (repo.table, uid, row_id, clock, site, 1 if deleted else 0, seq),
+        )
+        return True
+
+
+# ---------------------------------------------------------------------------
+# Table models
+# ---------------------------------------------------------------------------
+
+class RecordTableModel(QAbstractTableModel):
+    # Rows are pulled from the repository a page at a time as the view
+    # scrolls, and kept in display order so single inserts/removals can be
+    # placed with a binary search instead of rebuilding the table. Loaded
+    # rows are also indexed by primary key, so the row of a given id is a
+    # dict lookup plus a bisect on its sort key.
+    BATCH_SIZE = 256
+
+    def __init__(self, repo, columns, parent=None):
+        super().__init__(parent)
+        self.repo = repo
+        self.columns = columns  # [(header, formatter), ...]
+        self._records = []
+        self._keys = []
+        self._by_id = {}  # id -> loaded record
+        self._exhausted = False
+        self._matches = None  # Sorted keys of search matches, or None
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._records)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            return self.columns[index.column()][1](self._records[index.row()])
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.columns[section][0]
+        return super().headerData(section, orientation, role)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._exhausted:
+            return
+        if self._matches is not None:
+            start = len(self._records)
+            keys = self._matches[start:start + self.BATCH_SIZE]
+            batch = self.repo.get_many([self.repo.key_id(key) for key in keys])
+            # Matches deleted since the search are dropped, so the match
+            # list stays row-aligned with the loaded records
+            self._matches[start:start + len(keys)] = [self.repo.sort_key(obj) for obj in batch]
+            if len(self._records) + len(batch) >= len(self._matches):
+                self._exhausted = True
+        else:
+            after = self._records[-1] if self._records else None
+            batch = self.repo.page(after, self.BATCH_SIZE)
+            if len(batch) < self.BATCH_SIZE:
+                self._exhausted = True
+        if not batch:
+            return
+        start = len(self._records)
+        self.beginInsertRows(QModelIndex(), start, start + len(batch) - 1)
+        self._records.extend(batch)
+        self._keys.extend(self.repo.sort_key(obj) for obj in batch)
+        for obj in batch:
+            self._by_id[obj.id] = obj
+        self.endInsertRows()
+
+    def reload(self):
+        self.beginResetModel()
+        self._records = []
+        self._keys = []
+        self._by_id = {}
+        self._exhausted = False
+        self.endResetModel()
+
+    def set_matches(self, keys):
+        # Show only the given search matches (None shows everything)
+        self._matches = keys
+        self.reload()
+        self._exhausted = keys is not None and not keys
+
+    def is_filtered(self):
+        return self._matches is not None
+
+    def record_at(self, row):
+        return self._records[row]
+
+    def id_at(self, row):
+        return self._records[row].id
+
+    def row_of(self, obj_id):
+        # Row of a loaded record, or -1
+        obj = self._by_id.get(obj_id)
+        if obj is None:
+            return -1
+        return bisect_left(self._keys, self.repo.sort_key(obj))
+
+    def insert_record(self, obj):
+        if self._matches is not None:
+            # The owning widget re-runs its search after a change
+            return
+        key = self.repo.sort_key(obj)
+        row = bisect_left(self._keys, key)
+        # Past the loaded window: the next fetchMore will pick it up
+        if row == len(self._keys) and not self._exhausted:
+            return
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._records.insert(row, obj)
+        self._keys.insert(row, key)
+        self._by_id[obj.id] = obj
+        self.endInsertRows()
+
+    def update_record(self, obj):
+        # Replace a loaded record after an edit; it only moves when its
+        # display-order key changed. A row not loaded yet is placed like an
+        # insert if its new key lands inside the loaded window, which the
+        # keyset paging in fetchMore would otherwise never reach.
+        row = self.row_of(obj.id)
+        if row < 0:
+            self.insert_record(obj)
+            return
+        if self.repo.sort_key(obj) == self._keys[row]:
+            self._records[row] = obj
+            self._by_id[obj.id] = obj
+            self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.columns) - 1))
+            return
+        self.remove_row(row)
+        self.insert_record(obj)
+
+    def remove_record(self, obj_id):
+        row = self.row_of(obj_id)
+        if row >= 0:
+            self.remove_row(row)
+
+    # Change-bus deltas. While filtered the owning widget re-runs its search
+    # instead, and large batches are cheaper as one reset than as row moves.
+    def insert_ids(self, ids):
+        if self._matches is not None:
+            return
+        if len(ids) > self.BATCH_SIZE:
+            self.reload()
+            return
+        for obj in self.repo.get_many(ids):
+            self.insert_record(obj)
+
+    def update_ids(self, ids):
+        if self._matches is not None:
+            return
+        if len(ids) > self.BATCH_SIZE:
+            self.reload()
+            return
+        for obj in self.repo.get_many(ids):
+            self.update_record(obj)
+
+    def remove_ids(self, ids):
+        if self._matches is not None:
+            return
+        ids = [obj_id for obj_id in ids if obj_id in self._by_id]
+        if len(ids) > self.BATCH_SIZE:
+            self.reload()
+            return
+        for obj_id in ids:
+            self.remove_record(obj_id)
+
+    def remove_row(self, row):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._by_id[self._records[row].id]
+        del self._records[row]
+        del self._keys[row]
+        if self._matches is not None:
+            del self._matches[row]
+        self.endRemoveRows()
+
+
+class SearchBar(QLineEdit):
+    # Search box that reports its text once typing pauses
+    searchChanged = pyqtSignal(str)
+    DEBOUNCE_MS = 150
+
+    def __init__(self, placeholder, parent=None):
+        super().__init__(parent)
+        self.setPlaceholderText(placeholder)
+        self.setClearButtonEnabled(True)
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(self.DEBOUNCE_MS)
+        self._timer.timeout.connect(lambda: self.searchChanged.emit(self.text()))
+        self.textChanged.connect(self._timer.start)
+
+
 class FinancialDialog(QDialog):
+    @INSTRUMENTS.timed("FinancialDialog.open")
     def __init__(self, parent=None, record=None):
         super().__init__(parent)
         self.setWindowTitle("Add Financial Transaction" if record is None else "Edit Financial Transaction")
@@ -81,26 +3419,22 @@ class FinancialDialog(QDialog):
             self.amount_edit.setValue(record.amount)
             self.type_combo.setCurrentText(record.record_type)
 
+    @INSTRUMENTS.timed("FinancialDialog.accept")
     def get_data(self):
-        description = self.description_edit.text().strip()
-        if not description:
-            QMessageBox.warning(self, "Validation Error", "Please enter a description.")
+        try:
+            return validate_financial(
+                date=self.date_edit.date(),
+                description=self.description_edit.text(),
+                amount=self.amount_edit.value(),
+                record_type=self.type_combo.currentText()
+            )
+        except ValidationError as exc:
+            QMessageBox.warning(self, "Validation Error", str(exc))
             return None
 
-        amount = self.amount_edit.value()
-        if amount <= 0:
-            QMessageBox.warning(self, "Validation Error", "Amount must be greater than zero.")
-            return None
-
-        return FinancialRecord(
-            date=self.date_edit.date(),
-            description=description,
-            amount=amount,
-            record_type=self.type_combo.currentText()
-        )
-
 
 class InventoryDialog(QDialog):
+    @INSTRUMENTS.timed("InventoryDialog.open")
     def __init__(self, parent=None, item=None):
         super().__init__(parent)
         self.setWindowTitle("Add Inventory Item" if item is None else "Edit Inventory Item")
@@ -147,20 +3481,91 @@ class InventoryDialog(QDialog):
             self.supplier_edit.setText(item.supplier)
             self.last_updated_edit.setDate(item.last_updated)
 
+    @INSTRUMENTS.timed("InventoryDialog.accept")
     def get_data(self):
-        name = self.name_edit.text().strip()
-        if not name:
-            QMessageBox.warning(self, "Validation Error", "Please enter product name.")
+        try:
+            return validate_inventory(
+                self.name_edit.text(),
+                self.quantity_edit.value(),
+                self.unit_price_edit.value(),
+                self.supplier_edit.text(),
+                self.last_updated_edit.date()
+            )
+        except ValidationError as exc:
+            QMessageBox.warning(self, "Validation Error", str(exc))
             return None
-        quantity = self.quantity_edit.value()
-        unit_price = self.unit_price_edit.value()
-        supplier = self.supplier_edit.text().strip()
-        last_updated = self.last_updated_edit.date()
 
-        return InventoryItem(name, quantity, unit_price, supplier, last_updated)
+
+class StockMovementDialog(QDialog):
+    # A receipt, sale or adjustment of one item, filed in the stock ledger
+    KINDS = (("Receipt", "receipt"), ("Sale", "sale"), ("Adjustment (+/-)", "adjustment"))
+
+    @INSTRUMENTS.timed("StockMovementDialog.open")
+    def __init__(self, parent, item, stock):
+        super().__init__(parent)
+        self.setWindowTitle(f"Stock Movement - {item.name}")
+        self.setFixedSize(400, 300)
+        self.item = item
+
+        on_hand, value, _ = stock.position(item.id)
+        average = from_paisa(round(value / on_hand)) if on_hand else 0
+        position_label = QLabel(f"On hand: {on_hand:,}    Average cost: {average:,.2f} PKR")
+
+        self.kind_combo = QComboBox()
+        for label, kind in self.KINDS:
+            self.kind_combo.addItem(label, kind)
+        self.kind_combo.currentIndexChanged.connect(self._kind_changed)
+        self.quantity_edit = QSpinBox()
+        self.quantity_edit.setRange(1, MAX_QUANTITY)
+        self.unit_cost_edit = QDoubleSpinBox()
+        self.unit_cost_edit.setRange(0, 1_000_000_000)
+        self.unit_cost_edit.setDecimals(2)
+        self.unit_cost_edit.setSingleStep(0.5)
+        self.unit_cost_edit.setValue(item.unit_price)
+        self.date_edit = QDateEdit()
+        self.date_edit.setCalendarPopup(True)
+        self.date_edit.setDate(QDate.currentDate())
+        # Movements cannot go before the item's latest one
+        last_day = stock.last_day(item.id)
+        if last_day is not None:
+            self.date_edit.setMinimumDate(from_day(last_day))
+
+        form = QFormLayout()
+        form.addRow(position_label)
+        form.addRow("Movement:", self.kind_combo)
+        form.addRow("Quantity:", self.quantity_edit)
+        form.addRow("Unit Cost (PKR):", self.unit_cost_edit)
+        form.addRow("Date:", self.date_edit)
+
+        self.save_btn = QPushButton("Save")
+        self.save_btn.clicked.connect(self.accept)
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.clicked.connect(self.reject)
+        btn_layout = QHBoxLayout()
+        btn_layout.addStretch()
+        btn_layout.addWidget(self.save_btn)
+        btn_layout.addWidget(self.cancel_btn)
+
+        layout = QVBoxLayout()
+        layout.addLayout(form)
+        layout.addLayout(btn_layout)
+        self.setLayout(layout)
+
+    def _kind_changed(self):
+        # Only receipts bring in stock at a new cost; adjustments are signed
+        kind = self.kind_combo.currentData()
+        self.unit_cost_edit.setEnabled(kind == "receipt")
+        self.quantity_edit.setRange(-MAX_QUANTITY if kind == "adjustment" else 1, MAX_QUANTITY)
+
+    @INSTRUMENTS.timed("StockMovementDialog.accept")
+    def get_data(self):
+        # (kind, quantity, unit cost in paisa, day)
+        return (self.kind_combo.currentData(), self.quantity_edit.value(),
+                to_paisa(self.unit_cost_edit.value()), to_day(self.date_edit.date()))
 
 
 class CustomerDialog(QDialog):
+    @INSTRUMENTS.timed("CustomerDialog.open")
     def __init__(self, parent=None, customer=None):
         super().__init__(parent)
         self.setWindowTitle("Add Customer" if customer is None else "Edit Customer")
@@ -198,31 +3603,428 @@ class CustomerDialog(QDialog):
             self.address_edit.setPlainText(customer.address)
             self.email_edit.setText(customer.email)
 
+    @INSTRUMENTS.timed("CustomerDialog.accept")
     def get_data(self):
-        name = self.name_edit.text().strip()
-        if not name:
-            QMessageBox.warning(self, "Validation Error", "Please enter customer name.")
-            return None
-        contact = self.contact_edit.text().strip()
-        if not contact:
-            QMessageBox.warning(self, "Validation Error", "Please enter contact number.")
-            return None
-        address = self.address_edit.toPlainText().strip()
-        if not address:
-            QMessageBox.warning(self, "Validation Error", "Please enter address.")
-            return None
-        email = self.email_edit.text().strip()
-        if email and ("@" not in email or "." not in email):
-            QMessageBox.warning(self, "Validation Error", "Invalid email format.")
+        try:
+            return validate_customer(
+                self.name_edit.text(),
+                self.contact_edit.text(),
+                self.address_edit.toPlainText(),
+                self.email_edit.text()
+            )
+        except ValidationError as exc:
+            QMessageBox.warning(self, "Validation Error", str(exc))
             return None
 
-        return Customer(name, contact, address, email)
+
+class BulkEditDialog(QDialog):
+    # Sets the ticked fields on every selected row; fields are
+    # (label, attribute, editor, required) with the editor's initial value
+    # taken from the first row
+    @INSTRUMENTS.timed("BulkEditDialog.open")
+    def __init__(self, parent, title, fields):
+        super().__init__(parent)
+        self.setWindowTitle(title)
+        self.setMinimumWidth(400)
+        self.fields = []
+
+        form = QFormLayout()
+        for label, attr, editor, required in fields:
+            check = QCheckBox(label)
+            editor.setEnabled(False)
+            check.toggled.connect(editor.setEnabled)
+            form.addRow(check, editor)
+            self.fields.append((label, attr, editor, required, check))
+
+        self.save_btn = QPushButton("Apply")
+        self.save_btn.clicked.connect(self.accept)
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.clicked.connect(self.reject)
+        btn_layout = QHBoxLayout()
+        btn_layout.addStretch()
+        btn_layout.addWidget(self.save_btn)
+        btn_layout.addWidget(self.cancel_btn)
+
+        layout = QVBoxLayout()
+        layout.addWidget(QLabel("Tick the fields to change on all selected rows."))
+        layout.addLayout(form)
+        layout.addLayout(btn_layout)
+        self.setLayout(layout)
+
+    @staticmethod
+    def _value(editor):
+        if isinstance(editor, QDateEdit):
+            return editor.date()
+        if isinstance(editor, (QSpinBox, QDoubleSpinBox)):
+            return editor.value()
+        if isinstance(editor, QComboBox):
+            return editor.currentText()
+        return editor.text().strip()
+
+    @INSTRUMENTS.timed("BulkEditDialog.accept")
+    def get_changes(self):
+        # {attribute: value} for the ticked fields, or None when invalid
+        changes = {}
+        for label, attr, editor, required, check in self.fields:
+            if not check.isChecked():
+                continue
+            value = self._value(editor)
+            if required and value == "":
+                QMessageBox.warning(self, "Validation Error", f"{label.rstrip(':')} cannot be empty.")
+                return None
+            changes[attr] = value
+        return changes
+
+
+def selected_records(table):
+    # Loaded records of the selected rows, in display order
+    model = table.model()
+    rows = sorted(index.row() for index in table.selectionModel().selectedRows())
+    return [model.record_at(row) for row in rows]
+
+
+def bulk_edit(widget, repo, objs, noun, fields):
+    # Applies a BulkEditDialog to copies of objs as one batched update;
+    # returns True when something was saved
+    dialog = BulkEditDialog(widget, f"Edit {len(objs):,} {noun}", fields)
+    if dialog.exec_() != QDialog.Accepted:
+        return False
+    changes = dialog.get_changes()
+    if not changes:
+        return False
+    edited = []
+    for obj in objs:
+        obj = copy.copy(obj)
+        for attr, value in changes.items():
+            setattr(obj, attr, value)
+        edited.append(obj)
+    repo.update_many(edited)
+    return True
+
+
+# ---------------------------------------------------------------------------
+# Bulk import
+# ---------------------------------------------------------------------------
+
+class ImportFailed(Exception):
+    def __init__(self, errors):
+        super().__init__("\n".join(errors))
+        self.errors = errors
+
+
+class ImportCancelled(Exception):
+    pass
+
+
+def _header_key(name):
+    # "Unit Price (PKR)" -> "unitprice"
+    return "".join(ch for ch in str(name or "").lower() if ch.isalnum()).replace("pkr", "")
+
+
+def _cell_text(value):
+    return "" if value is None else str(value)
+
+
+def _cell_date(value, default=None):
+    if isinstance(value, datetime.date):
+        return QDate(value.year, value.month, value.day)
+    text = _cell_text(value).strip()
+    if not text and default is not None:
+        return default
+    for fmt in ("yyyy-MM-dd", "dd/MM/yyyy", "dd-MM-yyyy", "yyyy/MM/dd"):
+        date = QDate.fromString(text, fmt)
+        if date.isValid():
+            return date
+    raise ValidationError(f"Invalid date '{text}'.")
+
+
+def _cell_number(value, label):
+    if isinstance(value, (int, float)):
+        number = value
+    else:
+        text = _cell_text(value).replace(",", "").strip()
+        try:
+            number = float(text)
+        except ValueError:
+            raise ValidationError(f"Invalid {label} '{text}'.") from None
+    # float() also takes "nan" and "inf"
+    if not math.isfinite(number):
+        raise ValidationError(f"Invalid {label} '{_cell_text(value).strip()}'.")
+    return number
+
+
+def financial_from_row(row):
+    return validate_financial(
+        _cell_date(row.get("date")),
+        _cell_text(row.get("description")),
+        round(_cell_number(row.get("amount"), "amount"), 2),
+        _cell_text(row.get("type") or row.get("recordtype")).strip().title(),
+    )
+
+
+def inventory_from_row(row):
+    quantity = _cell_number(row.get("quantity", row.get("qty")), "quantity")
+    if quantity != int(quantity):
+        raise ValidationError(f"Quantity must be a whole number, got '{quantity}'.")
+    return validate_inventory(
+        _cell_text(row.get("productname", row.get("name"))),
+        int(quantity),
+        round(_cell_number(row.get("unitprice", row.get("price")), "unit price"), 2),
+        _cell_text(row.get("supplier")),
+        _cell_date(row.get("lastupdated"), default=QDate.currentDate()),
+    )
+
+
+def customer_from_row(row):
+    return validate_customer(
+        _cell_text(row.get("customername", row.get("name"))),
+        _cell_text(row.get("contactnumber", row.get("contact", row.get("phone")))),
+        _cell_text(row.get("address")),
+        _cell_text(row.get("email")),
+    )
+
+
+class BulkImporter:
+    # Streams rows from a CSV or XLSX file, validates each one with the same
+    # rules as the dialogs and writes them in a single transaction. Any
+    # invalid row aborts the import so a file is never half-loaded.
+    CHUNK_ROWS = 2000
+    MAX_ERRORS = 20
+
+    def __init__(self, repo, parse_row):
+        self.repo = repo
+        self.parse_row = parse_row
+
+    def read_rows(self, path):
+        # Yields (file line number, {normalized header: value})
+        if path.lower().endswith(".xlsx"):
+            if require_openpyxl() is None:
+                raise ImportFailed(["Reading .xlsx files needs the openpyxl package."])
+            from openpyxl.utils.exceptions import InvalidFileException
+            from xml.etree.ElementTree import ParseError
+            try:
+                yield from self._xlsx_rows(path)
+            except (zipfile.BadZipFile, InvalidFileException, ParseError, KeyError, ValueError) as exc:
+                # A renamed or damaged workbook is reported like an unreadable
+                # CSV file rather than escaping the Qt slot
+                raise OSError(f"{os.path.basename(path)} is not a readable .xlsx workbook "
+                              f"({type(exc).__name__}: {exc})") from exc
+        else:
+            with open(path, newline="", encoding="utf-8-sig") as f:
+                reader = csv.reader(f)
+                headers = [_header_key(cell) for cell in next(reader, [])]
+                for values in reader:
+                    if any(value.strip() for value in values):
+                        yield reader.line_num, dict(zip(headers, values))
+
+    @staticmethod
+    def _xlsx_rows(path):
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            headers = [_header_key(cell) for cell in next(rows, ())]
+            for line_no, values in enumerate(rows, start=2):
+                if any(value not in (None, "") for value in values):
+                    yield line_no, dict(zip(headers, values))
+        finally:
+            workbook.close()
+
+    def run(self, path, progress=None):
+        # progress(rows_read) is called per chunk; returning False cancels
+        store = self.repo.store
+        errors = []
+        batch = []
+        imported = 0
+        # A server commits each request on its own, so in client mode the
+        # rows are held back and sent as one batch once the file validates
+        remote = self.repo.remote is not None
+        pending = []
+        with store.transaction():
+            for line_no, row in self.read_rows(path):
+                try:
+                    batch.append(self.parse_row(row))
+                except ValidationError as exc:
+                    errors.append(f"Row {line_no}: {exc}")
+                    if len(errors) >= self.MAX_ERRORS:
+                        break
+                if len(batch) >= self.CHUNK_ROWS:
+                    if remote:
+                        pending.extend(batch)
+                    elif not errors:
+                        self.repo.insert_many(batch)
+                    imported += len(batch)
+                    batch = []
+                    if progress is not None and progress(imported) is False:
+                        raise ImportCancelled()
+            if errors:
+                raise ImportFailed(errors)
+            if remote:
+                pending.extend(batch)
+                batch = pending
+            self.repo.insert_many(batch)
+            imported += len(batch)
+        store.reload_indexes()
+        return imported
+
+
+def run_import(widget, repo, parse_row, noun):
+    # File picker, progress and error reporting around BulkImporter.
+    # Returns the number of rows imported (0 if nothing changed).
+    path, _ = QFileDialog.getOpenFileName(
+        widget, f"Import {noun.title()}", "", "Spreadsheets (*.csv *.xlsx);;All Files (*)"
+    )
+    if not path:
+        return 0
+
+    progress_dialog = QProgressDialog(f"Importing {noun}...", "Cancel", 0, 0, widget)
+    progress_dialog.setWindowModality(Qt.WindowModal)
+    progress_dialog.setMinimumDuration(300)
+
+    def progress(rows):
+        progress_dialog.setLabelText(f"Importing {noun}... {rows:,} rows read")
+        progress_dialog.setValue(0)
+        return not progress_dialog.wasCanceled()
+
+    try:
+        imported = BulkImporter(repo, parse_row).run(path, progress)
+    except ImportCancelled:
+        QMessageBox.information(widget, "Import Cancelled", "The import was cancelled; nothing was saved.")
+        return 0
+    except ImportFailed as exc:
+        more = "\n..." if len(exc.errors) >= BulkImporter.MAX_ERRORS else ""
+        QMessageBox.warning(widget, "Import Failed",
+                            "Nothing was imported. Fix these rows and try again:\n\n" + str(exc) + more)
+        return 0
+    except (OSError, UnicodeDecodeError, csv.Error) as exc:
+        QMessageBox.warning(widget, "Import Failed", f"Could not read the file:\n{exc}")
+        return 0
+    except ServerError as exc:
+        QMessageBox.warning(widget, "Import Failed", f"The server did not accept the import:\n{exc}")
+        return 0
+    finally:
+        progress_dialog.close()
+
+    QMessageBox.information(widget, "Import Complete", f"Imported {imported:,} {noun}.")
+    return imported
+
+
+class ThemeManager(QObject):
+    # Light and dark themes, each compiled once into an application
+    # stylesheet and palette. Widgets only carry a "role" (or "accent")
+    # property that the stylesheet selects on, so a theme switch is a single
+    # QApplication-wide pass instead of per-widget style strings being
+    # re-parsed and every descendant re-polished.
+    themeChanged = pyqtSignal(str)
+
+    THEMES = {
+        "light": {
+            "window": "#f5f6fa", "base": "#ffffff", "alternate": "#f9f9f9", "text": "#2c3e50",
+            "muted": "#555555", "card": "#ffffff", "value": "#333333", "border": "#dddddd",
+            "header": "#1a2980", "header_text": "#ffffff", "title": "#1E90FF", "report_title": "#00468C",
+            "accent": "#1E90FF", "accent_hover": "#0c69e5", "toggle": "#1a2980", "toggle_hover": "#0f1a5a",
+            "report": "#f0f0f0", "report_border": "#cccccc", "warning": "#B8860B", "highlight": "#1E90FF",
+        },
+        "dark": {
+            "window": "#2c3e50", "base": "#34495e", "alternate": "#3d566e", "text": "#ecf0f1",
+            "muted": "#bdc3c7", "card": "#34495e", "value": "#ecf0f1", "border": "#4a6278",
+            "header": "#1a2980", "header_text": "#ffffff", "title": "#5dade2", "report_title": "#85c1e9",
+            "accent": "#1a5fa8", "accent_hover": "#2472c8", "toggle": "#f39c12", "toggle_hover": "#d68910",
+            "report": "#273746", "report_border": "#4a6278", "warning": "#f4d03f", "highlight": "#2980b9",
+        },
+    }
+    ACCENTS = {"income": "#2ecc71", "expense": "#e74c3c", "inventory": "#3498db", "customers": "#f39c12"}
+
+    STYLESHEET = """
+        QWidget[role="sidebar"] {{ background-color: {accent}; }}
+        QPushButton[role="sidebarButton"] {{
+            color: white; background-color: {accent}; border: none;
+            text-align: left; padding-left: 20px; font-size: 14pt;
+        }}
+        QPushButton[role="sidebarButton"]:hover {{ background-color: {accent_hover}; }}
+        QPushButton[role="primary"] {{
+            background-color: {accent}; color: white; border-radius: 5px; font-size: 14pt;
+        }}
+        QPushButton[role="primary"]:hover {{ background-color: {accent_hover}; }}
+        QPushButton[role="themeToggle"] {{
+            background-color: {toggle}; border-radius: 20px; border: none; color: white; font-size: 18px;
+        }}
+        QPushButton[role="themeToggle"]:hover {{ background-color: {toggle_hover}; }}
+        QLabel[role="pageTitle"] {{ color: {title}; }}
+        QLabel[role="reportTitle"] {{ color: {report_title}; }}
+        QLabel[role="heading"] {{ color: {text}; }}
+        QLabel[role="sectionTitle"] {{ color: {text}; margin-top: 20px; }}
+        QLabel[role="warning"] {{ color: {warning}; }}
+        QFrame[role="summaryCard"] {{ background-color: {card}; border-radius: 10px; padding: 15px; }}
+        QLabel[role="cardTitle"] {{ font-size: 16px; font-weight: bold; color: {muted}; }}
+        QLabel[role="cardValue"] {{ font-size: 28px; font-weight: bold; color: {value}; }}
+        QLabel[role="cardIcon"] {{ font-size: 24px; }}
+        QTableWidget[role="activity"] {{
+            border: 1px solid {border}; border-radius: 8px; padding: 5px;
+            background-color: {base}; alternate-background-color: {alternate};
+        }}
+        QTableWidget[role="activity"] QHeaderView::section {{
+            background-color: {header}; color: {header_text}; padding: 8px; border: none;
+        }}
+        QListView[role="report"] {{ background-color: {report}; border: 1px solid {report_border}; }}
+    """
+    ACCENT_STYLESHEET = """
+        QFrame[role="summaryCard"][accent="{name}"] {{ border-left: 5px solid {color}; }}
+        QFrame[role="summaryCard"][accent="{name}"] QLabel[role="cardIcon"] {{ color: {color}; }}
+        QFrame[role="cardRule"][accent="{name}"] {{ color: {color}; }}
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.name = None
+        self._compiled = {}  # theme name -> (stylesheet, palette)
+
+    def compiled(self, name):
+        if name not in self._compiled:
+            colors = self.THEMES[name]
+            sheet = self.STYLESHEET.format(**colors) + "".join(
+                self.ACCENT_STYLESHEET.format(name=accent, color=color) for accent, color in self.ACCENTS.items()
+            )
+            palette = QPalette()
+            for role, key in ((QPalette.Window, "window"), (QPalette.Base, "base"),
+                              (QPalette.AlternateBase, "alternate"), (QPalette.Button, "base"),
+                              (QPalette.Highlight, "highlight")):
+                palette.setColor(role, QColor(colors[key]))
+            for role in (QPalette.WindowText, QPalette.Text, QPalette.ButtonText, QPalette.ToolTipText):
+                palette.setColor(role, QColor(colors["text"]))
+            palette.setColor(QPalette.ToolTipBase, QColor(colors["base"]))
+            palette.setColor(QPalette.HighlightedText, QColor("#ffffff"))
+            self._compiled[name] = (sheet, palette)
+        return self._compiled[name]
+
+    def apply(self, name):
+        if name == self.name:
+            return
+        sheet, palette = self.compiled(name)
+        app = QApplication.instance()
+        app.setPalette(palette)
+        app.setStyleSheet(sheet)
+        self.name = name
+        self.themeChanged.emit(name)
+
+    def toggle(self):
+        self.apply("light" if self.name == "dark" else "dark")
+
+    def color(self, key):
+        return QColor(self.THEMES[self.name or "light"][key])
+
+
+THEME = ThemeManager()
 
 
 class LoginWindow(QWidget):
+    # Emitted on valid credentials; the main window opens the store and
+    # builds its pages from here
+    loggedIn = pyqtSignal()
+
     def __init__(self, parent_stack=None):
         super().__init__()
         self.stack = parent_stack
+        self._painted = False
         self.setWindowTitle("Luqman Steel Trader - Login")
         self.setFixedSize(1980, 1080)  # Slightly more compact size
 
@@ -377,8 +4179,7 @@ class LoginWindow(QWidget):
         if username == "admin" and password == "password":
             self.message_label.setStyleSheet("color: #2ecc71; font-weight: bold;")
             self.message_label.setText("Login successful!")
-            if self.stack:
-                self.stack.setCurrentIndex(1)
+            self.loggedIn.emit()
         else:
             self.message_label.setStyleSheet("color: #e74c3c; font-weight: bold;")
             self.message_label.setText("Invalid username or password.")
@@ -386,6 +4187,12 @@ class LoginWindow(QWidget):
             # Shake animation for wrong credentials
             self.shake_login()
 
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self._painted:
+            self._painted = True
+            STARTUP.mark("first paint")
+
     def shake_login(self):
         anim = QPropertyAnimation(self.login_btn, b"pos")
         anim.setDuration(300)
@@ -398,12 +4205,178 @@ class LoginWindow(QWidget):
         anim.start()
 
 
+class Sparkline(QWidget):
+    # Small trend line under a card value; repaints only when the series
+    # actually changes
+    def __init__(self, color, parent=None):
+        super().__init__(parent)
+        self.color = QColor(color)
+        self.values = []
+        self.setFixedHeight(28)
+
+    def set_values(self, values):
+        values = list(values)
+        if values != self.values:
+            self.values = values
+            self.update()
+
+    def paintEvent(self, event):
+        if len(self.values) < 2:
+            return
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        low, high = min(self.values), max(self.values)
+        span = (high - low) or 1
+        width, height = self.width() - 4, self.height() - 4
+        step = width / (len(self.values) - 1)
+        line = QPolygonF([
+            QPointF(2 + i * step, 2 + height - (value - low) * height / span)
+            for i, value in enumerate(self.values)
+        ])
+        painter.setPen(QPen(self.color, 2))
+        painter.drawPolyline(line)
+
+
+class SummaryCard(QFrame):
+    # Dashboard card that keeps direct references to its labels. New values
+    # are throttled to one visible change per THROTTLE_MS (first and last
+    # value of a burst always land) and counted up/down with a short
+    # animation. The value label ignores its text width, so updates never
+    # relayout the grid. The sparkline shows a given trend, or the card's own
+    # recent values when none is given.
+    THROTTLE_MS = 100
+    ANIMATION_MS = 300
+    HISTORY = 60
+
+    def __init__(self, title, icon, accent, tooltip, formatter, parent=None):
+        super().__init__(parent)
+        self.formatter = formatter  # value -> display text
+        self.setFixedHeight(170)
+        # Colours come from the theme stylesheet via these properties
+        self.setProperty("role", "summaryCard")
+        self.setProperty("accent", accent)
+        self.setToolTip(tooltip)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(10, 10, 10, 10)
+        layout.setSpacing(6)
+
+        # Top row (icon and title)
+        top_row = QHBoxLayout()
+        self.icon_label = QLabel(icon)
+        self.icon_label.setProperty("role", "cardIcon")
+        top_row.addWidget(self.icon_label)
+        self.title_label = QLabel(title)
+        self.title_label.setProperty("role", "cardTitle")
+        top_row.addWidget(self.title_label)
+        top_row.addStretch()
+        layout.addLayout(top_row)
+
+        # Value
+        self.value_label = QLabel(formatter(0))
+        self.value_label.setProperty("role", "cardValue")
+        self.value_label.setAlignment(Qt.AlignCenter)
+        self.value_label.setSizePolicy(QSizePolicy.Ignored, QSizePolicy.Fixed)
+        layout.addWidget(self.value_label)
+
+        self.sparkline = Sparkline(ThemeManager.ACCENTS[accent])
+        layout.addWidget(self.sparkline)
+
+        # Bottom border effect
+        bottom_border = QFrame()
+        bottom_border.setFrameShape(QFrame.HLine)
+        bottom_border.setProperty("role", "cardRule")
+        bottom_border.setProperty("accent", accent)
+        bottom_border.setFixedHeight(2)
+        layout.addWidget(bottom_border)
+
+        self._shown = 0
+        self._target = 0
+        self._trend = None
+        self._dirty = False
+        self._history = deque(maxlen=self.HISTORY)
+        self._animation = QVariantAnimation(self)
+        self._animation.setDuration(self.ANIMATION_MS)
+        self._animation.setEasingCurve(QEasingCurve.OutCubic)
+        self._animation.valueChanged.connect(self._show)
+        self._throttle = QTimer(self)
+        self._throttle.setSingleShot(True)
+        self._throttle.setInterval(self.THROTTLE_MS)
+        self._throttle.timeout.connect(self._throttle_elapsed)
+
+        self._fade_in()
+
+    def _fade_in(self):
+        # Fade-in animation
+        opacity_effect = QGraphicsOpacityEffect(self)
+        self.setGraphicsEffect(opacity_effect)
+        fade_anim = QPropertyAnimation(opacity_effect, b"opacity", self)
+        fade_anim.setDuration(800)
+        fade_anim.setStartValue(0)
+        fade_anim.setEndValue(1)
+        fade_anim.setEasingCurve(QEasingCurve.InOutQuad)
+        fade_anim.finished.connect(lambda: self.setGraphicsEffect(None))
+        fade_anim.start()
+
+    def value(self):
+        return self._target
+
+    def set_value(self, value, trend=None):
+        self._target = value
+        self._trend = trend
+        if self._throttle.isActive():
+            self._dirty = True
+            return
+        self._apply()
+        self._throttle.start()
+
+    def _throttle_elapsed(self):
+        if self._dirty:
+            self._dirty = False
+            self._apply()
+            self._throttle.start()
+
+    def _apply(self):
+        target = self._target
+        if self._trend is not None:
+            self.sparkline.set_values(self._trend)
+        else:
+            if not self._history or self._history[-1] != target:
+                self._history.append(target)
+            self.sparkline.set_values(self._history)
+        if target == self._shown and self._animation.state() != QVariantAnimation.Running:
+            return
+        self._animation.stop()
+        if not self.isVisible():
+            self._show(target)
+            return
+        self._animation.setStartValue(float(self._shown))
+        self._animation.setEndValue(float(target))
+        self._animation.start()
+
+    def _show(self, value):
+        # The last animation step lands exactly on the end value
+        self._shown = value
+        self.value_label.setText(self.formatter(value))
+
+
+def format_pkr_paisa(value):
+    return f"{value / 100:,.2f} PKR"
+
+
 class DashboardWidget(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.parent_main = parent
-        self.dark_mode = False
         self.init_ui()
+        THEME.themeChanged.connect(self._on_theme_changed)
+        self._on_theme_changed(THEME.name)
+        if parent is not None:
+            # The cards read running totals, so one refresh per coalesced
+            # batch of changes is cheap
+            events = parent.store.events
+            events.changed.connect(self.update_dashboard_data)
+            events.dataReset.connect(self.update_dashboard_data)
 
     def init_ui(self):
         # Main layout
@@ -417,7 +4390,7 @@ class DashboardWidget(QWidget):
         # Title
         title = QLabel("Dashboard Overview")
         title.setFont(QFont("Arial", 20, QFont.Bold))
-        title.setStyleSheet("color: #2c3e50;")
+        title.setProperty("role", "heading")
         header.addWidget(title)
 
         # Spacer
@@ -426,18 +4399,7 @@ class DashboardWidget(QWidget):
         # Theme toggle
         self.theme_toggle_btn = QPushButton()
         self.theme_toggle_btn.setFixedSize(40, 40)
-        self.theme_toggle_btn.setStyleSheet("""
-            QPushButton {
-                background-color: #1a2980;
-                border-radius: 20px;
-                border: none;
-                color: white;
-                font-size: 18px;
-            }
-            QPushButton:hover {
-                background-color: #0f1a5a;
-            }
-        """)
+        self.theme_toggle_btn.setProperty("role", "themeToggle")
         self.theme_toggle_btn.clicked.connect(self.toggle_theme)
         header.addWidget(self.theme_toggle_btn)
 
@@ -449,26 +4411,26 @@ class DashboardWidget(QWidget):
         cards_grid.setVerticalSpacing(20)
 
         # Card 1 - Income
-        self.total_income_card = self._create_summary_card(
-            "Total Income", "💰", "#2ecc71", "0.00 PKR", "Total income received"
+        self.total_income_card = SummaryCard(
+            "Total Income", "💰", "income", "Total income received (last 12 months trend)", format_pkr_paisa
         )
         cards_grid.addWidget(self.total_income_card, 0, 0)
 
         # Card 2 - Expense
-        self.total_expense_card = self._create_summary_card(
-            "Total Expense", "💸", "#e74c3c", "0.00 PKR", "Total expenses paid"
+        self.total_expense_card = SummaryCard(
+            "Total Expense", "💸", "expense", "Total expenses paid (last 12 months trend)", format_pkr_paisa
         )
         cards_grid.addWidget(self.total_expense_card, 0, 1)
 
         # Card 3 - Inventory
-        self.inventory_value_card = self._create_summary_card(
-            "Inventory Value", "📦", "#3498db", "0.00 PKR", "Current stock value"
+        self.inventory_value_card = SummaryCard(
+            "Inventory Value", "📦", "inventory", "Stock on hand at weighted average cost", format_pkr_paisa
         )
         cards_grid.addWidget(self.inventory_value_card, 1, 0)
 
         # Card 4 - Customers
-        self.total_customers_card = self._create_summary_card(
-            "Total Customers", "👥", "#f39c12", "0", "Registered customers"
+        self.total_customers_card = SummaryCard(
+            "Total Customers", "👥", "customers", "Registered customers", lambda value: f"{round(value):,}"
         )
         cards_grid.addWidget(self.total_customers_card, 1, 1)
 
@@ -477,7 +4439,7 @@ class DashboardWidget(QWidget):
         # Recent Activity Section
         recent_activity_label = QLabel("Recent Activity")
         recent_activity_label.setFont(QFont("Arial", 16, QFont.Bold))
-        recent_activity_label.setStyleSheet("color: #2c3e50; margin-top: 20px;")
+        recent_activity_label.setProperty("role", "sectionTitle")
         layout.addWidget(recent_activity_label)
 
         # Recent Activity Table
@@ -487,127 +4449,38 @@ class DashboardWidget(QWidget):
         self.recent_activity_table.verticalHeader().setVisible(False)
         self.recent_activity_table.setEditTriggers(QTableWidget.NoEditTriggers)
         self.recent_activity_table.setSelectionBehavior(QTableWidget.SelectRows)
-        self.recent_activity_table.setStyleSheet("""
-            QTableWidget {
-                border: 1px solid #ddd;
-                border-radius: 8px;
-                padding: 5px;
-                background-color: white;
-                alternate-background-color: #f9f9f9;
-            }
-            QHeaderView::section {
-                background-color: #1a2980;
-                color: white;
-                padding: 8px;
-                border: none;
-            }
-        """)
+        self.recent_activity_table.setProperty("role", "activity")
         layout.addWidget(self.recent_activity_table)
 
         layout.addStretch()
         self.setLayout(layout)
 
-    def _create_summary_card(self, title, icon, color, value, tooltip):
-        card = QFrame()
-        card.setFixedHeight(150)
-        card.setStyleSheet(f"""
-            QFrame {{
-                background-color: white;
-                border-radius: 10px;
-                border-left: 5px solid {color};
-                padding: 15px;
-            }}
-            QFrame:hover {{
-                box-shadow: 0 5px 15px rgba(0,0,0,0.1);
-            }}
-        """)
-        card.setToolTip(tooltip)
-
-        layout = QVBoxLayout(card)
-        layout.setContentsMargins(10, 10, 10, 10)
-        layout.setSpacing(10)
-
-        # Top row (icon and title)
-        top_row = QHBoxLayout()
-
-        # Icon
-        icon_label = QLabel(icon)
-        icon_label.setStyleSheet(f"font-size: 24px; color: {color};")
-        top_row.addWidget(icon_label)
-
-        # Title
-        title_label = QLabel(title)
-        title_label.setStyleSheet("font-size: 16px; font-weight: bold; color: #555;")
-        top_row.addWidget(title_label)
-        top_row.addStretch()
-
-        layout.addLayout(top_row)
-
-        # Value
-        value_label = QLabel(value)
-        value_label.setStyleSheet("font-size: 28px; font-weight: bold; color: #333;")
-        value_label.setAlignment(Qt.AlignCenter)
-        layout.addWidget(value_label)
-
-        # Bottom border effect
-        bottom_border = QFrame()
-        bottom_border.setFrameShape(QFrame.HLine)
-        bottom_border.setStyleSheet(f"color: {color};")
-        bottom_border.setFixedHeight(2)
-        layout.addWidget(bottom_border)
-
-        # Add animation
-        self._add_card_animation(card)
-
-        return card
-
-    def _add_card_animation(self, card):
-        # Fade-in animation
-        opacity_effect = QGraphicsOpacityEffect(card)
-        card.setGraphicsEffect(opacity_effect)
-        fade_anim = QPropertyAnimation(opacity_effect, b"opacity")
-        fade_anim.setDuration(800)
-        fade_anim.setStartValue(0)
-        fade_anim.setEndValue(1)
-        fade_anim.setEasingCurve(QEasingCurve.InOutQuad)
-        fade_anim.start()
-
+    @INSTRUMENTS.timed()
     def update_dashboard_data(self):
         if self.parent_main:
-            financial_records = self.parent_main.financial.records
-            inventory_items = self.parent_main.inventory.items
-            customers = self.parent_main.customer.customers
+            store = self.parent_main.store
+            aggregates = store.aggregates
 
-            total_income = sum(r.amount for r in financial_records if r.record_type == "Income")
-            total_expense = sum(r.amount for r in financial_records if r.record_type == "Expense")
-            total_inventory_value = sum(item.quantity * item.unit_price for item in inventory_items)
-            num_customers = len(customers)
+            # Income/expense trends are the last 12 months from the monthly
+            # prefix-sum buckets; the other cards chart their own history
+            this_month = day_to_month(to_day(QDate.currentDate()))
+            incomes, expenses = store.period_totals.monthly_series(this_month, 12)
 
-            # Update card values
-            self._update_card_value(self.total_income_card, f"{total_income:,.2f} PKR")
-            self._update_card_value(self.total_expense_card, f"{total_expense:,.2f} PKR")
-            self._update_card_value(self.inventory_value_card, f"{total_inventory_value:,.2f} PKR")
-            self._update_card_value(self.total_customers_card, f"{num_customers:,}")
+            # Update card values (paisa and counts)
+            self.total_income_card.set_value(aggregates.income, incomes)
+            self.total_expense_card.set_value(aggregates.expense, expenses)
+            self.inventory_value_card.set_value(aggregates.inventory_value)
+            self.total_customers_card.set_value(aggregates.customer_count)
 
             # Update recent activity
-            self._update_recent_activity(financial_records)
-
-    def _update_card_value(self, card, value):
-        # Find the value label in the card's layout
-        for i in range(card.layout().count()):
-            widget = card.layout().itemAt(i).widget()
-            if isinstance(widget, QLabel) and widget.styleSheet().find("28px") != -1:
-                widget.setText(value)
-                break
+            self._update_recent_activity(aggregates.recent_records())
 
+    @INSTRUMENTS.timed()
     def _update_recent_activity(self, records):
-        self.recent_activity_table.setRowCount(0)
-        recent_records = sorted(records, key=lambda r: r.date.toPyDate(), reverse=True)[:5]
-
-        for record in recent_records:
-            row = self.recent_activity_table.rowCount()
-            self.recent_activity_table.insertRow(row)
+        # At most RECENT_LIMIT rows, so the items are simply replaced
+        self.recent_activity_table.setRowCount(len(records))
 
+        for row, record in enumerate(records):
             # Date
             date_item = QTableWidgetItem(record.date.toString("yyyy-MM-dd"))
             date_item.setTextAlignment(Qt.AlignCenter)
@@ -627,49 +4500,50 @@ class DashboardWidget(QWidget):
             self.recent_activity_table.setItem(row, 2, amount_item)
 
     def toggle_theme(self):
-        self.dark_mode = not self.dark_mode
-        if self.dark_mode:
-            self.setStyleSheet("""
-                QWidget {
-                    background-color: #2c3e50;
-                    color: #ecf0f1;
-                }
-                QFrame {
-                    background-color: #34495e;
-                }
-                QTableWidget {
-                    background-color: #34495e;
-                    color: #ecf0f1;
-                }
-                QHeaderView::section {
-                    background-color: #1a2980;
-                    color: white;
-                }
-            """)
-            self.theme_toggle_btn.setText("🌞")
-        else:
-            self.setStyleSheet("")
-            self.theme_toggle_btn.setText("🌙")
+        # Switches the whole application, not just the dashboard
+        THEME.toggle()
+
+    def _on_theme_changed(self, name):
+        self.theme_toggle_btn.setText("🌞" if name == "dark" else "🌙")
 
 
-# ... [Keep all your other existing classes: FinancialWidget, InventoryWidget, CustomerWidget, ReportsWidget, MainWindow] ...
 class FinancialWidget(QWidget):
-    def __init__(self, parent=None):
+    def __init__(self, repo, parent=None):
         super().__init__(parent)
-        self.records = []
+        self.repo = repo
 
         layout = QVBoxLayout()
         title = QLabel("Financial Management")
         title.setFont(QFont("Segoe UI", 16, QFont.Bold))
-        title.setStyleSheet("color: #1E90FF;")
+        title.setProperty("role", "pageTitle")
         layout.addWidget(title)
 
-        self.table = QTableWidget(0, 4)
-        self.table.setHorizontalHeaderLabels(["Date", "Description", "Amount (PKR)", "Type"])
-        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.search_index = repo.store.search["financial"]
+        self.search_bar = SearchBar("Search transactions by description...")
+        self.search_bar.searchChanged.connect(self.refresh_table)
+        layout.addWidget(self.search_bar)
+
+        self.model = RecordTableModel(self.repo, [
+            ("Date", lambda r: r.date.toString("yyyy-MM-dd")),
+            ("Description", lambda r: r.description),
+            ("Amount (PKR)", lambda r: f"{r.amount:,.2f}"),
+            ("Type", lambda r: r.record_type),
+        ], self)
+
+        # Rows follow the store's change notifications, whoever made them
+        events = repo.store.events
+        events.recordsInserted.connect(self.model.insert_ids)
+        events.recordsUpdated.connect(self.model.update_ids)
+        events.recordsRemoved.connect(self.model.remove_ids)
+        events.changed.connect(self.on_data_changed)
+        events.dataReset.connect(self.refresh_table)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
         self.table.setSelectionBehavior(self.table.SelectRows)
-        self.table.setSelectionMode(self.table.SingleSelection)
+        self.table.setSelectionMode(self.table.ExtendedSelection)
         self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.doubleClicked.connect(self.edit_record)
         layout.addWidget(self.table)
 
         btn_layout = QHBoxLayout()
@@ -677,6 +4551,18 @@ class FinancialWidget(QWidget):
         self.add_btn.clicked.connect(self.add_record)
         btn_layout.addWidget(self.add_btn)
 
+        self.edit_btn = QPushButton("Edit Selected")
+        self.edit_btn.clicked.connect(self.edit_record)
+        btn_layout.addWidget(self.edit_btn)
+
+        self.import_btn = QPushButton("Import CSV/Excel")
+        self.import_btn.clicked.connect(self.import_records)
+        btn_layout.addWidget(self.import_btn)
+
+        self.export_btn = QPushButton("Export")
+        self.export_btn.clicked.connect(self.export_table)
+        btn_layout.addWidget(self.export_btn)
+
         self.delete_btn = QPushButton("Delete Selected")
         self.delete_btn.clicked.connect(self.delete_record)
         btn_layout.addWidget(self.delete_btn)
@@ -685,60 +4571,109 @@ class FinancialWidget(QWidget):
         layout.addLayout(btn_layout)
         self.setLayout(layout)
 
+    def export_table(self):
+        start_export(self, TableExport("financial"), self.repo.store.path)
+
+    def import_records(self):
+        # A successful import resets the store's indexes, which refreshes
+        # the page through the change bus
+        run_import(self, self.repo, financial_from_row, "transactions")
+
+    @reports_server_errors
     def add_record(self):
         dialog = FinancialDialog(self)
         if dialog.exec_() == QDialog.Accepted:
             record = dialog.get_data()
             if record:
-                self.records.append(record)
-                self.refresh_table()
-                # Update dashboard after data change
-                if isinstance(self.parent(), MainWindow):
-                    self.parent().dashboard.update_dashboard_data()
-
+                self.repo.insert(record)
+
+    @reports_server_errors
+    def edit_record(self):
+        records = selected_records(self.table)
+        if not records:
+            QMessageBox.information(self, "Information", "Select a transaction to edit.")
+            return
+        if len(records) > 1:
+            first = records[0]
+            date_edit = QDateEdit(first.date)
+            date_edit.setCalendarPopup(True)
+            type_combo = QComboBox()
+            type_combo.addItems(["Income", "Expense"])
+            type_combo.setCurrentText(first.record_type)
+            bulk_edit(self, self.repo, records, "transactions", [
+                ("Date:", "date", date_edit, False),
+                ("Type:", "record_type", type_combo, False),
+            ])
+            return
+        current = records[0]
+        dialog = FinancialDialog(self, record=current)
+        if dialog.exec_() == QDialog.Accepted:
+            record = dialog.get_data()
+            if record:
+                record.id = current.id
+                self.repo.update(record)
 
+    @reports_server_errors
     def delete_record(self):
-        selected = self.table.currentRow()
-        if selected >= 0:
-            descr = self.table.item(selected,1).text()
-            reply = QMessageBox.question(self, "Confirm Delete", f"Delete the transaction '{descr}'?", QMessageBox.Yes | QMessageBox.No)
-            if reply == QMessageBox.Yes:
-                self.records.pop(selected)
-                self.refresh_table()
-                # Update dashboard after data change
-                if isinstance(self.parent(), MainWindow):
-                    self.parent().dashboard.update_dashboard_data()
-        else:
+        records = selected_records(self.table)
+        if not records:
             QMessageBox.information(self, "Information", "Select a transaction to delete.")
+            return
+        if len(records) == 1:
+            question = f"Delete the transaction '{records[0].description}'?"
+        else:
+            question = f"Delete the {len(records):,} selected transactions?"
+        reply = QMessageBox.question(self, "Confirm Delete", question, QMessageBox.Yes | QMessageBox.No)
+        if reply == QMessageBox.Yes:
+            self.repo.delete_many([obj.id for obj in records])
+
+    def on_data_changed(self, tables):
+        if "financial" in tables and self.model.is_filtered():
+            self.refresh_table()
 
+    @INSTRUMENTS.timed()
     def refresh_table(self):
-        self.table.setRowCount(0)
-        for record in sorted(self.records, key=lambda r: r.date.toPyDate(), reverse=True):
-            row = self.table.rowCount()
-            self.table.insertRow(row)
-            self.table.setItem(row, 0, QTableWidgetItem(record.date.toString("yyyy-MM-dd")))
-            self.table.setItem(row, 1, QTableWidgetItem(record.description))
-            self.table.setItem(row, 2, QTableWidgetItem(f"{record.amount:,.2f}"))
-            self.table.setItem(row, 3, QTableWidgetItem(record.record_type))
+        self.model.set_matches(self.search_index.search(self.search_bar.text()))
 
 
 class InventoryWidget(QWidget):
-    def __init__(self, parent=None):
+    def __init__(self, repo, parent=None):
         super().__init__(parent)
-        self.items = []
+        self.repo = repo
 
         layout = QVBoxLayout()
         title = QLabel("Inventory Management")
         title.setFont(QFont("Segoe UI", 16, QFont.Bold))
-        title.setStyleSheet("color: #1E90FF;")
+        title.setProperty("role", "pageTitle")
         layout.addWidget(title)
 
-        self.table = QTableWidget(0,5)
-        self.table.setHorizontalHeaderLabels(["Product Name", "Quantity", "Unit Price (PKR)", "Supplier", "Last Updated"])
-        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.search_index = repo.store.search["inventory"]
+        self.search_bar = SearchBar("Search items by name or supplier...")
+        self.search_bar.searchChanged.connect(self.refresh_table)
+        layout.addWidget(self.search_bar)
+
+        self.model = RecordTableModel(self.repo, [
+            ("Product Name", lambda i: i.name),
+            ("Quantity", lambda i: str(i.quantity)),
+            ("Unit Price (PKR)", lambda i: f"{i.unit_price:,.2f}"),
+            ("Supplier", lambda i: i.supplier),
+            ("Last Updated", lambda i: i.last_updated.toString("yyyy-MM-dd")),
+        ], self)
+
+        # Rows follow the store's change notifications, whoever made them
+        events = repo.store.events
+        events.itemsInserted.connect(self.model.insert_ids)
+        events.itemsUpdated.connect(self.model.update_ids)
+        events.itemsRemoved.connect(self.model.remove_ids)
+        events.changed.connect(self.on_data_changed)
+        events.dataReset.connect(self.refresh_table)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
         self.table.setSelectionBehavior(self.table.SelectRows)
-        self.table.setSelectionMode(self.table.SingleSelection)
+        self.table.setSelectionMode(self.table.ExtendedSelection)
         self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.doubleClicked.connect(self.edit_item)
         layout.addWidget(self.table)
 
         btn_layout = QHBoxLayout()
@@ -746,6 +4681,22 @@ class InventoryWidget(QWidget):
         self.add_btn.clicked.connect(self.add_item)
         btn_layout.addWidget(self.add_btn)
 
+        self.edit_btn = QPushButton("Edit Selected")
+        self.edit_btn.clicked.connect(self.edit_item)
+        btn_layout.addWidget(self.edit_btn)
+
+        self.movement_btn = QPushButton("Stock Movement")
+        self.movement_btn.clicked.connect(self.record_movement)
+        btn_layout.addWidget(self.movement_btn)
+
+        self.import_btn = QPushButton("Import CSV/Excel")
+        self.import_btn.clicked.connect(self.import_items)
+        btn_layout.addWidget(self.import_btn)
+
+        self.export_btn = QPushButton("Export")
+        self.export_btn.clicked.connect(self.export_table)
+        btn_layout.addWidget(self.export_btn)
+
         self.delete_btn = QPushButton("Delete Selected")
         self.delete_btn.clicked.connect(self.delete_item)
         btn_layout.addWidget(self.delete_btn)
@@ -753,60 +4704,128 @@ class InventoryWidget(QWidget):
         layout.addLayout(btn_layout)
         self.setLayout(layout)
 
+    def export_table(self):
+        start_export(self, TableExport("inventory"), self.repo.store.path)
+
+    def import_items(self):
+        # A successful import resets the store's indexes, which refreshes
+        # the page through the change bus
+        run_import(self, self.repo, inventory_from_row, "items")
+
+    @reports_server_errors
     def add_item(self):
         dialog = InventoryDialog(self)
         if dialog.exec_() == QDialog.Accepted:
             item = dialog.get_data()
             if item:
-                self.items.append(item)
-                self.refresh_table()
-                # Update dashboard after data change
-                if isinstance(self.parent(), MainWindow):
-                    self.parent().dashboard.update_dashboard_data()
+                self.repo.insert(item)
+
+    @reports_server_errors
+    def edit_item(self):
+        items = selected_records(self.table)
+        if not items:
+            QMessageBox.information(self, "Information", "Select an item to edit.")
+            return
+        if len(items) > 1:
+            first = items[0]
+            quantity_edit = QSpinBox()
+            quantity_edit.setRange(0, MAX_QUANTITY)
+            quantity_edit.setValue(first.quantity)
+            price_edit = QDoubleSpinBox()
+            price_edit.setRange(0, MAX_AMOUNT)
+            price_edit.setDecimals(2)
+            price_edit.setValue(first.unit_price)
+            date_edit = QDateEdit(QDate.currentDate())
+            date_edit.setCalendarPopup(True)
+            bulk_edit(self, self.repo, items, "items", [
+                ("Quantity:", "quantity", quantity_edit, False),
+                ("Unit Price (PKR):", "unit_price", price_edit, False),
+                ("Supplier:", "supplier", QLineEdit(first.supplier), False),
+                ("Last Updated:", "last_updated", date_edit, False),
+            ])
+            return
+        current = items[0]
+        dialog = InventoryDialog(self, item=current)
+        if dialog.exec_() == QDialog.Accepted:
+            item = dialog.get_data()
+            if item:
+                item.id = current.id
+                self.repo.update(item)
+
+    @reports_server_errors
+    def record_movement(self):
+        items = selected_records(self.table)
+        if len(items) != 1:
+            QMessageBox.information(self, "Information", "Select one item to record a movement for.")
+            return
+        stock = self.repo.store.stock
+        dialog = StockMovementDialog(self, items[0], stock)
+        if dialog.exec_() == QDialog.Accepted:
+            try:
+                stock.record(items[0].id, *dialog.get_data())
+            except ValidationError as exc:
+                QMessageBox.warning(self, "Validation Error", str(exc))
 
+    @reports_server_errors
     def delete_item(self):
-        selected = self.table.currentRow()
-        if selected >= 0:
-            name = self.table.item(selected,0).text()
-            reply = QMessageBox.question(self, "Confirm Delete", f"Delete the item '{name}'?", QMessageBox.Yes | QMessageBox.No)
-            if reply == QMessageBox.Yes:
-                self.items.pop(selected)
-                self.refresh_table()
-                # Update dashboard after data change
-                if isinstance(self.parent(), MainWindow):
-                    self.parent().dashboard.update_dashboard_data()
-        else:
+        items = selected_records(self.table)
+        if not items:
             QMessageBox.information(self, "Information", "Select an item to delete.")
+            return
+        if len(items) == 1:
+            question = f"Delete the item '{items[0].name}'?"
+        else:
+            question = f"Delete the {len(items):,} selected items?"
+        reply = QMessageBox.question(self, "Confirm Delete", question, QMessageBox.Yes | QMessageBox.No)
+        if reply == QMessageBox.Yes:
+            self.repo.delete_many([obj.id for obj in items])
+
+    def on_data_changed(self, tables):
+        if "inventory" in tables and self.model.is_filtered():
+            self.refresh_table()
 
+    @INSTRUMENTS.timed()
     def refresh_table(self):
-        self.table.setRowCount(0)
-        for item in sorted(self.items, key=lambda i: i.name):
-            row = self.table.rowCount()
-            self.table.insertRow(row)
-            self.table.setItem(row,0,QTableWidgetItem(item.name))
-            self.table.setItem(row,1,QTableWidgetItem(str(item.quantity)))
-            self.table.setItem(row,2,QTableWidgetItem(f"{item.unit_price:,.2f}"))
-            self.table.setItem(row,3,QTableWidgetItem(item.supplier))
-            self.table.setItem(row,4,QTableWidgetItem(item.last_updated.toString("yyyy-MM-dd")))
+        self.model.set_matches(self.search_index.search(self.search_bar.text()))
 
 
 class CustomerWidget(QWidget):
-    def __init__(self, parent=None):
+    def __init__(self, repo, parent=None):
         super().__init__(parent)
-        self.customers = []
+        self.repo = repo
 
         layout = QVBoxLayout()
         title = QLabel("Customer Record Management")
         title.setFont(QFont("Segoe UI", 16, QFont.Bold))
-        title.setStyleSheet("color: #1E90FF;")
+        title.setProperty("role", "pageTitle")
         layout.addWidget(title)
 
-        self.table = QTableWidget(0,4)
-        self.table.setHorizontalHeaderLabels(["Customer Name", "Contact Number", "Address", "Email"])
-        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.search_index = repo.store.search["customers"]
+        self.search_bar = SearchBar("Search customers by name, contact or email...")
+        self.search_bar.searchChanged.connect(self.refresh_table)
+        layout.addWidget(self.search_bar)
+
+        self.model = RecordTableModel(self.repo, [
+            ("Customer Name", lambda c: c.name),
+            ("Contact Number", lambda c: c.contact_number),
+            ("Address", lambda c: c.address),
+            ("Email", lambda c: c.email),
+        ], self)
+
+        # Rows follow the store's change notifications, whoever made them
+        events = repo.store.events
+        events.customersInserted.connect(self.model.insert_ids)
+        events.customersUpdated.connect(self.model.update_ids)
+        events.customersRemoved.connect(self.model.remove_ids)
+        events.changed.connect(self.on_data_changed)
+        events.dataReset.connect(self.refresh_table)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
         self.table.setSelectionBehavior(self.table.SelectRows)
-        self.table.setSelectionMode(self.table.SingleSelection)
+        self.table.setSelectionMode(self.table.ExtendedSelection)
         self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.doubleClicked.connect(self.edit_customer)
         layout.addWidget(self.table)
 
         btn_layout = QHBoxLayout()
@@ -814,6 +4833,18 @@ class CustomerWidget(QWidget):
         self.add_btn.clicked.connect(self.add_customer)
         btn_layout.addWidget(self.add_btn)
 
+        self.edit_btn = QPushButton("Edit Selected")
+        self.edit_btn.clicked.connect(self.edit_customer)
+        btn_layout.addWidget(self.edit_btn)
+
+        self.import_btn = QPushButton("Import CSV/Excel")
+        self.import_btn.clicked.connect(self.import_customers)
+        btn_layout.addWidget(self.import_btn)
+
+        self.export_btn = QPushButton("Export")
+        self.export_btn.clicked.connect(self.export_table)
+        btn_layout.addWidget(self.export_btn)
+
         self.delete_btn = QPushButton("Delete Selected")
         self.delete_btn.clicked.connect(self.delete_customer)
         btn_layout.addWidget(self.delete_btn)
@@ -821,40 +4852,863 @@ class CustomerWidget(QWidget):
         layout.addLayout(btn_layout)
         self.setLayout(layout)
 
+    def export_table(self):
+        start_export(self, TableExport("customers"), self.repo.store.path)
+
+    def import_customers(self):
+        # A successful import resets the store's indexes, which refreshes
+        # the page through the change bus
+        run_import(self, self.repo, customer_from_row, "customers")
+
+    @reports_server_errors
     def add_customer(self):
         dialog = CustomerDialog(self)
         if dialog.exec_() == QDialog.Accepted:
             customer = dialog.get_data()
             if customer:
-                self.customers.append(customer)
-                self.refresh_table()
-                # Update dashboard after data change
-                if isinstance(self.parent(), MainWindow):
-                    self.parent().dashboard.update_dashboard_data()
+                self.repo.insert(customer)
+
+    @reports_server_errors
+    def edit_customer(self):
+        customers = selected_records(self.table)
+        if not customers:
+            QMessageBox.information(self, "Information", "Select a customer to edit.")
+            return
+        if len(customers) > 1:
+            first = customers[0]
+            bulk_edit(self, self.repo, customers, "customers", [
+                ("Address:", "address", QLineEdit(first.address), True),
+            ])
+            return
+        current = customers[0]
+        dialog = CustomerDialog(self, customer=current)
+        if dialog.exec_() == QDialog.Accepted:
+            customer = dialog.get_data()
+            if customer:
+                customer.id = current.id
+                self.repo.update(customer)
 
+    @reports_server_errors
     def delete_customer(self):
-        selected = self.table.currentRow()
-        if selected >= 0:
-            name = self.table.item(selected,0).text()
-            reply = QMessageBox.question(self, "Confirm Delete", f"Delete the customer '{name}'?", QMessageBox.Yes | QMessageBox.No)
-            if reply == QMessageBox.Yes:
-                self.customers.pop(selected)
-                self.refresh_table()
-                # Update dashboard after data change
-                if isinstance(self.parent(), MainWindow):
-                    self.parent().dashboard.update_dashboard_data()
-        else:
+        customers = selected_records(self.table)
+        if not customers:
             QMessageBox.information(self, "Information", "Select a customer to delete.")
+            return
+        if len(customers) == 1:
+            question = f"Delete the customer '{customers[0].name}'?"
+        else:
+            question = f"Delete the {len(customers):,} selected customers?"
+        reply = QMessageBox.question(self, "Confirm Delete", question, QMessageBox.Yes | QMessageBox.No)
+        if reply == QMessageBox.Yes:
+            self.repo.delete_many([obj.id for obj in customers])
+
+    def on_data_changed(self, tables):
+        if "customers" in tables and self.model.is_filtered():
+            self.refresh_table()
 
+    @INSTRUMENTS.timed()
     def refresh_table(self):
-        self.table.setRowCount(0)
-        for cust in sorted(self.customers, key=lambda c: c.name):
-            row = self.table.rowCount()
-            self.table.insertRow(row)
-            self.table.setItem(row,0,QTableWidgetItem(cust.name))
-            self.table.setItem(row,1,QTableWidgetItem(cust.contact_number))
-            self.table.setItem(row,2,QTableWidgetItem(cust.address))
-            self.table.setItem(row,3,QTableWidgetItem(cust.email))
+        self.model.set_matches(self.search_index.search(self.search_bar.text()))
+
+
+# ---------------------------------------------------------------------------
+# Report generation
+# ---------------------------------------------------------------------------
+
+ReportColumn = namedtuple("ReportColumn", "name width align kind")
+
+
+class ReportBuilder:
+    # Produces a report as a stream of items: ("line", text) for titles and
+    # summary lines, ("header", columns), ("row", values) and ("rule", None).
+    # lines() renders them as fixed-width text; exporters write the raw row
+    # values. prepare() runs on the GUI thread and captures whatever lives
+    # in the in-memory indexes; items() only uses that snapshot and its own
+    # read connection, so it can run on a worker. Period and category
+    # reports read the rollup tables, not the ledger rows.
+    REPORT_TYPES = (
+        "Financial Summary", "Monthly P&L", "Weekly P&L", "Yearly Summary", "Daily Running Balance",
+        "Expense by Category", "Inventory Summary", "Stock Value by Supplier", "Customer List"
+    )
+    # Tables each report reads; reports over the ledger also depend on the
+    # date range, the inventory summary on its as-of date
+    SOURCES = {
+        "Inventory Summary": ("inventory",),
+        "Stock Value by Supplier": ("inventory",),
+        "Customer List": ("customers",),
+    }
+
+    def __init__(self, store, report_type, start_date, end_date):
+        self.store = store
+        self.report_type = report_type
+        self.start_date = start_date
+        self.end_date = end_date
+        self.start_day = to_day(start_date)
+        self.end_day = to_day(end_date)
+        self.total_rows = 0  # Detail rows expected, for progress
+        self.rows_done = 0
+
+    @property
+    def title(self):
+        return self.report_type
+
+    def cache_key(self):
+        # Same key, same text: the versions change with every write
+        sources = self.SOURCES.get(self.report_type, ("financial",))
+        if sources == ("financial",):
+            params = (self.start_day, self.end_day)
+        elif self.report_type == "Inventory Summary":
+            params = (self.end_day,)
+        else:
+            params = ()
+        versions = tuple(getattr(self.store, name).version() for name in sources)
+        return repr((self.report_type, params, versions))
+
+    def prepare(self):
+        if self.report_type == "Financial Summary":
+            self.totals = self.store.period_totals.range_totals(self.start_date, self.end_date)
+        elif self.report_type == "Daily Running Balance":
+            self.opening = self.store.engine.opening_balance(self.start_day)
+        elif self.report_type == "Stock Value by Supplier":
+            self.engine = self.store.engine.snapshot()
+
+    def items(self, reader):
+        method = {
+            "Financial Summary": self._financial_summary,
+            "Monthly P&L": self._profit_and_loss,
+            "Weekly P&L": self._profit_and_loss,
+            "Yearly Summary": self._yearly_summary,
+            "Daily Running Balance": self._running_balance,
+            "Expense by Category": self._expense_by_category,
+            "Stock Value by Supplier": self._stock_by_supplier,
+            "Inventory Summary": self._inventory_summary,
+            "Customer List": self._customer_list,
+        }[self.report_type]
+        return method(reader)
+
+    def lines(self, reader):
+        columns = ()
+        for kind, value in self.items(reader):
+            if kind == "header":
+                columns = value
+            yield from render_item(kind, value, columns)
+
+    def _range_title(self, title):
+        return f"--- {title} ({self.start_date.toString('yyyy-MM-dd')} to {self.end_date.toString('yyyy-MM-dd')}) ---"
+
+    @staticmethod
+    def period_label(period, bucket):
+        if period == "year":
+            return str(bucket)
+        if period == "month":
+            return QDate(bucket // 12, bucket % 12 + 1, 1).toString("MMM yyyy")
+        if period == "week":
+            return "Wk " + from_day(bucket).toString("yyyy-MM-dd")
+        return from_day(bucket).toString("yyyy-MM-dd")
+
+    def _financial_summary(self, reader):
+        total_income, total_expense = self.totals
+        net_profit_loss = total_income - total_expense
+        self.total_rows = reader.financial.count_range(self.start_date, self.end_date)
+
+        yield "line", self._range_title("Financial Summary Report")
+        yield "line", f"{'Total Income:':<20} {total_income:,.2f} PKR"
+        yield "line", f"{'Total Expense:':<20} {total_expense:,.2f} PKR"
+        yield "line", f"{'Net Profit/Loss:':<20} {net_profit_loss:,.2f} PKR"
+        yield "line", ""
+        yield "line", "--- Detailed Transactions ---"
+        yield "header", (
+            ReportColumn("Date", 12, "<", "text"),
+            ReportColumn("Type", 8, "<", "text"),
+            ReportColumn("Amount", 15, ">", "money"),
+            ReportColumn("Description", 30, "<", "text"),
+        )
+        for record in reader.financial.iter_range(self.start_date, self.end_date):
+            self.rows_done += 1
+            yield "row", (record.date.toString("yyyy-MM-dd"), record.record_type, record.amount, record.description)
+
+    def _profit_and_loss(self, reader):
+        period = "month" if self.report_type == "Monthly P&L" else "week"
+        rows = reader.rollups.totals_by_period(period, self.start_day, self.end_day)
+        self.total_rows = len(rows)
+
+        yield "line", self._range_title(f"{self.report_type} Report")
+        yield "header", (
+            ReportColumn("Period", 14, "<", "text"),
+            ReportColumn("Income", 18, ">", "money"),
+            ReportColumn("Expense", 18, ">", "money"),
+            ReportColumn("Net", 18, ">", "money"),
+        )
+        for bucket, income, expense in rows:
+            self.rows_done += 1
+            yield "row", (self.period_label(period, bucket), from_paisa(income), from_paisa(expense),
+                          from_paisa(income - expense))
+        total_income = from_paisa(sum(row[1] for row in rows))
+        total_expense = from_paisa(sum(row[2] for row in rows))
+        yield "rule", None
+        yield "row", ("Total", total_income, total_expense, total_income - total_expense)
+
+    def _yearly_summary(self, reader):
+        # One row per year with the change in net against the year before
+        rows = reader.rollups.totals_by_period("year", self.start_day, self.end_day)
+        self.total_rows = len(rows)
+
+        yield "line", self._range_title("Yearly Summary")
+        yield "header", (
+            ReportColumn("Year", 8, "<", "text"),
+            ReportColumn("Income", 18, ">", "money"),
+            ReportColumn("Expense", 18, ">", "money"),
+            ReportColumn("Net", 18, ">", "money"),
+            ReportColumn("Change", 8, ">", "text"),
+        )
+        previous = None
+        for year, income, expense in rows:
+            self.rows_done += 1
+            net = income - expense
+            change = f"{(net - previous) / abs(previous) * 100:+.1f}%" if previous else ""
+            previous = net
+            yield "row", (self.period_label("year", year), from_paisa(income), from_paisa(expense),
+                          from_paisa(net), change)
+        total_income = from_paisa(sum(row[1] for row in rows))
+        total_expense = from_paisa(sum(row[2] for row in rows))
+        yield "rule", None
+        yield "row", ("Total", total_income, total_expense, total_income - total_expense, "")
+
+    def _running_balance(self, reader):
+        opening = self.opening
+        rows = reader.rollups.running_balance("day", self.start_day, self.end_day, opening)
+        self.total_rows = len(rows)
+
+        yield "line", self._range_title("Daily Running Balance")
+        yield "line", f"{'Opening Balance:':<20} {from_paisa(opening):,.2f} PKR"
+        yield "line", ""
+        yield "header", (
+            ReportColumn("Date", 12, "<", "text"),
+            ReportColumn("Income", 18, ">", "money"),
+            ReportColumn("Expense", 18, ">", "money"),
+            ReportColumn("Balance", 18, ">", "money"),
+        )
+        for bucket, income, expense, balance in rows:
+            self.rows_done += 1
+            yield "row", (self.period_label("day", bucket), from_paisa(income), from_paisa(expense),
+                          from_paisa(balance))
+
+    def _expense_by_category(self, reader):
+        rows = reader.rollups.category_totals("Expense", self.start_day, self.end_day)
+        total_expense = sum(total for _, total in rows)
+        self.total_rows = len(rows)
+
+        yield "line", self._range_title("Expense by Category")
+        yield "line", f"{'Total Expense:':<20} {from_paisa(total_expense):,.2f} PKR"
+        yield "line", ""
+        yield "header", (
+            ReportColumn("Category", 35, "<", "text"),
+            ReportColumn("Amount", 18, ">", "money"),
+            ReportColumn("Share", 8, ">", "percent"),
+        )
+        for category, total in rows:
+            self.rows_done += 1
+            share = total / total_expense * 100 if total_expense else 0
+            yield "row", (category, from_paisa(total), share)
+
+    def _stock_by_supplier(self, reader):
+        rows = self.engine.inventory_by_supplier()
+        self.total_rows = len(rows)
+
+        yield "line", "--- Stock Value by Supplier ---"
+        yield "header", (
+            ReportColumn("Supplier", 30, "<", "text"),
+            ReportColumn("Qty", 10, ">", "int"),
+            ReportColumn("Stock Value", 20, ">", "money"),
+        )
+        for supplier, quantity, value in rows:
+            self.rows_done += 1
+            yield "row", (supplier or "N/A", quantity, from_paisa(value))
+
+    def _inventory_summary(self, reader):
+        # Stock held at the end of the end date, from the stock ledger
+        positions = reader.stock.positions(self.end_day)
+        self.total_rows = len(positions)
+        total_quantity = sum(p.on_hand for p in positions)
+        total_value = from_paisa(sum(p.average_value for p in positions))
+        total_fifo = from_paisa(sum(p.fifo_value for p in positions))
+
+        yield "line", f"--- Inventory Summary Report (as of {self.end_date.toString('yyyy-MM-dd')}) ---"
+        yield "line", f"{'Total Unique Items:':<20} {len(positions)}"
+        yield "line", f"{'Total Quantity on Hand:':<20} {total_quantity}"
+        yield "line", f"{'Value at Average Cost:':<20} {total_value:,.2f} PKR"
+        yield "line", f"{'Value at FIFO Cost:':<20} {total_fifo:,.2f} PKR"
+        yield "line", ""
+        yield "line", "--- Detailed Inventory ---"
+        yield "header", (
+            ReportColumn("Product Name", 25, "<", "text"),
+            ReportColumn("Qty", 8, ">", "int"),
+            ReportColumn("Avg Cost", 12, ">", "money"),
+            ReportColumn("Value", 15, ">", "money"),
+            ReportColumn("FIFO Value", 15, ">", "money"),
+            ReportColumn("Supplier", 20, "<", "text"),
+        )
+        for p in positions:
+            self.rows_done += 1
+            average = p.average_value / p.on_hand if p.on_hand else 0
+            yield "row", (p.name, p.on_hand, from_paisa(round(average)), from_paisa(p.average_value),
+                          from_paisa(p.fifo_value), p.supplier)
+
+    def _customer_list(self, reader):
+        self.total_rows = reader.customers.count()
+
+        yield "line", "--- Customer List Report ---"
+        yield "line", f"{'Total Customers:':<20} {self.total_rows}"
+        yield "line", ""
+        yield "line", "--- Detailed Customer Information ---"
+        yield "header", (
+            ReportColumn("Name", 25, "<", "text"),
+            ReportColumn("Contact", 15, "<", "text"),
+            ReportColumn("Email", 30, "<", "text"),
+        )
+        for cust in reader.customers.iter_all():
+            self.rows_done += 1
+            yield "row", (cust.name, cust.contact_number, cust.email if cust.email else "N/A")
+
+
+def format_cell(value, kind):
+    if kind == "money":
+        return f"{value:,.2f}"
+    if kind == "percent":
+        return f"{value:.1f}%"
+    return str(value)
+
+
+def render_item(kind, value, columns):
+    # Fixed-width text lines for one report item; columns are those of the
+    # most recent header
+    if kind == "line":
+        return [value]
+    if kind == "header":
+        return [" ".join(f"{col.name:{col.align}{col.width}}" for col in columns), "-" * 70]
+    if kind == "rule":
+        return ["-" * 70]
+    return [" ".join(f"{format_cell(cell, col.kind):{col.align}{col.width}}" for cell, col in zip(value, columns))]
+
+
+class ReportCache:
+    # Rendered report text keyed by report type, parameters and the data
+    # versions of the tables the report reads, so a repeat report is shown
+    # without running it and any write to those tables retires its entries.
+    # Entries are zlib-compressed; the least recently used go first once
+    # they add up to MAX_BYTES. With a path the cache is saved on close and
+    # read back on first use in the next session.
+    MAX_BYTES = 64 * 1024 * 1024
+    MAX_ENTRY_BYTES = 16 * 1024 * 1024  # Text this long is not kept
+    SCHEMA = "CREATE TABLE IF NOT EXISTS report_cache (key TEXT PRIMARY KEY, data BLOB NOT NULL, used INTEGER NOT NULL)"
+
+    def __init__(self, path=None):
+        self.path = path
+        self._entries = OrderedDict()  # key -> compressed text, oldest use first
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._loaded = path is None
+        self._dirty = False
+
+    def __len__(self):
+        self._load()
+        return len(self._entries)
+
+    def get(self, key):
+        # The report text, or None
+        self._load()
+        data = self._entries.get(key)
+        if data is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        self._dirty = True
+        return zlib.decompress(data).decode("utf-8")
+
+    def put(self, key, text):
+        self._load()
+        if len(text) > self.MAX_ENTRY_BYTES:
+            return
+        self._add(key, zlib.compress(text.encode("utf-8"), 1))
+        self._dirty = True
+
+    def _add(self, key, data):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.size -= len(old)
+        self._entries[key] = data
+        self.size += len(data)
+        while self.size > self.MAX_BYTES:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+        self._dirty = True
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self), "bytes": self.size, "hits": self.hits, "misses": self.misses,
+            "evictions": self.evictions, "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not os.path.exists(self.path):
+            return
+        try:
+            conn = sqlite3.connect(self.path)
+            try:
+                rows = conn.execute("SELECT key, data FROM report_cache ORDER BY used").fetchall()
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            return  # An unreadable cache is just an empty one
+        for key, data in rows:
+            self._add(key, data)
+
+    def save(self):
+        if self.path is None or not self._dirty:
+            return
+        try:
+            conn = sqlite3.connect(self.path)
+            try:
+                with conn:
+                    conn.execute(self.SCHEMA)
+                    conn.execute("DELETE FROM report_cache")
+                    conn.executemany("INSERT INTO report_cache (key, data, used) VALUES (?, ?, ?)",
+                                     ((key, data, used) for used, (key, data) in enumerate(self._entries.items())))
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            return  # Losing the cache only costs the next reports their speed
+        self._dirty = False
+
+
+class TableExport:
+    # Raw dump of one management table, shaped like a ReportBuilder so the
+    # same exporters and worker job can write it
+    TABLES = {
+        "financial": ("Financial Transactions", (
+            ReportColumn("Date", 12, "<", "text"),
+            ReportColumn("Description", 30, "<", "text"),
+            ReportColumn("Amount (PKR)", 15, ">", "money"),
+            ReportColumn("Type", 8, "<", "text"),
+        )),
+        "inventory": ("Inventory", (
+            ReportColumn("Product Name", 25, "<", "text"),
+            ReportColumn("Quantity", 8, ">", "int"),
+            ReportColumn("Unit Price (PKR)", 15, ">", "money"),
+            ReportColumn("Supplier", 20, "<", "text"),
+            ReportColumn("Last Updated", 12, "<", "text"),
+        )),
+        "customers": ("Customers", (
+            ReportColumn("Customer Name", 25, "<", "text"),
+            ReportColumn("Contact Number", 15, "<", "text"),
+            ReportColumn("Address", 30, "<", "text"),
+            ReportColumn("Email", 30, "<", "text"),
+        )),
+    }
+
+    def __init__(self, table):
+        self.table = table
+        self.title, self.columns = self.TABLES[table]
+        self.total_rows = 0
+        self.rows_done = 0
+
+    def prepare(self):
+        pass
+
+    def items(self, reader):
+        repo = getattr(reader, self.table)
+        self.total_rows = repo.count()
+        yield "header", self.columns
+        for obj in repo.iter_all():
+            self.rows_done += 1
+            if self.table == "financial":
+                yield "row", (obj.date.toString("yyyy-MM-dd"), obj.description, obj.amount, obj.record_type)
+            elif self.table == "inventory":
+                yield "row", (obj.name, obj.quantity, obj.unit_price, obj.supplier,
+                              obj.last_updated.toString("yyyy-MM-dd"))
+            else:
+                yield "row", (obj.name, obj.contact_number, obj.address, obj.email)
+
+
+class ReportSignals(QObject):
+    # Parented to the widget that started the job, so its lifetime does not
+    # depend on the auto-deleted runnable; released once the job reports back
+    chunk = pyqtSignal(str)
+    progress = pyqtSignal(int)
+    finished = pyqtSignal(bool)  # False when cancelled
+    failed = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.finished.connect(self.deleteLater)
+        self.failed.connect(self.deleteLater)
+
+
+class ReportJob(QRunnable):
+    # Runs a ReportBuilder on the thread pool and streams its text back in
+    # chunks so the GUI thread only ever appends a few hundred lines at once.
+    CHUNK_LINES = 500
+
+    def __init__(self, builder, db_path, parent=None):
+        super().__init__()
+        self.builder = builder
+        self.db_path = db_path
+        self.signals = ReportSignals(parent)
+        self.cancelled = False
+        self.cache_key = None  # Set when the finished text may be cached
+
+    def cancel(self):
+        self.cancelled = True
+
+    @INSTRUMENTS.timed()
+    def run(self):
+        reader = StoreReader(self.db_path)
+        try:
+            chunk = io.StringIO()
+            pending = 0
+            for line in self.builder.lines(reader):
+                if self.cancelled:
+                    self.signals.finished.emit(False)
+                    return
+                chunk.write(line)
+                chunk.write("\n")
+                pending += 1
+                if pending >= self.CHUNK_LINES:
+                    self._flush(chunk)
+                    chunk = io.StringIO()
+                    pending = 0
+            if pending:
+                self._flush(chunk)
+            self.signals.progress.emit(100)
+            self.signals.finished.emit(True)
+        except Exception as exc:
+            self.signals.failed.emit(str(exc))
+        finally:
+            reader.close()
+
+    def _flush(self, chunk):
+        self.signals.chunk.emit(chunk.getvalue())
+        total = self.builder.total_rows
+        if total:
+            self.signals.progress.emit(min(99, self.builder.rows_done * 100 // total))
+
+
+# ---------------------------------------------------------------------------
+# Export
+# ---------------------------------------------------------------------------
+
+class CsvExporter:
+    def __init__(self, path, title):
+        self.file = open(path, "w", newline="", encoding="utf-8-sig")
+        self.writer = csv.writer(self.file)
+        self.columns = ()
+
+    def write(self, kind, value):
+        if kind == "line":
+            if value:
+                self.writer.writerow([value])
+        elif kind == "header":
+            self.columns = value
+            self.writer.writerow([col.name for col in value])
+        elif kind == "row":
+            self.writer.writerow([
+                f"{cell:.2f}" if col.kind in ("money", "percent") else cell
+                for cell, col in zip(value, self.columns)
+            ])
+
+    def close(self):
+        self.file.close()
+
+    abort = close
+
+
+class XlsxExporter:
+    # openpyxl write-only mode streams rows to disk, so memory stays constant
+    def __init__(self, path, title):
+        self.path = path
+        self.workbook = require_openpyxl().Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet(title[:31].replace("/", "-"))
+
+    def write(self, kind, value):
+        if kind == "line":
+            if value:
+                self.sheet.append([value])
+        elif kind == "header":
+            self.sheet.append([col.name for col in value])
+        elif kind == "row":
+            self.sheet.append(list(value))
+
+    def close(self):
+        self.workbook.save(self.path)
+
+    def abort(self):
+        self.workbook.close()
+
+
+class PdfExporter:
+    # Fixed-width text pages, landscape A4, drawn one line at a time
+    MARGIN = 40
+
+    def __init__(self, path, title):
+        self.writer = QPdfWriter(path)
+        self.writer.setTitle(title)
+        self.writer.setPageSize(QPageSize(QPageSize.A4))
+        self.writer.setPageOrientation(QPageLayout.Landscape)
+        self.writer.setResolution(96)
+        self.painter = QPainter(self.writer)
+        self.painter.setFont(QFont("Courier New", 8))
+        metrics = QFontMetrics(self.painter.font(), self.writer)
+        self.line_height = metrics.lineSpacing()
+        self.ascent = metrics.ascent()
+        self.page_bottom = self.writer.height() - self.MARGIN
+        self.y = self.MARGIN
+        self.columns = ()
+
+    def write(self, kind, value):
+        if kind == "header":
+            self.columns = value
+        for line in render_item(kind, value, self.columns):
+            if self.y + self.line_height > self.page_bottom:
+                self.writer.newPage()
+                self.y = self.MARGIN
+            self.painter.drawText(self.MARGIN, self.y + self.ascent, line)
+            self.y += self.line_height
+
+    def close(self):
+        self.painter.end()
+
+    abort = close
+
+
+EXPORTERS = {".csv": CsvExporter, ".xlsx": XlsxExporter, ".pdf": PdfExporter}
+
+
+class ExportJob(QRunnable):
+    # Writes a ReportBuilder/TableExport item stream straight to disk on the
+    # thread pool. Output goes to a .part file that is renamed on success.
+    PROGRESS_EVERY = 1000
+
+    def __init__(self, source, path, db_path, parent=None):
+        super().__init__()
+        self.source = source
+        self.path = path
+        self.db_path = db_path
+        self.signals = ReportSignals(parent)
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    @INSTRUMENTS.timed()
+    def run(self):
+        partial = self.path + ".part"
+        reader = StoreReader(self.db_path)
+        exporter = None
+        try:
+            exporter = EXPORTERS[os.path.splitext(self.path)[1].lower()](partial, self.source.title)
+            for count, (kind, value) in enumerate(self.source.items(reader)):
+                if self.cancelled:
+                    self.signals.finished.emit(False)
+                    return
+                exporter.write(kind, value)
+                if count % self.PROGRESS_EVERY == 0 and self.source.total_rows:
+                    self.signals.progress.emit(min(99, self.source.rows_done * 100 // self.source.total_rows))
+            exporter.close()
+            exporter = None
+            os.replace(partial, self.path)
+            self.signals.progress.emit(100)
+            self.signals.finished.emit(True)
+        except Exception as exc:
+            self.signals.failed.emit(str(exc))
+        finally:
+            reader.close()
+            if exporter is not None:
+                exporter.abort()
+            if os.path.exists(partial):
+                os.remove(partial)
+
+
+def start_export(widget, source, db_path):
+    # Ask for a destination and run the export in the background with a
+    # non-modal progress dialog; the rest of the window stays usable.
+    path, selected = QFileDialog.getSaveFileName(
+        widget, f"Export {source.title}", source.title.replace(" ", "_"),
+        "CSV (*.csv);;Excel Workbook (*.xlsx);;PDF (*.pdf)"
+    )
+    if not path:
+        return None
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in EXPORTERS:
+        ext = "." + selected.split("*.")[1].rstrip(")")
+        path += ext
+    if ext == ".xlsx" and require_openpyxl() is None:
+        QMessageBox.warning(widget, "Export", "Writing .xlsx files needs the openpyxl package.")
+        return None
+
+    source.prepare()
+    job = ExportJob(source, path, db_path, widget)
+    progress_dialog = QProgressDialog(f"Exporting {source.title}...", "Cancel", 0, 100, widget)
+    progress_dialog.setWindowModality(Qt.NonModal)
+    progress_dialog.setMinimumDuration(300)
+    progress_dialog.setAutoClose(False)
+    progress_dialog.canceled.connect(job.cancel)
+    job.signals.progress.connect(progress_dialog.setValue)
+
+    def finished(completed):
+        progress_dialog.close()
+        if completed:
+            QMessageBox.information(widget, "Export Complete", f"Saved to {path}")
+
+    def failed(message):
+        progress_dialog.close()
+        QMessageBox.warning(widget, "Export Failed", f"Could not export:\n{message}")
+
+    job.signals.finished.connect(finished)
+    job.signals.failed.connect(failed)
+    # Keep the job and its dialog alive until it reports back
+    widget._export_job = job
+    QThreadPool.globalInstance().start(job)
+    return job
+
+
+class ReportBuffer:
+    # Report lines spooled to a temporary file with an offset index, so a
+    # million-line report costs 8 bytes per line in memory. Lines are read
+    # back in blocks with a small LRU cache as the view scrolls.
+    BLOCK_LINES = 256
+    CACHED_BLOCKS = 8
+
+    def __init__(self):
+        self.file = tempfile.TemporaryFile()
+        self.offsets = array("q", [0])  # offsets[i] is where line i starts
+        self._blocks = OrderedDict()
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def append(self, text):
+        # text is one or more complete lines, each ending in a newline
+        data = text.encode("utf-8")
+        self.file.seek(0, io.SEEK_END)
+        self.file.write(data)
+        base = self.offsets[-1]
+        start = 0
+        while True:
+            end = data.find(b"\n", start)
+            if end < 0:
+                break
+            self.offsets.append(base + end + 1)
+            start = end + 1
+        # The last cached block may have been partial
+        self._blocks.pop((len(self) - 1) // self.BLOCK_LINES, None)
+        self._blocks.pop(len(self) // self.BLOCK_LINES, None)
+
+    def line(self, index):
+        block = index // self.BLOCK_LINES
+        lines = self._blocks.get(block)
+        if lines is None:
+            first = block * self.BLOCK_LINES
+            last = min(first + self.BLOCK_LINES, len(self))
+            self.file.seek(self.offsets[first])
+            data = self.file.read(self.offsets[last] - self.offsets[first])
+            lines = data.decode("utf-8").split("\n")[:-1]
+            self._blocks[block] = lines
+            if len(self._blocks) > self.CACHED_BLOCKS:
+                self._blocks.popitem(last=False)
+        else:
+            self._blocks.move_to_end(block)
+        return lines[index - block * self.BLOCK_LINES]
+
+    def iter_lines(self):
+        self.file.seek(0)
+        for raw in self.file:
+            yield raw.decode("utf-8").rstrip("\n")
+
+    def size(self):
+        return self.offsets[-1]
+
+    def text(self):
+        self.file.seek(0)
+        return self.file.read().decode("utf-8")
+
+    def close(self):
+        self.file.close()
+
+
+class ReportLinesModel(QAbstractListModel):
+    # Exposes the spooled lines to the view a page at a time: the first
+    # screen appears as soon as the first chunk lands, the rest on scroll.
+    PAGE_LINES = 1000
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.buffer = ReportBuffer()
+        self._shown = 0
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._shown
+
+    def data(self, index, role=Qt.DisplayRole):
+        if index.isValid() and role == Qt.DisplayRole:
+            return self.buffer.line(index.row())
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._shown < len(self.buffer)
+
+    def fetchMore(self, parent=QModelIndex()):
+        count = min(self.PAGE_LINES, len(self.buffer) - self._shown)
+        if parent.isValid() or count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._shown, self._shown + count - 1)
+        self._shown += count
+        self.endInsertRows()
+
+    def append_text(self, text):
+        self.buffer.append(text)
+        if self._shown < self.PAGE_LINES:
+            self.fetchMore()
+
+    def clear(self):
+        self.beginResetModel()
+        self.buffer.close()
+        self.buffer = ReportBuffer()
+        self._shown = 0
+        self.endResetModel()
+
+    def iter_lines(self):
+        return self.buffer.iter_lines()
+
+
+class ReportView(QListView):
+    # Read-only, virtualized report display: only the visible lines are
+    # ever laid out
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setModel(ReportLinesModel(self))
+        self.setUniformItemSizes(True)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)
+
+    def keyPressEvent(self, event):
+        if event.matches(QKeySequence.Copy):
+            rows = sorted(index.row() for index in self.selectedIndexes())
+            QApplication.clipboard().setText("\n".join(self.model().buffer.line(row) for row in rows))
+            return
+        super().keyPressEvent(event)
 
 
 class ReportsWidget(QWidget):
@@ -866,7 +5720,7 @@ class ReportsWidget(QWidget):
 
         title = QLabel("Reports Generation")
         title.setFont(QFont("Segoe UI", 20, QFont.Bold))
-        title.setStyleSheet("color: #00468C;")
+        title.setProperty("role", "reportTitle")
         title.setAlignment(Qt.AlignCenter)
         layout.addWidget(title)
 
@@ -874,7 +5728,7 @@ class ReportsWidget(QWidget):
         options_layout = QFormLayout()
 
         self.report_type_combo = QComboBox()
-        self.report_type_combo.addItems(["Financial Summary", "Inventory Summary", "Customer List"])
+        self.report_type_combo.addItems(ReportBuilder.REPORT_TYPES)
         options_layout.addRow("Select Report Type:", self.report_type_combo)
 
         self.start_date_edit = QDateEdit()
@@ -885,92 +5739,319 @@ class ReportsWidget(QWidget):
         self.end_date_edit = QDateEdit()
         self.end_date_edit.setCalendarPopup(True)
         self.end_date_edit.setDate(QDate.currentDate())
-        options_layout.addRow("End Date (Financial Only):", self.end_date_edit)
+        options_layout.addRow("End Date (Financial / Stock As Of):", self.end_date_edit)
 
         layout.addLayout(options_layout)
 
         self.generate_report_btn = QPushButton("Generate Report")
         self.generate_report_btn.setFixedHeight(40)
-        self.generate_report_btn.setStyleSheet("""
-            QPushButton {
-                background-color: #1E90FF;
-                color: white;
-                border-radius: 5px;
-                font-size: 14pt;
-            }
-            QPushButton:hover {
-                background-color: #0c69e5;
-            }
-        """)
+        self.generate_report_btn.setProperty("role", "primary")
         self.generate_report_btn.clicked.connect(self.generate_report)
-        layout.addWidget(self.generate_report_btn)
+
+        # Reports build on a worker thread; progress and cancel while running
+        self.thread_pool = QThreadPool.globalInstance()
+        self._job = None
+        self.cancel_report_btn = QPushButton("Cancel")
+        self.cancel_report_btn.setFixedHeight(40)
+        self.cancel_report_btn.setEnabled(False)
+        self.cancel_report_btn.clicked.connect(self.cancel_report)
+        self.export_report_btn = QPushButton("Export...")
+        self.export_report_btn.setFixedHeight(40)
+        self.export_report_btn.clicked.connect(self.export_report)
+        report_btn_layout = QHBoxLayout()
+        report_btn_layout.addWidget(self.generate_report_btn)
+        report_btn_layout.addWidget(self.cancel_report_btn)
+        report_btn_layout.addWidget(self.export_report_btn)
+        layout.addLayout(report_btn_layout)
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.hide()
+        layout.addWidget(self.progress_bar)
+
+        # A shown report is a snapshot; say so when the data moves on
+        self.stale_label = QLabel("The data has changed since this report was generated.")
+        self.stale_label.setProperty("role", "warning")
+        self.stale_label.hide()
+        layout.addWidget(self.stale_label)
+        if parent is not None:
+            events = parent.store.events
+            events.changed.connect(self.on_data_changed)
+            events.dataReset.connect(self.on_data_changed)
 
         # Report Display Area
-        self.report_text_area = QTextEdit()
-        self.report_text_area.setReadOnly(True)
+        self.report_text_area = ReportView()
         self.report_text_area.setFont(QFont("Courier New", 10))
-        self.report_text_area.setStyleSheet("background-color: #f0f0f0; border: 1px solid #ccc;")
+        self.report_text_area.setProperty("role", "report")
         layout.addWidget(self.report_text_area)
 
         layout.addStretch()
         self.setLayout(layout)
 
+    @INSTRUMENTS.timed()
     def generate_report(self):
-        report_type = self.report_type_combo.currentText()
-        report_output = ""
-
-        if report_type == "Financial Summary":
-            start_date = self.start_date_edit.date()
-            end_date = self.end_date_edit.date()
-            financial_records = self.parent_main.financial.records
-
-            filtered_records = [r for r in financial_records if start_date <= r.date <= end_date]
-            total_income = sum(r.amount for r in filtered_records if r.record_type == "Income")
-            total_expense = sum(r.amount for r in filtered_records if r.record_type == "Expense")
-            net_profit_loss = total_income - total_expense
-
-            report_output += f"--- Financial Summary Report ({start_date.toString('yyyy-MM-dd')} to {end_date.toString('yyyy-MM-dd')}) ---\n"
-            report_output += f"{'Total Income:':<20} {total_income:,.2f} PKR\n"
-            report_output += f"{'Total Expense:':<20} {total_expense:,.2f} PKR\n"
-            report_output += f"{'Net Profit/Loss:':<20} {net_profit_loss:,.2f} PKR\n"
-            report_output += "\n--- Detailed Transactions ---\n"
-            report_output += f"{'Date':<12} {'Type':<8} {'Amount':>15} {'Description':<30}\n"
-            report_output += "-" * 70 + "\n"
-            for record in sorted(filtered_records, key=lambda r: r.date.toPyDate()):
-                report_output += f"{record.date.toString('yyyy-MM-dd'):<12} {record.record_type:<8} {record.amount:>15,.2f} {record.description:<30}\n"
-
-        elif report_type == "Inventory Summary":
-            inventory_items = self.parent_main.inventory.items
-            total_inventory_value = sum(item.quantity * item.unit_price for item in inventory_items)
-            total_items = sum(item.quantity for item in inventory_items)
-
-            report_output += "--- Inventory Summary Report ---\n"
-            report_output += f"{'Total Unique Items:':<20} {len(inventory_items)}\n"
-            report_output += f"{'Total Quantity on Hand:':<20} {total_items}\n"
-            report_output += f"{'Total Inventory Value:':<20} {total_inventory_value:,.2f} PKR\n"
-            report_output += "\n--- Detailed Inventory ---\n"
-            report_output += f"{'Product Name':<25} {'Qty':>8} {'Unit Price':>15} {'Supplier':<20}\n"
-            report_output += "-" * 70 + "\n"
-            for item in sorted(inventory_items, key=lambda i: i.name):
-                report_output += f"{item.name:<25} {item.quantity:>8} {item.unit_price:>15,.2f} {item.supplier:<20}\n"
-
-        elif report_type == "Customer List":
-            customers = self.parent_main.customer.customers
-            report_output += "--- Customer List Report ---\n"
-            report_output += f"{'Total Customers:':<20} {len(customers)}\n"
-            report_output += "\n--- Detailed Customer Information ---\n"
-            report_output += f"{'Name':<25} {'Contact':<15} {'Email':<30}\n"
-            report_output += "-" * 70 + "\n"
-            for cust in sorted(customers, key=lambda c: c.name):
-                report_output += f"{cust.name:<25} {cust.contact_number:<15} {cust.email if cust.email else 'N/A':<30}\n"
-
-        self.report_text_area.setPlainText(report_output)
+        if self._job is not None:
+            self._job.cancel()
+        store = self.parent_main.store
+        builder = ReportBuilder(store, self.report_type_combo.currentText(),
+                                self.start_date_edit.date(), self.end_date_edit.date())
+        key = builder.cache_key()
+        text = store.report_cache.get(key)
+        if text is not None:
+            self._job = None
+            self.cancel_report_btn.setEnabled(False)
+            self.progress_bar.hide()
+            self.report_text_area.model().clear()
+            self.stale_label.hide()
+            self._append_text(text)
+            return
+        builder.prepare()
+
+        job = ReportJob(builder, store.path, self)
+        job.cache_key = key
+        job.signals.chunk.connect(lambda text: self._append_chunk(job, text))
+        job.signals.progress.connect(lambda value: self._job_progress(job, value))
+        job.signals.finished.connect(lambda completed: self._job_finished(job, completed))
+        job.signals.failed.connect(lambda message: self._job_failed(job, message))
+        self._job = job
+
+        self.report_text_area.model().clear()
+        self.stale_label.hide()
+        self.progress_bar.setValue(0)
+        self.progress_bar.show()
+        self.cancel_report_btn.setEnabled(True)
+        self.thread_pool.start(job)
+
+    def export_report(self):
+        builder = ReportBuilder(self.parent_main.store, self.report_type_combo.currentText(),
+                                self.start_date_edit.date(), self.end_date_edit.date())
+        start_export(self, builder, self.parent_main.store.path)
+
+    def cancel_report(self):
+        if self._job is not None:
+            self._job.cancel()
+            self._job_finished(self._job, False)
+
+    def _append_chunk(self, job, text):
+        if job is self._job:
+            self._append_text(text)
+
+    def _job_progress(self, job, value):
+        if job is self._job:
+            self.progress_bar.setValue(value)
+
+    def on_data_changed(self, tables=None):
+        if self._job is not None or self.report_text_area.model().rowCount():
+            self.stale_label.show()
+
+    def _job_finished(self, job, completed):
+        if job is not self._job:
+            return
+        self._job = None
+        self.cancel_report_btn.setEnabled(False)
+        self.progress_bar.hide()
+        if not completed:
+            self._append_text("\n--- Report cancelled ---\n")
+        elif job.cache_key is not None and job.cache_key == job.builder.cache_key():
+            # Only when nothing the report read changed while it ran
+            buffer = self.report_text_area.model().buffer
+            if buffer.size() <= ReportCache.MAX_ENTRY_BYTES:
+                self.parent_main.store.report_cache.put(job.cache_key, buffer.text())
+
+    def _append_text(self, text):
+        self.report_text_area.model().append_text(text)
+
+    def _job_failed(self, job, message):
+        if job is not self._job:
+            return
+        job.cache_key = None
+        self._job_finished(job, True)
+        QMessageBox.warning(self, "Report Error", f"Could not generate the report:\n{message}")
+
+
+class LatencyHistogram(QWidget):
+    # Log-scale histogram of one metric's recent durations, with the
+    # p50/p95/p99 marks drawn over it
+    BUCKETS = 24  # Powers of two from 10 microseconds
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setMinimumHeight(180)
+        self.samples = []
+
+    def set_samples(self, samples):
+        self.samples = sorted(samples)
+        self.update()
+
+    def _bucket(self, seconds):
+        micros = seconds * 1e6
+        if micros < 10:
+            return 0
+        return min(self.BUCKETS - 1, int(micros / 10).bit_length())
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        rect = self.rect().adjusted(10, 10, -10, -30)
+        painter.fillRect(self.rect(), QColor("#fafafa"))
+        if not self.samples:
+            painter.drawText(self.rect(), Qt.AlignCenter, "No samples yet")
+            return
+        counts = [0] * self.BUCKETS
+        for value in self.samples:
+            counts[self._bucket(value)] += 1
+        peak = max(counts)
+        width = rect.width() / self.BUCKETS
+        painter.setBrush(QColor("#1E90FF"))
+        painter.setPen(Qt.NoPen)
+        for i, count in enumerate(counts):
+            height = int(rect.height() * count / peak)
+            painter.drawRect(int(rect.left() + i * width) + 1, rect.bottom() - height, int(width) - 2, height)
+        painter.setPen(QColor("#555555"))
+        for i in range(0, self.BUCKETS, 4):
+            # Bucket i starts at 10 * 2**(i - 1) microseconds
+            micros = 10 * (1 << (i - 1)) if i else 0
+            label = f"{micros / 1000:g}ms" if micros >= 1000 else f"{micros}us"
+            painter.drawText(int(rect.left() + i * width), rect.bottom() + 18, label)
+        for i, (pct, color) in enumerate(((50, "#2ecc71"), (95, "#e67e22"), (99, "#e74c3c"))):
+            x = int(rect.left() + (self._bucket(percentile(self.samples, pct)) + 0.5) * width)
+            painter.setPen(QColor(color))
+            painter.drawLine(x, rect.top(), x, rect.bottom())
+            painter.drawText(x + 3, rect.top() + 12 + i * 14, f"p{pct}")
+
+
+class DiagnosticsWidget(QWidget):
+    # Hidden page (Ctrl+Shift+D while instrumentation is on) showing the
+    # timed metrics, a histogram of the selected one, the startup
+    # milestones, and a cProfile capture toggle
+    REFRESH_MS = 1000
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.parent_main = parent
+        layout = QVBoxLayout()
+        title = QLabel("Diagnostics")
+        title.setFont(QFont("Segoe UI", 16, QFont.Bold))
+        title.setProperty("role", "pageTitle")
+        layout.addWidget(title)
+
+        self.startup_label = QLabel()
+        layout.addWidget(self.startup_label)
+        self.cache_label = QLabel()
+        layout.addWidget(self.cache_label)
+
+        self.table = QTableWidget(0, 7)
+        self.table.setHorizontalHeaderLabels(
+            ["Metric", "Calls", "Total (ms)", "p50 (ms)", "p95 (ms)", "p99 (ms)", "Max (ms)"]
+        )
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table.itemSelectionChanged.connect(self.show_histogram)
+        layout.addWidget(self.table)
+
+        self.histogram = LatencyHistogram()
+        layout.addWidget(self.histogram)
+
+        btn_layout = QHBoxLayout()
+        self.refresh_btn = QPushButton("Refresh")
+        self.refresh_btn.clicked.connect(self.refresh)
+        btn_layout.addWidget(self.refresh_btn)
+        self.reset_btn = QPushButton("Reset")
+        self.reset_btn.clicked.connect(self.reset)
+        btn_layout.addWidget(self.reset_btn)
+        self.profile_btn = QPushButton("Start cProfile")
+        self.profile_btn.clicked.connect(self.toggle_profile)
+        btn_layout.addWidget(self.profile_btn)
+        btn_layout.addStretch()
+        layout.addLayout(btn_layout)
+        self.setLayout(layout)
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(self.REFRESH_MS)
+        self._timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+        self._timer.start()
+
+    def hideEvent(self, event):
+        self._timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        self.startup_label.setText("Startup: " + ", ".join(
+            f"{name} {ms:.0f} ms" for name, ms in STARTUP.report()
+        ))
+        store = getattr(self.parent_main, "store", None)
+        if store is not None:
+            stats = store.report_cache.stats()
+            self.cache_label.setText(
+                f"Report cache: {stats['entries']} reports, {stats['bytes'] / 1024:,.0f} KB, "
+                f"{stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%}), "
+                f"{stats['evictions']} evicted"
+            )
+        selected = self._selected_metric()
+        rows = INSTRUMENTS.stats()
+        self.table.setRowCount(len(rows))
+        for row, (name, count, total, p50, p95, p99, longest) in enumerate(rows):
+            values = [name, f"{count:,}"] + [f"{value * 1000:,.2f}" for value in (total, p50, p95, p99, longest)]
+            for column, text in enumerate(values):
+                item = QTableWidgetItem(text)
+                if column:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, column, item)
+            if name == selected:
+                self.table.selectRow(row)
+        self.show_histogram()
+
+    def _selected_metric(self):
+        rows = self.table.selectionModel().selectedRows()
+        return self.table.item(rows[0].row(), 0).text() if rows else None
+
+    def show_histogram(self):
+        name = self._selected_metric()
+        self.histogram.set_samples(INSTRUMENTS.samples(name) if name else [])
+
+    def reset(self):
+        INSTRUMENTS.reset()
+        self.refresh()
+
+    def toggle_profile(self):
+        if INSTRUMENTS.profiler is None:
+            INSTRUMENTS.start_profile()
+            self.profile_btn.setText("Stop && Save cProfile")
+            return
+        default = datetime.datetime.now().strftime("profile-%Y%m%d-%H%M%S.pstats")
+        path, _ = QFileDialog.getSaveFileName(self, "Save Profile", default, "Profile data (*.pstats)")
+        if not path:
+            return  # Keep profiling until a destination is chosen
+        INSTRUMENTS.stop_profile(path)
+        self.profile_btn.setText("Start cProfile")
+        QMessageBox.information(self, "Profile Saved", f"Saved to {path}")
+
 
 class MainWindow(QMainWindow):
+    # Content pages in sidebar order. Each is built on its first visit, and
+    # the data store is only opened once the user has logged in, so the
+    # login screen comes up without touching the database.
+    PAGES = ("dashboard", "financial", "inventory", "customer", "reports", "diagnostics")
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Luqman Steel Trader Management System")
         self.setGeometry(100, 100, 1100, 700)
+        # Application-wide theme, in place before any page is polished
+        THEME.apply(THEME.name or "light")
+
+        # Persistent data store shared by all pages (opened after login); in
+        # client mode a replica kept in step with the server by self.link
+        self.store = None
+        self.link = None
+        self.main_widget = None
+        for name in self.PAGES:
+            setattr(self, name, None)
 
         # Central widget - stacked widget to switch pages
         self.stacked_widget = QStackedWidget()
@@ -979,19 +6060,82 @@ class MainWindow(QMainWindow):
         # Pages
         # In MainWindow
         self.login_page = LoginWindow(parent_stack=self.stacked_widget)
-
-        # Pass self (MainWindow) to widgets that need to access other widgets' data
-        self.dashboard = DashboardWidget(self)
-        self.financial = FinancialWidget(self)
-        self.inventory = InventoryWidget(self)
-        self.customer = CustomerWidget(self)
-        self.reports = ReportsWidget(self) # Pass self to ReportsWidget too
+        self.login_page.loggedIn.connect(self.on_login)
 
         self.stacked_widget.addWidget(self.login_page)
-        self.stacked_widget.addWidget(self.create_main_widget())
-
         self.stacked_widget.setCurrentIndex(0)  # start with login
 
+        if INSTRUMENTS.enabled:
+            INSTRUMENTS.start_event_loop_monitor(self)
+            shortcut = QShortcut(QKeySequence("Ctrl+Shift+D"), self)
+            shortcut.activated.connect(self.show_diagnostics)
+        STARTUP.mark("window")
+
+    def open_store(self):
+        if self.store is not None:
+            return self.store
+        if SERVER_ADDRESS is not None:
+            store = DataStore(REPLICA_PATH)
+            link = ServerLink(store, SERVER_ADDRESS)
+            try:
+                link.attach()
+            except ServerError:
+                link.close()
+                store.close()
+                raise
+            self.store, self.link = store, link
+        else:
+            self.store = DataStore(DB_PATH)
+        # Build the search indexes off the GUI thread
+        for attr, index in self.store.search.items():
+            index.build_in_background(self.store.path, attr)
+        STARTUP.mark("data load")
+        return self.store
+
+    def on_login(self):
+        try:
+            self.open_store()
+        except ServerError as exc:
+            QMessageBox.warning(self, "Server Error", f"Could not load data from the server:\n{exc}")
+            return
+        if self.main_widget is None:
+            self.main_widget = self.create_main_widget()
+            self.stacked_widget.addWidget(self.main_widget)
+        self.stacked_widget.setCurrentWidget(self.main_widget)
+        self.switch_page(0)
+
+    def page(self, index):
+        # The page at a content-stack index, building it on first use
+        name = self.PAGES[index]
+        widget = getattr(self, name)
+        if widget is None:
+            widget = self._build_page(name)
+            setattr(self, name, widget)
+            placeholder = self.content_stack.widget(index)
+            self.content_stack.removeWidget(placeholder)
+            placeholder.deleteLater()
+            self.content_stack.insertWidget(index, widget)
+        return widget
+
+    def _build_page(self, name):
+        # Pass self (MainWindow) to widgets that need to access other widgets' data
+        store = self.store
+        if name == "dashboard":
+            return DashboardWidget(self)
+        if name == "reports":
+            return ReportsWidget(self)
+        if name == "diagnostics":
+            return DiagnosticsWidget(self)
+        if name == "financial":
+            widget = FinancialWidget(store.financial, self)
+        elif name == "inventory":
+            widget = InventoryWidget(store.inventory, self)
+        else:
+            widget = CustomerWidget(store.customers, self)
+        # Show whatever was saved in previous sessions
+        widget.refresh_table()
+        return widget
+
     def create_main_widget(self):
         widget = QWidget()
         layout = QHBoxLayout()
@@ -1001,7 +6145,7 @@ class MainWindow(QMainWindow):
         sidebar = QWidget()
         sidebar.setFixedWidth(200)
         sidebar_layout = QVBoxLayout()
-        sidebar.setStyleSheet("background-color: #1E90FF;")
+        sidebar.setProperty("role", "sidebar")
         sidebar.setLayout(sidebar_layout)
 
         btn_dashboard = QPushButton("Dashboard")
@@ -1009,24 +6153,20 @@ class MainWindow(QMainWindow):
         btn_inventory = QPushButton("Inventory")
         btn_customer = QPushButton("Customers")
         btn_reports = QPushButton("Reports")
+        btn_sync_export = QPushButton("Sync Export")
+        btn_sync_export.setToolTip("Save this branch's changes to a file for another branch")
+        btn_sync_import = QPushButton("Sync Import")
+        btn_sync_import.setToolTip("Apply a changes file from another branch")
         btn_logout = QPushButton("Logout")
 
         # Styling buttons
-        for btn in [btn_dashboard, btn_financial, btn_inventory, btn_customer, btn_reports, btn_logout]:
+        for btn in [btn_dashboard, btn_financial, btn_inventory, btn_customer, btn_reports,
+                    btn_sync_export, btn_sync_import, btn_logout]:
             btn.setFixedHeight(40)
-            btn.setStyleSheet("""
-                QPushButton {
-                    color: white;
-                    background-color: #1E90FF;
-                    border: none;
-                    text-align: left;
-                    padding-left: 20px;
-                    font-size: 14pt;
-                }
-                QPushButton:hover {
-                    background-color: #0c69e5;
-                }
-            """)
+            btn.setProperty("role", "sidebarButton")
+        # A client replica is not a branch; the server's database is
+        for btn in (btn_sync_export, btn_sync_import):
+            btn.setVisible(self.link is None)
 
         sidebar_layout.addWidget(btn_dashboard)
         sidebar_layout.addWidget(btn_financial)
@@ -1034,15 +6174,14 @@ class MainWindow(QMainWindow):
         sidebar_layout.addWidget(btn_customer)
         sidebar_layout.addWidget(btn_reports)
         sidebar_layout.addStretch()
+        sidebar_layout.addWidget(btn_sync_export)
+        sidebar_layout.addWidget(btn_sync_import)
         sidebar_layout.addWidget(btn_logout)
 
-        # Content area stacked widget
+        # Content area stacked widget; placeholders until each page is visited
         self.content_stack = QStackedWidget()
-        self.content_stack.addWidget(self.dashboard)
-        self.content_stack.addWidget(self.financial)
-        self.content_stack.addWidget(self.inventory)
-        self.content_stack.addWidget(self.customer)
-        self.content_stack.addWidget(self.reports)
+        for _ in self.PAGES:
+            self.content_stack.addWidget(QWidget())
 
         layout.addWidget(sidebar)
         layout.addWidget(self.content_stack)
@@ -1053,11 +6192,58 @@ class MainWindow(QMainWindow):
         btn_inventory.clicked.connect(lambda: self.switch_page(2))
         btn_customer.clicked.connect(lambda: self.switch_page(3))
         btn_reports.clicked.connect(lambda: self.switch_page(4))
+        btn_sync_export.clicked.connect(self.export_changes)
+        btn_sync_import.clicked.connect(self.import_changes)
         btn_logout.clicked.connect(self.logout)
 
         return widget
 
+    def export_changes(self):
+        branch = self.store.branch
+        peer = None
+        peers = branch.peers()
+        if peers:
+            everything = "A new branch (all data)"
+            choice, ok = QInputDialog.getItem(
+                self, "Sync Export", "Export the changes that this branch has not received:",
+                peers + [everything], 0, False,
+            )
+            if not ok:
+                return
+            peer = None if choice == everything else choice
+        default = f"changes-{branch.site}-{QDate.currentDate().toString('yyyyMMdd')}.lstsync"
+        path, _ = QFileDialog.getSaveFileName(self, "Sync Export", default, "Changesets (*.lstsync)")
+        if not path:
+            return
+        try:
+            count = branch.export_changes(path, peer)
+        except OSError as exc:
+            QMessageBox.warning(self, "Export Failed", f"Could not write the changes file:\n{exc}")
+            return
+        QMessageBox.information(self, "Sync Export", f"Exported {count:,} changed rows from branch {branch.site}.")
+
+    def import_changes(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Sync Import", "", "Changesets (*.lstsync);;All Files (*)")
+        if not path:
+            return
+        try:
+            result = self.store.branch.import_changes(path)
+        except SyncError as exc:
+            QMessageBox.warning(self, "Import Failed", str(exc))
+            return
+        QMessageBox.information(
+            self, "Sync Import",
+            f"Applied {result.applied:,} changes from branch {result.source}.\n"
+            f"{result.skipped:,} were already here or older than this branch's version.",
+        )
+
+    def show_diagnostics(self):
+        # Not in the sidebar; only reachable once logged in
+        if self.main_widget is not None and self.stacked_widget.currentWidget() is self.main_widget:
+            self.switch_page(self.PAGES.index("diagnostics"))
+
     def switch_page(self, index):
+        self.page(index)
         self.content_stack.setCurrentIndex(index)
         # When switching to dashboard, update its data
         if index == 0: # Dashboard index
@@ -1070,7 +6256,39 @@ class MainWindow(QMainWindow):
         if reply == QMessageBox.Yes:
             self.stacked_widget.setCurrentIndex(0)  # back to login
 
+    def closeEvent(self, event):
+        if self.link is not None:
+            self.link.close()
+        if self.store is not None:
+            self.store.close()
+        super().closeEvent(event)
+
+
+def pop_option(argv, flag):
+    # Removes "--flag VALUE" (or "--flag=VALUE") from argv; returns VALUE,
+    # "" when the flag has no value, or None when it is absent
+    for i, arg in enumerate(argv):
+        if arg == flag:
+            del argv[i]
+            return argv.pop(i) if i < len(argv) and not argv[i].startswith("-") else ""
+        if arg.startswith(flag + "="):
+            del argv[i]
+            return arg[len(flag) + 1:]
+    return None
+
+
 def main():
+    global SERVER_ADDRESS
+    STARTUP.mark("import")
+    serve = pop_option(sys.argv, "--serve")
+    if serve is not None:
+        sys.exit(run_server(serve))
+    server = pop_option(sys.argv, "--server") or os.environ.get("LST_SERVER")
+    if server:
+        SERVER_ADDRESS = parse_address(server)
+    if "--instrument" in sys.argv:
+        sys.argv.remove("--instrument")
+        INSTRUMENTS.enable()
     app = QApplication(sys.argv)
     app.setStyle("Fusion")
 